@@ -0,0 +1,131 @@
+import json
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from posts.models import Comment, Follow, Group, Post, User
+
+
+def read_json(response):
+    if response.streaming:
+        return json.loads(b''.join(response.streaming_content))
+    return json.loads(response.content)
+
+
+@override_settings(API_PAGE_SIZE=3)
+class ApiTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='api_author')
+        cls.reader = User.objects.create_user(username='api_reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='api_slug', description='Описание')
+        cls.posts = [
+            Post.objects.create(
+                text=f'Пост {i}', author=cls.author,
+                group=cls.group if i % 2 else None)
+            for i in range(7)
+        ]
+        cls.comment = Comment.objects.create(
+            post=cls.posts[0], author=cls.reader, text='Комментарий')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        self.client.force_login(self.reader)
+
+    def collect(self, url):
+        """Обходит все страницы списка по ссылкам next."""
+        ids = []
+        while url:
+            data = read_json(self.client.get(url))
+            ids.extend(item['id'] for item in data['results'])
+            url = data['next']
+        return ids
+
+    def test_post_lists(self):
+        """Списки постов листаются курсором без пропусков и повторов."""
+        newest_first = [post.pk for post in reversed(self.posts)]
+        odd = [post.pk for post in reversed(self.posts) if post.group]
+        cases = {
+            reverse('api:post_list'): newest_first,
+            reverse('api:group_posts', kwargs={'slug': self.group.slug}): odd,
+            reverse('api:author_posts',
+                    kwargs={'username': self.author.username}): newest_first,
+            reverse('api:follow_posts'): newest_first,
+        }
+        for url, expected in cases.items():
+            with self.subTest(url=url):
+                self.assertEqual(self.collect(url), expected)
+
+    def test_previous_page(self):
+        """Ссылка previous возвращает на предыдущую страницу."""
+        first = read_json(self.client.get(reverse('api:post_list')))
+        second = read_json(self.client.get(first['next']))
+        back = read_json(self.client.get(second['previous']))
+        self.assertEqual(back['results'], first['results'])
+
+    def test_sparse_fields(self):
+        """?fields= отдаёт только запрошенные поля."""
+        response = self.client.get(
+            reverse('api:post_list'), {'fields': 'id,author', 'limit': 1})
+        item = read_json(response)['results'][0]
+        self.assertEqual(
+            item, {'id': self.posts[-1].pk, 'author': 'api_author'})
+
+    def test_unknown_field_and_bad_limit(self):
+        """Неизвестное поле и неверный limit дают 400."""
+        for params in ({'fields': 'id,password'}, {'limit': 0},
+                       {'limit': 'много'}):
+            with self.subTest(params=params):
+                response = self.client.get(reverse('api:post_list'), params)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('detail', json.loads(response.content))
+
+    def test_post_detail_with_comments(self):
+        """Пост отдаётся вместе с комментариями."""
+        post = self.posts[0]
+        data = read_json(self.client.get(
+            reverse('api:post_detail', kwargs={'post_id': post.pk})))
+        self.assertEqual(data['text'], post.text)
+        self.assertIsNone(data['image'])
+        self.assertEqual(data['comments'], [{
+            'id': self.comment.pk,
+            'author': 'api_reader',
+            'text': 'Комментарий',
+            'created': data['comments'][0]['created'],
+        }])
+
+    def test_group_detail(self):
+        response = self.client.get(
+            reverse('api:group_detail', kwargs={'slug': self.group.slug}),
+            {'fields': 'title'})
+        self.assertEqual(json.loads(response.content), {'title': 'Группа'})
+
+    def test_follow_list(self):
+        data = read_json(self.client.get(reverse('api:follow_list')))
+        self.assertEqual(data, {'authors': ['api_author']})
+
+    def test_errors(self):
+        """Несуществующие объекты — 404, подписки без входа — 401."""
+        for url in (
+            reverse('api:post_detail', kwargs={'post_id': 10 ** 6}),
+            reverse('api:group_detail', kwargs={'slug': 'nope'}),
+            reverse('api:group_posts', kwargs={'slug': 'nope'}),
+            reverse('api:author_posts', kwargs={'username': 'nope'}),
+        ):
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code, 404)
+        self.client.logout()
+        for url in (reverse('api:follow_list'), reverse('api:follow_posts')):
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code, 401)
+
+    def test_read_only(self):
+        response = self.client.post(reverse('api:post_list'))
+        self.assertEqual(response.status_code, 405)
+
+    def test_list_is_one_query(self):
+        """Страница списка — один запрос к базе, без загрузки моделей."""
+        self.client.logout()
+        with self.assertNumQueries(1):
+            read_json(self.client.get(reverse('api:post_list')))
@@ -0,0 +1,19 @@
+from django.urls import path
+
+from . import views
+
+app_name = 'api'
+
+urlpatterns = [
+    path('posts/', views.post_list, name='post_list'),
+    path('posts/<int:post_id>/', views.post_detail, name='post_detail'),
+    path('groups/<slug:slug>/', views.group_detail, name='group_detail'),
+    path('groups/<slug:slug>/posts/', views.group_posts, name='group_posts'),
+    path(
+        'authors/<str:username>/posts/',
+        views.author_posts,
+        name='author_posts'
+    ),
+    path('follow/', views.follow_list, name='follow_list'),
+    path('follow/posts/', views.follow_posts, name='follow_posts'),
+]
@@ -0,0 +1,210 @@
+"""JSON API только для чтения.
+
+Ответы собираются из словарей values(), без экземпляров моделей, и
+отдаются по кускам через StreamingHttpResponse. Параметр ?fields=
+ограничивает набор полей: ненужные колонки (например, text или image)
+не выбираются из базы и не сериализуются. Списки постов листаются
+непрозрачным курсором (?cursor=), размер страницы задаёт ?limit=.
+"""
+import json
+from functools import partial, wraps
+
+from core.utils import CursorPaginator
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_safe
+from posts.models import Comment, Follow, Group, Post, User
+from posts.timeline import TimelinePaginator
+
+CONTENT_TYPE = 'application/json'
+
+# Поле ответа -> выражение для values().
+POST_FIELDS = {
+    'id': 'id',
+    'text': 'text',
+    'pub_date': 'pub_date',
+    'author': 'author__username',
+    'group': 'group__slug',
+    'image': 'image',
+    'comments_count': 'comments_count',
+}
+COMMENT_FIELDS = {
+    'id': 'id',
+    'author': 'author__username',
+    'text': 'text',
+    'created': 'created',
+}
+GROUP_FIELDS = {
+    'slug': 'slug',
+    'title': 'title',
+    'description': 'description',
+}
+# Без этих колонок не построить курсор страницы.
+CURSOR_FIELDS = ('pub_date', 'id')
+
+
+class ApiError(Exception):
+    def __init__(self, status, detail):
+        super().__init__(detail)
+        self.status = status
+        self.detail = detail
+
+
+def api_view(view):
+    """Только GET/HEAD; ApiError превращается в JSON с кодом ошибки."""
+    @require_safe
+    @wraps(view)
+    def inner(request, *args, **kwargs):
+        try:
+            return view(request, *args, **kwargs)
+        except ApiError as error:
+            return JsonResponse(
+                {'detail': error.detail}, status=error.status,
+                json_dumps_params={'ensure_ascii': False})
+    return inner
+
+
+def dumps(data):
+    return json.dumps(data, cls=DjangoJSONEncoder, ensure_ascii=False)
+
+
+def requested_fields(request, available):
+    fields = request.GET.get('fields')
+    if not fields:
+        return list(available)
+    fields = [field.strip() for field in fields.split(',') if field.strip()]
+    unknown = [field for field in fields if field not in available]
+    if unknown:
+        raise ApiError(400, f'Неизвестные поля: {", ".join(unknown)}')
+    return fields
+
+
+def page_size(request):
+    limit = request.GET.get('limit')
+    if limit is None:
+        return settings.API_PAGE_SIZE
+    if not limit.isdigit() or not 0 < int(limit) <= settings.API_MAX_PAGE_SIZE:
+        raise ApiError(
+            400, f'limit — число от 1 до {settings.API_MAX_PAGE_SIZE}')
+    return int(limit)
+
+
+def pick(request, row, fields, lookups):
+    item = {field: row[lookups[field]] for field in fields}
+    if 'image' in item:
+        item['image'] = (
+            request.build_absolute_uri(default_storage.url(item['image']))
+            if item['image'] else None)
+    return item
+
+
+def stream(head, key, items):
+    """JSON-объект head с массивом key, который пишется по элементу."""
+    yield dumps(head)[:-1] + (', ' if head else '') + f'"{key}": ['
+    separator = ''
+    for item in items:
+        yield separator + dumps(item)
+        separator = ', '
+    yield ']}'
+
+
+def page_url(request, cursor):
+    if cursor is None:
+        return None
+    query = request.GET.copy()
+    query['cursor'] = cursor
+    return request.build_absolute_uri(f'{request.path}?{query.urlencode()}')
+
+
+def post_page(request, posts, paginator_class=CursorPaginator):
+    fields = requested_fields(request, POST_FIELDS)
+    columns = {POST_FIELDS[field] for field in fields}.union(CURSOR_FIELDS)
+    page = paginator_class(
+        posts.values(*columns), page_size(request)
+    ).get_page(request.GET.get('cursor'))
+    head = {
+        'next': page_url(request, page.next_cursor),
+        'previous': page_url(request, page.previous_cursor),
+    }
+    items = (pick(request, row, fields, POST_FIELDS) for row in page)
+    return StreamingHttpResponse(
+        stream(head, 'results', items), content_type=CONTENT_TYPE)
+
+
+def lookup_id(queryset, detail, **lookup):
+    object_id = queryset.filter(**lookup).values_list(
+        'pk', flat=True).first()
+    if object_id is None:
+        raise ApiError(404, detail)
+    return object_id
+
+
+def current_user(request):
+    if not request.user.is_authenticated:
+        raise ApiError(401, 'Нужна авторизация')
+    return request.user
+
+
+@api_view
+def post_list(request):
+    return post_page(request, Post.objects.all())
+
+
+@api_view
+def group_posts(request, slug):
+    group_id = lookup_id(Group.objects, 'Группа не найдена', slug=slug)
+    return post_page(request, Post.objects.filter(group_id=group_id))
+
+
+@api_view
+def author_posts(request, username):
+    author_id = lookup_id(User.objects, 'Автор не найден', username=username)
+    return post_page(request, Post.objects.filter(author_id=author_id))
+
+
+@api_view
+def follow_posts(request):
+    return post_page(
+        request, Post.objects.all(),
+        partial(TimelinePaginator, current_user(request)))
+
+
+@api_view
+def follow_list(request):
+    authors = Follow.objects.filter(
+        user=current_user(request)
+    ).order_by('author__username').values_list('author__username', flat=True)
+    return StreamingHttpResponse(
+        stream({}, 'authors', authors.iterator()), content_type=CONTENT_TYPE)
+
+
+@api_view
+def post_detail(request, post_id):
+    fields = requested_fields(request, POST_FIELDS)
+    row = Post.objects.filter(pk=post_id).values(
+        *{POST_FIELDS[field] for field in fields}).first()
+    if row is None:
+        raise ApiError(404, 'Пост не найден')
+    comments = Comment.objects.filter(post_id=post_id).values(
+        *COMMENT_FIELDS.values())
+    items = (
+        pick(request, comment, COMMENT_FIELDS, COMMENT_FIELDS)
+        for comment in comments.iterator()
+    )
+    return StreamingHttpResponse(
+        stream(pick(request, row, fields, POST_FIELDS), 'comments', items),
+        content_type=CONTENT_TYPE)
+
+
+@api_view
+def group_detail(request, slug):
+    fields = requested_fields(request, GROUP_FIELDS)
+    row = Group.objects.filter(slug=slug).values(
+        *{GROUP_FIELDS[field] for field in fields}).first()
+    if row is None:
+        raise ApiError(404, 'Группа не найдена')
+    return JsonResponse(
+        pick(request, row, fields, GROUP_FIELDS),
+        json_dumps_params={'ensure_ascii': False})
@@ -0,0 +1,55 @@
+import time
+from datetime import datetime, timezone
+
+from django.core.cache import cache
+
+GENERATION_PREFIX = 'generation'
+
+
+def _key(name):
+    return f'{GENERATION_PREFIX}:{name}'
+
+
+def _initial():
+    # Счётчик, вытесненный из кэша, не должен вернуться к старому
+    # значению, иначе оживут устаревшие фрагменты.
+    return int(time.time() * 1000)
+
+
+def get_generations(*names):
+    """Текущие поколения счётчиков одной строкой для ключа кэша."""
+    keys = [_key(name) for name in names]
+    values = cache.get_many(keys)
+    for key in keys:
+        if key not in values:
+            cache.add(key, _initial(), None)
+            values[key] = cache.get(key)
+    return '.'.join(str(values[key]) for key in keys)
+
+
+def bump_generations(*names):
+    """Сдвигает поколения: всё, что закэшировано по ним, устаревает."""
+    for name in set(names):
+        key = _key(name)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, _initial(), None)
+    now = time.time()
+    cache.set_many(
+        {f'{_key(name)}:modified': now for name in names}, None)
+
+
+def get_last_modified(*names):
+    """Время последнего сдвига поколений (aware, UTC).
+
+    Если отметка потерялась вместе с кэшем, отсчёт начинается заново с
+    текущего момента — как и у самих счётчиков в get_generations.
+    """
+    keys = [f'{_key(name)}:modified' for name in names]
+    values = cache.get_many(keys)
+    for key in keys:
+        if key not in values:
+            cache.add(key, time.time(), None)
+            values[key] = cache.get(key)
+    return datetime.fromtimestamp(max(values.values()), tz=timezone.utc)
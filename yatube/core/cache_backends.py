@@ -0,0 +1,222 @@
+"""Общий для всех процессов кэш в файле SQLite.
+
+LocMemCache у каждого WSGI-процесса свой, поэтому сброс кэша в одном
+процессе не доходит до остальных. Этот бэкенд хранит записи в одном файле
+SQLite в режиме WAL: читатели не блокируют писателя, а incr/decr
+выполняются атомарно внутри транзакции BEGIN IMMEDIATE.
+
+При переполнении вытесняются давно не читавшиеся записи (LRU). Время
+последнего чтения обновляется не чаще раза в LRU_RESOLUTION секунд, чтобы
+чтение почти всегда обходилось без записи в файл.
+"""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+SCHEMA = (
+    """CREATE TABLE IF NOT EXISTS cache (
+        key TEXT PRIMARY KEY,
+        value BLOB NOT NULL,
+        expires REAL,
+        accessed REAL NOT NULL
+    ) WITHOUT ROWID""",
+    'CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed)',
+    'CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires)',
+)
+
+
+class SQLiteCache(BaseCache):
+    lru_resolution = 1.0
+    cull_check_interval = 100
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._path = location
+        self._busy_timeout = options.get('BUSY_TIMEOUT', 5.0)
+        self.lru_resolution = options.get(
+            'LRU_RESOLUTION', self.lru_resolution)
+        self.cull_check_interval = options.get(
+            'CULL_CHECK_INTERVAL', self.cull_check_interval)
+        self._local = threading.local()
+        self._sets = 0
+
+    @property
+    def _db(self):
+        local = self._local
+        # После fork подключение родителя использовать нельзя.
+        if getattr(local, 'pid', None) != os.getpid():
+            directory = os.path.dirname(self._path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            db = sqlite3.connect(
+                self._path, timeout=self._busy_timeout,
+                isolation_level=None, check_same_thread=False)
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute('PRAGMA synchronous=NORMAL')
+            for statement in SCHEMA:
+                db.execute(statement)
+            local.db, local.pid = db, os.getpid()
+        return local.db
+
+    @staticmethod
+    def _dumps(value):
+        # Целые числа хранятся как INTEGER, без pickle: счётчики поколений
+        # читаются и увеличиваются чаще всего остального.
+        if type(value) is int and -2 ** 63 <= value < 2 ** 63:
+            return value
+        return pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def _loads(value):
+        if isinstance(value, int):
+            return value
+        return pickle.loads(value)
+
+    def _fetch(self, keys):
+        now = time.time()
+        placeholders = ', '.join('?' * len(keys))
+        rows = self._db.execute(
+            f'SELECT key, value, accessed FROM cache '
+            f'WHERE key IN ({placeholders}) '
+            f'AND (expires IS NULL OR expires > ?)',
+            [*keys, now]).fetchall()
+        stale = [
+            key for key, _, accessed in rows
+            if now - accessed > self.lru_resolution
+        ]
+        if stale:
+            placeholders = ', '.join('?' * len(stale))
+            self._db.execute(
+                f'UPDATE cache SET accessed = ? WHERE key IN ({placeholders})',
+                [now, *stale])
+        return {key: self._loads(value) for key, value, _ in rows}
+
+    def get(self, key, default=None, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return self._fetch([key]).get(key, default)
+
+    def get_many(self, keys, version=None):
+        if not keys:
+            return {}
+        key_map = {}
+        for key in keys:
+            made = self.make_key(key, version=version)
+            self.validate_key(made)
+            key_map[made] = key
+        found = self._fetch(list(key_map))
+        return {key_map[key]: value for key, value in found.items()}
+
+    def _store(self, key, value, timeout, only_missing=False):
+        now = time.time()
+        params = (key, self._dumps(value),
+                  self.get_backend_timeout(timeout), now)
+        if only_missing:
+            cursor = self._db.execute(
+                'INSERT INTO cache (key, value, expires, accessed) '
+                'VALUES (?, ?, ?, ?) '
+                'ON CONFLICT (key) DO UPDATE SET value = excluded.value, '
+                'expires = excluded.expires, accessed = excluded.accessed '
+                'WHERE cache.expires IS NOT NULL AND cache.expires <= ?',
+                (*params, now))
+        else:
+            cursor = self._db.execute(
+                'INSERT OR REPLACE INTO cache (key, value, expires, accessed) '
+                'VALUES (?, ?, ?, ?)', params)
+        self._sets += 1
+        if self._sets % self.cull_check_interval == 0:
+            self._cull()
+        return cursor.rowcount > 0
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        self._store(key, value, timeout)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return self._store(key, value, timeout, only_missing=True)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        db = self._db
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            for key, value in data.items():
+                self.set(key, value, timeout, version=version)
+        except Exception:
+            db.execute('ROLLBACK')
+            raise
+        db.execute('COMMIT')
+        return []
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        cursor = self._db.execute(
+            'UPDATE cache SET expires = ? '
+            'WHERE key = ? AND (expires IS NULL OR expires > ?)',
+            (self.get_backend_timeout(timeout), key, time.time()))
+        return cursor.rowcount > 0
+
+    def incr(self, key, delta=1, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        db = self._db
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            row = db.execute(
+                'SELECT value FROM cache '
+                'WHERE key = ? AND (expires IS NULL OR expires > ?)',
+                (key, time.time())).fetchone()
+            if row is None:
+                raise ValueError(f"Key '{key}' not found")
+            value = self._loads(row[0]) + delta
+            db.execute(
+                'UPDATE cache SET value = ? WHERE key = ?',
+                (self._dumps(value), key))
+        except Exception:
+            db.execute('ROLLBACK')
+            raise
+        db.execute('COMMIT')
+        return value
+
+    def delete(self, key, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        self._db.execute('DELETE FROM cache WHERE key = ?', (key,))
+
+    def has_key(self, key, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return self._db.execute(
+            'SELECT 1 FROM cache '
+            'WHERE key = ? AND (expires IS NULL OR expires > ?)',
+            (key, time.time())).fetchone() is not None
+
+    def clear(self):
+        self._db.execute('DELETE FROM cache')
+
+    def _cull(self):
+        db = self._db
+        db.execute(
+            'DELETE FROM cache WHERE expires IS NOT NULL AND expires <= ?',
+            (time.time(),))
+        count = db.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+        if count <= self._max_entries:
+            return
+        excess = count - self._max_entries
+        if self._cull_frequency:
+            excess += self._max_entries // self._cull_frequency
+        db.execute(
+            'DELETE FROM cache WHERE key IN ('
+            'SELECT key FROM cache ORDER BY accessed LIMIT ?)', (excess,))
+
+    def close(self, **kwargs):
+        # Подключение живёт всё время работы процесса, как и у LocMemCache.
+        pass
@@ -0,0 +1,5 @@
+from django.conf import settings
+
+
+def fragment_cache_timeout(request):
+    return {'fragment_cache_timeout': settings.FRAGMENT_CACHE_TIMEOUT}
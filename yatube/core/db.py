@@ -0,0 +1,122 @@
+"""Настройка подключений к SQLite.
+
+При каждом новом подключении выполняются PRAGMA из SQLITE_PRAGMAS (или из
+ключа PRAGMAS в описании конкретной базы в DATABASES): журнал WAL, чтобы
+писатели не блокировали читателей, synchronous=NORMAL, mmap, размер кэша
+страниц и busy_timeout. Вместе с CONN_MAX_AGE подключение и его настройки
+переживают запрос, и PRAGMA выполняются один раз на подключение.
+
+PrimaryReplicaRouter отправляет запись в основную базу, а чтение — в
+реплики из DATABASE_REPLICAS, но только внутри безопасных (GET/HEAD)
+запросов, которые ReplicaRoutingMiddleware разрешила читать с реплики.
+Всё остальное — запросы на запись, команды, фоновые задачи и несколько
+секунд после записи пользователя — читает основную базу, чтобы видеть
+свои изменения. Сессии, пользователи и очередь задач всегда читаются
+с основной базы: отставшая реплика не должна терять вход или отдавать
+уже выполненную задачу.
+
+Кэш страниц и валидаторы условных GET строятся по поколениям из общего
+кэша, а они отражают основную базу. Поэтому страница, чьи поколения
+сдвинулись после последнего копирования реплики (sync_replica отмечает
+его в кэше), читается с основной базы: иначе устаревшие данные реплики
+попали бы в кэш под новым поколением.
+"""
+import random
+import time
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+
+STICKY_COOKIE = 'use_primary'
+# Приложения, модели которых читаются только с основной базы.
+PRIMARY_APPS = {'auth', 'sessions', 'tasks'}
+
+_read_from_replica = ContextVar('read_from_replica', default=False)
+
+
+def apply_pragmas(cursor, pragmas):
+    for name, value in pragmas.items():
+        cursor.execute(f'PRAGMA {name} = {value}')
+
+
+def configure_connection(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    pragmas = connection.settings_dict.get(
+        'PRAGMAS', settings.SQLITE_PRAGMAS)
+    with connection.cursor() as cursor:
+        apply_pragmas(cursor, pragmas)
+
+
+@contextmanager
+def replica_reads(enabled=True):
+    """Разрешает (или запрещает) чтение с реплик внутри блока."""
+    token = _read_from_replica.set(enabled)
+    try:
+        yield
+    finally:
+        _read_from_replica.reset(token)
+
+
+def synced_key(alias):
+    return f'replica:synced:{alias}'
+
+
+def mark_synced(alias, started):
+    """Запоминает, что реплика содержит всё записанное до started."""
+    cache.set(synced_key(alias), started, None)
+
+
+def replicas_behind(modified):
+    """Могла ли какая-нибудь реплика не застать изменение в modified."""
+    synced = cache.get_many(
+        [synced_key(alias) for alias in settings.DATABASE_REPLICAS])
+    if len(synced) < len(settings.DATABASE_REPLICAS):
+        return True
+    # Поколение сдвигается до фиксации транзакции, поэтому запас.
+    border = min(synced.values()) - settings.REPLICA_STICKY_SECONDS
+    return modified.timestamp() >= border
+
+
+def primary_if_behind(modified):
+    """Блок читает основную базу, если реплики старше изменения."""
+    if _read_from_replica.get() and replicas_behind(modified):
+        return replica_reads(False)
+    return nullcontext()
+
+
+def use_primary(view):
+    """Для представлений, которые пишут в базу на GET-запрос.
+
+    Чтение внутри идёт с основной базы, а ответ продлевает чтение с неё,
+    как после POST.
+    """
+    @wraps(view)
+    def inner(request, *args, **kwargs):
+        request.wrote_to_primary = True
+        with replica_reads(False):
+            return view(request, *args, **kwargs)
+    return inner
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label in PRIMARY_APPS:
+            return DEFAULT_DB_ALIAS
+        if settings.DATABASE_REPLICAS and _read_from_replica.get():
+            return random.choice(settings.DATABASE_REPLICAS)
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплики содержат те же данные, что и основная база.
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        return db == DEFAULT_DB_ALIAS
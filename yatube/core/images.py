@@ -0,0 +1,80 @@
+"""Адаптивные варианты загруженных картинок.
+
+Каждая картинка нарезается под набор ширин из IMAGE_VARIANT_WIDTHS в
+форматах из IMAGE_VARIANT_FORMATS. Имена вариантов детерминированы
+(variants/<путь к оригиналу>_<ширина>w.<расширение>), поэтому шаблон
+строит ссылки, не обращаясь к базе, а сами файлы можно раздавать как
+статику. Расширение оригинала остаётся в имени: иначе a.jpg и a.png
+делили бы одни варианты.
+"""
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps, features
+
+EXTENSIONS = {'webp': 'webp', 'jpeg': 'jpg'}
+MIME_TYPES = {'webp': 'image/webp', 'jpeg': 'image/jpeg'}
+SAVE_OPTIONS = {
+    'webp': {'quality': 80, 'method': 4},
+    'jpeg': {'quality': 85, 'progressive': True, 'optimize': True},
+}
+
+
+def available_formats():
+    """Форматы из настроек, которые умеет кодировать установленный Pillow."""
+    return [
+        fmt for fmt in settings.IMAGE_VARIANT_FORMATS
+        if fmt != 'webp' or features.check('webp')
+    ]
+
+
+def variant_size(width):
+    ratio_width, ratio_height = settings.IMAGE_VARIANT_RATIO
+    return width, round(width * ratio_height / ratio_width)
+
+
+def variant_name(image_name, width, fmt):
+    return (f'{settings.IMAGE_VARIANTS_DIR}/{image_name}_{width}w.'
+            f'{EXTENSIONS[fmt]}')
+
+
+def generate_variants(image_name, storage=default_storage):
+    """Нарезает все варианты картинки, перезаписывая существующие."""
+    with storage.open(image_name) as source:
+        image = Image.open(source)
+        image.load()
+    image = ImageOps.exif_transpose(image).convert('RGB')
+    names = []
+    for width in settings.IMAGE_VARIANT_WIDTHS:
+        resized = ImageOps.fit(
+            image, variant_size(width), method=Image.LANCZOS)
+        for fmt in available_formats():
+            buffer = BytesIO()
+            resized.save(buffer, format=fmt.upper(), **SAVE_OPTIONS[fmt])
+            name = variant_name(image_name, width, fmt)
+            if storage.exists(name):
+                storage.delete(name)
+            names.append(storage.save(name, ContentFile(buffer.getvalue())))
+    return names
+
+
+def variant_srcsets(image_name, storage=default_storage):
+    """Списки (mime-тип, srcset) для <picture> или None, если вариантов нет.
+
+    Наличие проверяется по самому крупному варианту последнего формата —
+    он нарезается последним.
+    """
+    formats = available_formats()
+    widths = sorted(settings.IMAGE_VARIANT_WIDTHS)
+    if not formats or not widths:
+        return None
+    if not storage.exists(variant_name(image_name, widths[-1], formats[-1])):
+        return None
+    return [
+        (MIME_TYPES[fmt], ', '.join(
+            f'{storage.url(variant_name(image_name, width, fmt))} {width}w'
+            for width in widths))
+        for fmt in formats
+    ]
@@ -0,0 +1,106 @@
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils.module_loading import import_string
+
+BENCHMARK_BACKENDS = ('locmem', 'file', 'sqlite')
+
+
+def make_cache(config, directory):
+    params = dict(config)
+    location = params.pop('LOCATION', '')
+    if location:
+        location = os.path.join(directory, os.path.basename(location))
+    return import_string(params['BACKEND'])(location, params)
+
+
+def run_worker(config, directory, worker, operations, queue):
+    cache = make_cache(config, directory)
+    payload = 'x' * 512
+    started = time.perf_counter()
+    for i in range(operations):
+        cache.set(f'bench:{worker}:{i}', payload)
+    set_time = time.perf_counter() - started
+    started = time.perf_counter()
+    for i in range(operations):
+        cache.get(f'bench:{worker}:{i}')
+    get_time = time.perf_counter() - started
+    started = time.perf_counter()
+    cache.add('bench:counter', 0)
+    for _ in range(operations):
+        try:
+            cache.incr('bench:counter')
+        except ValueError:
+            # Неатомарные бэкенды теряют ключ при гонке add/incr.
+            cache.add('bench:counter', 1)
+    incr_time = time.perf_counter() - started
+    queue.put((set_time, get_time, incr_time))
+
+
+def shared_hits(config, directory, workers, operations):
+    """Доля записей других процессов, видимых из нового процесса."""
+    cache = make_cache(config, directory)
+    keys = [f'bench:{worker}:{i}'
+            for worker in range(workers) for i in range(operations)]
+    return len(cache.get_many(keys)) / len(keys)
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает пропускную способность бэкендов кэша '
+            'при работе из нескольких процессов')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--processes', type=int, nargs='+', default=[1, 4])
+        parser.add_argument('--operations', type=int, default=2000)
+        parser.add_argument(
+            '--backends', nargs='+', default=list(BENCHMARK_BACKENDS),
+            choices=sorted(settings.CACHE_BACKENDS))
+
+    def handle(self, *args, **options):
+        context = multiprocessing.get_context('fork')
+        operations = options['operations']
+        self.stdout.write(
+            'счётчик — итог incr из всех процессов (ожидается '
+            'операций × процессов), общие — доля чужих записей, '
+            'видимых из нового процесса')
+        self.stdout.write(
+            f'{"бэкенд":<8} {"проц.":>5} {"set/с":>10} {"get/с":>10} '
+            f'{"incr/с":>10} {"счётчик":>8} {"общие":>6}')
+        for name in options['backends']:
+            config = settings.CACHE_BACKENDS[name]
+            for processes in options['processes']:
+                directory = tempfile.mkdtemp(prefix='bench_cache_')
+                try:
+                    queue = context.Queue()
+                    workers = [
+                        context.Process(
+                            target=run_worker,
+                            args=(config, directory, worker, operations,
+                                  queue))
+                        for worker in range(processes)
+                    ]
+                    for worker in workers:
+                        worker.start()
+                    results = [queue.get() for _ in workers]
+                    for worker in workers:
+                        worker.join()
+                    counter = make_cache(config, directory).get(
+                        'bench:counter')
+                    hits = shared_hits(
+                        config, directory, processes, operations)
+                finally:
+                    shutil.rmtree(directory, ignore_errors=True)
+                total = operations * processes
+                set_rate, get_rate, incr_rate = (
+                    total / max(timings) for timings in zip(*results))
+                self.stdout.write(
+                    f'{name:<8} {processes:>5} {set_rate:>10.0f} '
+                    f'{get_rate:>10.0f} {incr_rate:>10.0f} '
+                    f'{counter if counter is not None else "-":>8} '
+                    f'{hits:>6.0%}')
@@ -0,0 +1,142 @@
+import multiprocessing
+import os
+import random
+import shutil
+import sqlite3
+import tempfile
+import time
+
+from core.db import apply_pragmas
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+# Профиль: (PRAGMA, держать ли подключение между операциями).
+PROFILES = {
+    # Как было: журнал отката и новое подключение на каждый запрос.
+    'default': ({'journal_mode': 'DELETE', 'synchronous': 'FULL'}, False),
+    'wal': ({'journal_mode': 'WAL'}, False),
+    'tuned': (None, True),
+}
+SEED_ROWS = 20000
+
+
+def connect(path, pragmas):
+    db = sqlite3.connect(path, timeout=5, isolation_level=None)
+    apply_pragmas(db, pragmas)
+    return db
+
+
+def prepare(path):
+    db = sqlite3.connect(path, isolation_level=None)
+    db.execute(
+        'CREATE TABLE post (id INTEGER PRIMARY KEY, author INTEGER, '
+        'text TEXT, pub_date REAL)')
+    db.execute('CREATE INDEX post_pub_date ON post (pub_date)')
+    db.execute('BEGIN')
+    db.executemany(
+        'INSERT INTO post (author, text, pub_date) VALUES (?, ?, ?)',
+        ((i % 100, 'x' * 400, i) for i in range(SEED_ROWS)))
+    db.execute('COMMIT')
+    db.close()
+
+
+def read(db, rnd):
+    db.execute(
+        'SELECT id, author, text FROM post ORDER BY pub_date DESC '
+        'LIMIT 10 OFFSET ?', (rnd.randrange(100) * 10,)).fetchall()
+
+
+def write(db, rnd):
+    # Как transaction.atomic() в post_create: запись и счётчик вместе.
+    db.execute('BEGIN IMMEDIATE')
+    db.execute(
+        'INSERT INTO post (author, text, pub_date) VALUES (?, ?, ?)',
+        (rnd.randrange(100), 'y' * 400, time.time()))
+    db.execute('COMMIT')
+
+
+def run_worker(path, profile, operation, deadline, seed, queue):
+    pragmas, persistent = PROFILES[profile]
+    pragmas = settings.SQLITE_PRAGMAS if pragmas is None else pragmas
+    rnd = random.Random(seed)
+    db = connect(path, pragmas) if persistent else None
+    latencies, errors = [], 0
+    while time.monotonic() < deadline:
+        started = time.perf_counter()
+        try:
+            connection = db or connect(path, pragmas)
+            try:
+                operation(connection, rnd)
+            finally:
+                if db is None:
+                    connection.close()
+        except sqlite3.OperationalError:
+            # database is locked: busy_timeout истёк.
+            errors += 1
+            continue
+        latencies.append(time.perf_counter() - started)
+    queue.put((operation.__name__, latencies, errors))
+
+
+def p95(latencies):
+    if not latencies:
+        return 0.0
+    latencies = sorted(latencies)
+    return latencies[int(len(latencies) * 0.95)] * 1000
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает чтение и запись в SQLite из нескольких процессов '
+            'с разными PRAGMA и временем жизни подключения')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readers', type=int, default=4)
+        parser.add_argument('--writers', type=int, default=2)
+        parser.add_argument(
+            '--duration', type=float, default=3.0, help='секунд на профиль')
+        parser.add_argument(
+            '--profiles', nargs='+', default=list(PROFILES),
+            choices=list(PROFILES))
+
+    def handle(self, *args, **options):
+        context = multiprocessing.get_context('fork')
+        duration = options['duration']
+        self.stdout.write(
+            'default — журнал отката и подключение на операцию, wal — только '
+            'WAL, tuned — SQLITE_PRAGMAS и постоянное подключение')
+        self.stdout.write(
+            f'{"профиль":<8} {"чтений/с":>9} {"p95 чт., мс":>11} '
+            f'{"записей/с":>10} {"p95 зап., мс":>12} {"ошибок":>7}')
+        for profile in options['profiles']:
+            directory = tempfile.mkdtemp(prefix='bench_sqlite_')
+            try:
+                path = os.path.join(directory, 'bench.sqlite3')
+                prepare(path)
+                queue = context.Queue()
+                deadline = time.monotonic() + duration
+                operations = ([read] * options['readers']
+                              + [write] * options['writers'])
+                workers = [
+                    context.Process(
+                        target=run_worker,
+                        args=(path, profile, operation, deadline, seed,
+                              queue))
+                    for seed, operation in enumerate(operations)
+                ]
+                for worker in workers:
+                    worker.start()
+                results = [queue.get() for _ in workers]
+                for worker in workers:
+                    worker.join()
+            finally:
+                shutil.rmtree(directory, ignore_errors=True)
+            latencies = {'read': [], 'write': []}
+            errors = 0
+            for name, worker_latencies, worker_errors in results:
+                latencies[name].extend(worker_latencies)
+                errors += worker_errors
+            self.stdout.write(
+                f'{profile:<8} {len(latencies["read"]) / duration:>9.0f} '
+                f'{p95(latencies["read"]):>11.2f} '
+                f'{len(latencies["write"]) / duration:>10.0f} '
+                f'{p95(latencies["write"]):>12.2f} {errors:>7}')
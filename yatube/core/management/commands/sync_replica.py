@@ -0,0 +1,51 @@
+import sqlite3
+import time
+
+from core.db import mark_synced
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+def copy_database(source, target):
+    """Копирует базу source в файл target через backup API SQLite."""
+    src = sqlite3.connect(source)
+    dst = sqlite3.connect(target)
+    try:
+        # Читатели реплики ждут копирования, а не получают «locked».
+        dst.execute('PRAGMA busy_timeout = 5000')
+        src.backup(dst)
+    finally:
+        dst.close()
+        src.close()
+
+
+class Command(BaseCommand):
+    help = ('Копирует основную базу SQLite в файл реплики; локальная '
+            'замена настоящей репликации')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--database', default='replica', help='псевдоним реплики')
+        parser.add_argument(
+            '--interval', type=float,
+            help='повторять копирование каждые N секунд')
+
+    def handle(self, *args, **options):
+        alias = options['database']
+        if alias not in connections.databases or alias == DEFAULT_DB_ALIAS:
+            raise CommandError(
+                f'Нет реплики {alias}; задайте YATUBE_DB_REPLICA')
+        source = connections[DEFAULT_DB_ALIAS].settings_dict['NAME']
+        target = connections[alias].settings_dict['NAME']
+        while True:
+            started = time.perf_counter()
+            # Копия содержит всё, что было зафиксировано до её начала.
+            synced = time.time()
+            copy_database(source, target)
+            mark_synced(alias, synced)
+            self.stdout.write(
+                f'{source} → {target}: '
+                f'{(time.perf_counter() - started) * 1000:.0f} мс')
+            if not options['interval']:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,154 @@
+"""Замеры времени запроса для заголовка Server-Timing.
+
+Для каждого запроса считаются число и время SQL-запросов (через
+connection.execute_wrapper), время рендеринга шаблонов и время
+sorl-thumbnail. Итог уходит в заголовок Server-Timing и одной строкой
+JSON в лог под именем URL.
+
+Шаблоны и миниатюры замеряются обёртками над Template.render и
+ThumbnailBackend.get_thumbnail; обёртки ставятся, только когда
+SERVER_TIMING включён, а вне запроса сводятся к одной проверке
+ContextVar. При выключенном SERVER_TIMING middleware убирается из цепочки
+целиком (MiddlewareNotUsed).
+
+Интервалы пересекаются: ленивые querysets выполняются во время
+рендеринга, поэтому их SQL входит и в db, и в tpl. Тело потоковых ответов
+отдаётся уже после замеров и в них не попадает.
+
+ReplicaRoutingMiddleware решает, можно ли запросу читать с реплик
+(см. core.db).
+"""
+import json
+import logging
+import time
+from contextlib import ExitStack
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.template.base import Template
+from sorl.thumbnail.base import ThumbnailBackend
+
+from .db import STICKY_COOKIE, replica_reads
+
+logger = logging.getLogger(__name__)
+
+_timings = ContextVar('server_timings', default=None)
+
+
+class Timings:
+    def __init__(self):
+        self.db_queries = 0
+        self.db = 0.0
+        self.template = 0.0
+        self.thumbnail = 0.0
+        # Вложенные вызовы (include, миниатюра внутри шаблона тега)
+        # не должны считаться дважды.
+        self.depth = {'template': 0, 'thumbnail': 0}
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db += time.perf_counter() - started
+            self.db_queries += 1
+
+
+def timed(kind):
+    """Обёртка, добавляющая время вызова к текущему запросу."""
+    def decorator(func):
+        @wraps(func)
+        def inner(*args, **kwargs):
+            timings = _timings.get()
+            if timings is None or timings.depth[kind]:
+                return func(*args, **kwargs)
+            timings.depth[kind] += 1
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                timings.depth[kind] -= 1
+                setattr(timings, kind, getattr(timings, kind)
+                        + time.perf_counter() - started)
+        inner.server_timing = True
+        return inner
+    return decorator
+
+
+def install_hooks():
+    if not getattr(Template.render, 'server_timing', False):
+        Template.render = timed('template')(Template.render)
+    if not getattr(ThumbnailBackend.get_thumbnail, 'server_timing', False):
+        ThumbnailBackend.get_thumbnail = timed('thumbnail')(
+            ThumbnailBackend.get_thumbnail)
+
+
+class ServerTimingMiddleware:
+    def __init__(self, get_response):
+        if not settings.SERVER_TIMING:
+            raise MiddlewareNotUsed
+        install_hooks()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timings = Timings()
+        token = _timings.set(timings)
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(timings))
+                response = self.get_response(request)
+        finally:
+            _timings.reset(token)
+        total = time.perf_counter() - started
+        metrics = [
+            ('db', timings.db, f'{timings.db_queries} queries'),
+            ('tpl', timings.template, 'templates'),
+            ('thumb', timings.thumbnail, 'thumbnails'),
+            ('total', total, 'total'),
+        ]
+        response['Server-Timing'] = ', '.join(
+            f'{name};dur={seconds * 1000:.1f};desc="{desc}"'
+            for name, seconds, desc in metrics)
+        match = request.resolver_match
+        logger.info(json.dumps({
+            'url_name': match.view_name if match else None,
+            'method': request.method,
+            'status': response.status_code,
+            'total_ms': round(total * 1000, 1),
+            'db_ms': round(timings.db * 1000, 1),
+            'db_queries': timings.db_queries,
+            'template_ms': round(timings.template * 1000, 1),
+            'thumbnail_ms': round(timings.thumbnail * 1000, 1),
+        }))
+        return response
+
+
+class ReplicaRoutingMiddleware:
+    """Чтение с реплик для GET/HEAD, основная база после записи.
+
+    После запроса, который мог что-то записать, пользователь получает
+    cookie на REPLICA_STICKY_SECONDS: пока реплики догоняют, его запросы
+    читают основную базу и видят только что созданные посты и
+    комментарии.
+    """
+
+    def __init__(self, get_response):
+        if not settings.DATABASE_REPLICAS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        safe = request.method in ('GET', 'HEAD', 'OPTIONS')
+        sticky = STICKY_COOKIE in request.COOKIES
+        with replica_reads(safe and not sticky):
+            response = self.get_response(request)
+        if not safe or getattr(request, 'wrote_to_primary', False):
+            response.set_cookie(
+                STICKY_COOKIE, '1', max_age=settings.REPLICA_STICKY_SECONDS,
+                httponly=True, samesite='Lax')
+        return response
@@ -0,0 +1,10 @@
+from core.cache import get_generations
+from django import template
+
+register = template.Library()
+
+
+@register.simple_tag
+def generation(*parts):
+    """Поколение счётчика, имя которого собрано из частей через ':'."""
+    return get_generations(':'.join(str(part) for part in parts))
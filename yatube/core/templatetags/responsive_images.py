@@ -0,0 +1,37 @@
+from core.images import variant_size, variant_srcsets
+from django import template
+from django.conf import settings
+from django.utils.html import format_html, format_html_join
+from sorl.thumbnail import get_thumbnail
+
+register = template.Library()
+
+
+@register.simple_tag
+def responsive_image(image, css_class='card-img my-2', alt=''):
+    """<picture> с заранее нарезанными вариантами картинки.
+
+    Пока варианты не нарезаны, выводит обычную миниатюру sorl-thumbnail
+    первого размера из THUMBNAIL_PRESETS.
+    """
+    if not image:
+        return ''
+    srcsets = variant_srcsets(image.name)
+    if srcsets is None:
+        geometry, options = settings.THUMBNAIL_PRESETS[0]
+        thumbnail = get_thumbnail(image, geometry, **options)
+        return format_html(
+            '<img class="{}" src="{}" width="{}" height="{}" alt="{}">',
+            css_class, thumbnail.url, thumbnail.width, thumbnail.height, alt)
+    *sources, (_, fallback_srcset) = srcsets
+    width, height = variant_size(max(settings.IMAGE_VARIANT_WIDTHS))
+    fallback_src = fallback_srcset.split(', ')[-1].rsplit(' ', 1)[0]
+    return format_html(
+        '<picture>{}<img class="{}" src="{}" srcset="{}" sizes="{}" '
+        'width="{}" height="{}" loading="lazy" alt="{}"></picture>',
+        format_html_join(
+            '', '<source type="{}" srcset="{}" sizes="{}">',
+            ((mime_type, srcset, settings.IMAGE_VARIANT_SIZES)
+             for mime_type, srcset in sources)),
+        css_class, fallback_src, fallback_srcset,
+        settings.IMAGE_VARIANT_SIZES, width, height, alt)
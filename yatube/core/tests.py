@@ -0,0 +1,313 @@
+import json
+import logging
+import multiprocessing
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+from datetime import timedelta
+from io import StringIO
+
+from core.db import (STICKY_COOKIE, mark_synced, primary_if_behind,
+                     replica_reads, synced_key, use_primary)
+from core.management.commands.sync_replica import copy_database
+from core.middleware import ReplicaRoutingMiddleware
+from core.utils import bulk_batch_size
+from django.contrib.sessions.models import Session
+from django.core.cache import cache, caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection, router
+from django.db.backends.sqlite3.base import DatabaseWrapper
+from django.http import HttpResponse
+from django.test import (RequestFactory, SimpleTestCase, TestCase,
+                         override_settings)
+from django.urls import reverse
+from django.utils import timezone
+from posts.models import Follow, Post, User
+from tasks.models import Task
+
+def increment_many(times):
+    cache = caches['shared']
+    for _ in range(times):
+        cache.incr('counter')
+
+
+class SQLiteCacheTest(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.cache_dir = tempfile.mkdtemp()
+        cls.cache_settings = override_settings(CACHES={
+            'default': {
+                'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            },
+            'shared': {
+                'BACKEND': 'core.cache_backends.SQLiteCache',
+                'LOCATION': os.path.join(cls.cache_dir, 'cache.sqlite3'),
+                'OPTIONS': {'MAX_ENTRIES': 10, 'CULL_FREQUENCY': 2},
+            },
+        })
+        cls.cache_settings.enable()
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        cls.cache_settings.disable()
+        shutil.rmtree(cls.cache_dir, ignore_errors=True)
+
+    def setUp(self):
+        self.cache = caches['shared']
+        self.cache.clear()
+
+    def test_get_set_delete(self):
+        """Значения сохраняются, читаются и удаляются."""
+        self.cache.set('key', {'value': [1, 2]})
+        self.assertEqual(self.cache.get('key'), {'value': [1, 2]})
+        self.assertEqual(
+            self.cache.get_many(['key', 'missing']),
+            {'key': {'value': [1, 2]}})
+        self.cache.delete('key')
+        self.assertIsNone(self.cache.get('key'))
+
+    def test_add_and_expiry(self):
+        """add не перезаписывает живой ключ, просроченный — перезаписывает."""
+        self.assertTrue(self.cache.add('key', 'first', 0.2))
+        self.assertFalse(self.cache.add('key', 'second'))
+        self.assertEqual(self.cache.get('key'), 'first')
+        time.sleep(0.3)
+        self.assertFalse(self.cache.has_key('key'))
+        self.assertTrue(self.cache.add('key', 'third'))
+        self.assertEqual(self.cache.get('key'), 'third')
+
+    def test_incr_decr(self):
+        """incr и decr меняют целые значения и падают без ключа."""
+        self.cache.set('counter', 10)
+        self.assertEqual(self.cache.incr('counter', 5), 15)
+        self.assertEqual(self.cache.decr('counter'), 14)
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+
+    def test_incr_is_atomic_across_processes(self):
+        """Увеличения из разных процессов не теряются."""
+        self.cache.set('counter', 0)
+        context = multiprocessing.get_context('fork')
+        workers = [
+            context.Process(target=increment_many, args=(50,))
+            for _ in range(4)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        self.assertEqual(self.cache.get('counter'), 200)
+
+    def test_lru_eviction(self):
+        """При переполнении вытесняются давно не читавшиеся записи."""
+        self.cache.cull_check_interval = 1
+        self.cache.lru_resolution = 0
+        self.cache.set('hot', 'value')
+        for i in range(20):
+            self.cache.set(f'cold:{i}', i)
+            self.cache.get('hot')
+        self.assertEqual(self.cache.get('hot'), 'value')
+        remaining = self.cache.get_many([f'cold:{i}' for i in range(20)])
+        self.assertLessEqual(len(remaining), 10)
+        self.assertIn('cold:19', remaining)
+
+
+class BulkBatchSizeTest(TestCase):
+    def test_large_batch_is_capped(self):
+        """Пачка больше предела базы вставляется без ошибки."""
+        User.objects.bulk_create(
+            [User(username=f'batch_{i}') for i in range(700)])
+        users = list(User.objects.order_by('pk')[:700])
+        follows = [
+            Follow(user=users[0], author=author) for author in users[1:]
+        ]
+        Follow.objects.bulk_create(
+            follows, batch_size=bulk_batch_size(Follow, 1000))
+        self.assertEqual(Follow.objects.count(), 699)
+        self.assertLessEqual(bulk_batch_size(Follow, 1000), 1000)
+        self.assertEqual(bulk_batch_size(Follow, 10), 10)
+
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C\x0A\x00\x3B'
+)
+
+
+@override_settings(THUMBNAIL_PREGENERATE=False)
+class ServerTimingTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.media_root = tempfile.mkdtemp()
+        cls.media_settings = override_settings(MEDIA_ROOT=cls.media_root)
+        cls.media_settings.enable()
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='timing_author')
+        cls.post = Post.objects.create(
+            text='Пост', author=cls.author,
+            image=SimpleUploadedFile('timing.gif', SMALL_GIF, 'image/gif'))
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        cls.media_settings.disable()
+        shutil.rmtree(cls.media_root, ignore_errors=True)
+
+    def test_disabled_by_default(self):
+        response = self.client.get(reverse('posts:index'))
+        self.assertFalse(response.has_header('Server-Timing'))
+
+    @override_settings(SERVER_TIMING=True)
+    def test_header_and_log(self):
+        """Заголовок и строка лога содержат SQL, шаблоны и миниатюры."""
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        with self.assertLogs('core.middleware', 'INFO') as logs:
+            response = self.client.get(url)
+        header = response['Server-Timing']
+        for name in ('db', 'tpl', 'thumb', 'total'):
+            self.assertIn(f'{name};dur=', header)
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record['url_name'], 'posts:post_detail')
+        self.assertEqual(record['status'], 200)
+        self.assertGreater(record['db_queries'], 0)
+        self.assertIn(f'desc="{record["db_queries"]} queries"', header)
+        self.assertGreater(record['template_ms'], 0)
+        self.assertGreater(record['thumbnail_ms'], 0)
+        self.assertLessEqual(record['template_ms'], record['total_ms'])
+
+    @override_settings(SERVER_TIMING=True)
+    def test_log_reaches_console(self):
+        """Настройка LOGGING выводит строку замеров, а не отбрасывает её."""
+        handler, = logging.getLogger('core.middleware').handlers
+        stream = StringIO()
+        previous = handler.setStream(stream)
+        self.addCleanup(handler.setStream, previous)
+        self.client.get(reverse('posts:index'))
+        record = json.loads(stream.getvalue().splitlines()[-1])
+        self.assertEqual(record['url_name'], 'posts:index')
+
+
+class SQLitePragmasTest(SimpleTestCase):
+    def test_new_connection_is_tuned(self):
+        """Новое подключение к файлу базы получает WAL и остальные PRAGMA."""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        settings_dict = dict(
+            connection.settings_dict,
+            NAME=os.path.join(directory, 'tuned.sqlite3'))
+        wrapper = DatabaseWrapper(settings_dict, alias='tuned')
+        self.addCleanup(wrapper.close)
+        with wrapper.cursor() as cursor:
+            values = {}
+            for name in ('journal_mode', 'synchronous', 'busy_timeout',
+                         'cache_size'):
+                cursor.execute(f'PRAGMA {name}')
+                values[name] = cursor.fetchone()[0]
+        self.assertEqual(values, {
+            'journal_mode': 'wal',
+            # NORMAL
+            'synchronous': 1,
+            'busy_timeout': 5000,
+            'cache_size': -64000,
+        })
+
+    def test_database_can_override_pragmas(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        settings_dict = dict(
+            connection.settings_dict,
+            NAME=os.path.join(directory, 'readonly.sqlite3'),
+            PRAGMAS={'query_only': 1})
+        wrapper = DatabaseWrapper(settings_dict, alias='readonly')
+        self.addCleanup(wrapper.close)
+        with wrapper.cursor() as cursor:
+            cursor.execute('PRAGMA query_only')
+            self.assertEqual(cursor.fetchone()[0], 1)
+            cursor.execute('PRAGMA journal_mode')
+            self.assertEqual(cursor.fetchone()[0], 'delete')
+
+
+@override_settings(DATABASE_REPLICAS=['replica'], REPLICA_STICKY_SECONDS=5)
+class ReplicaRoutingTest(SimpleTestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.read_from = []
+
+    def view(self, request):
+        self.read_from.append(router.db_for_read(Post))
+        return HttpResponse()
+
+    def test_safe_requests_read_from_replica(self):
+        middleware = ReplicaRoutingMiddleware(self.view)
+        response = middleware(self.factory.get('/'))
+        self.assertEqual(self.read_from, ['replica'])
+        self.assertNotIn(STICKY_COOKIE, response.cookies)
+        self.assertEqual(router.db_for_write(Post), 'default')
+
+    def test_write_sticks_to_primary(self):
+        """После POST чтение идёт с основной базы, пока жива cookie."""
+        middleware = ReplicaRoutingMiddleware(self.view)
+        response = middleware(self.factory.post('/'))
+        self.assertEqual(response.cookies[STICKY_COOKIE]['max-age'], 5)
+        request = self.factory.get('/')
+        request.COOKIES[STICKY_COOKIE] = '1'
+        middleware(request)
+        self.assertEqual(self.read_from, ['default', 'default'])
+
+    def test_use_primary_view(self):
+        """GET-представление, которое пишет в базу, читает основную."""
+        middleware = ReplicaRoutingMiddleware(use_primary(self.view))
+        response = middleware(self.factory.get('/'))
+        self.assertEqual(self.read_from, ['default'])
+        self.assertIn(STICKY_COOKIE, response.cookies)
+
+    def test_session_auth_and_tasks_read_from_primary(self):
+        for model in (Session, User, Task):
+            with self.subTest(model=model.__name__), replica_reads():
+                self.assertEqual(router.db_for_read(model), 'default')
+        with replica_reads():
+            self.assertEqual(router.db_for_read(Post), 'replica')
+
+    def test_pages_changed_after_sync_read_from_primary(self):
+        """Страница новее копии реплики читается с основной базы."""
+        cache.delete(synced_key('replica'))
+        changed = timezone.now()
+        with replica_reads():
+            with primary_if_behind(changed):
+                self.assertEqual(router.db_for_read(Post), 'default')
+            mark_synced('replica', time.time())
+            with primary_if_behind(changed):
+                self.assertEqual(router.db_for_read(Post), 'default')
+            with primary_if_behind(changed - timedelta(minutes=1)):
+                self.assertEqual(router.db_for_read(Post), 'replica')
+
+    def test_reads_outside_requests_use_primary(self):
+        self.assertEqual(router.db_for_read(Post), 'default')
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_no_replicas(self):
+        self.assertFalse(router.allow_migrate('replica', 'posts'))
+        self.assertTrue(router.allow_migrate('default', 'posts'))
+        self.assertEqual(router.db_for_read(Post), 'default')
+
+    def test_sync_replica_copies_primary(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        source = os.path.join(directory, 'primary.sqlite3')
+        target = os.path.join(directory, 'replica.sqlite3')
+        primary = sqlite3.connect(source)
+        self.addCleanup(primary.close)
+        primary.execute('CREATE TABLE post (text TEXT)')
+        primary.execute("INSERT INTO post VALUES ('первый')")
+        primary.commit()
+        copy_database(source, target)
+        replica = sqlite3.connect(target)
+        self.addCleanup(replica.close)
+        self.assertEqual(
+            replica.execute('SELECT text FROM post').fetchall(),
+            [('первый',)])
@@ -1,9 +1,187 @@
+import base64
+import binascii
+
+from django.conf import settings
 from django.core.paginator import Paginator
+from django.db import connections, router
+from django.db.models import AutoField, Q
+from django.utils.dateparse import parse_datetime
+
+# Сколько значений передавать в одном IN.
+IN_BATCH_SIZE = 500
+
+
+def bulk_batch_size(model, batch_size):
+    """batch_size для bulk_create, урезанный до предела базы.
+
+    Django 2.2 не ограничивает явный batch_size возможностями бэкенда, и
+    на SQLite пачка больше 500 строк падает с «too many terms in
+    compound SELECT».
+    """
+    fields = [
+        field for field in model._meta.concrete_fields
+        if not isinstance(field, AutoField)
+    ]
+    ops = connections[router.db_for_write(model)].ops
+    return min(batch_size, max(ops.bulk_batch_size(fields, []), 1))
 
-from yatube.settings import POSTS_COUNT
+
+def filter_in(queryset, values, field='pk'):
+    """queryset целиком (values is None) или частями с field из values.
+
+    Частями — чтобы IN не упёрся в предел числа параметров SQLite.
+    """
+    if values is None:
+        yield queryset
+        return
+    values = list(values)
+    for start in range(0, len(values), IN_BATCH_SIZE):
+        yield queryset.filter(
+            **{f'{field}__in': values[start:start + IN_BATCH_SIZE]})
 
 
 def paginator(request, posts):
-    paginator = Paginator(posts, POSTS_COUNT)
+    if (settings.PAGINATION_MODE == 'cursor'
+            or 'cursor' in request.GET):
+        return cursor_paginator(request, posts)
+    paginator = Paginator(posts, settings.POSTS_COUNT)
     page_number = request.GET.get('page')
     return paginator.get_page(page_number)
+
+
+def cursor_paginator(request, posts, per_page=None):
+    paginator = CursorPaginator(posts, per_page or settings.POSTS_COUNT)
+    return paginator.get_page(request.GET.get('cursor'))
+
+
+def encode_cursor(values, reverse=False):
+    raw = '|'.join(['-' if reverse else '+'] + [str(v) for v in values])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Возвращает пару (reverse, values) или None для битого курсора."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode()).decode()
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+    direction, *values = raw.split('|')
+    if direction not in ('+', '-'):
+        return None
+    return direction == '-', values
+
+
+class CursorPage:
+    """Страница keyset-пагинации.
+
+    Повторяет ту часть интерфейса django.core.paginator.Page,
+    которой пользуются шаблоны, но без номеров страниц.
+    """
+    is_cursor = True
+
+    def __init__(self, object_list, paginator, next_cursor=None,
+                 previous_cursor=None):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __repr__(self):
+        return (f'<CursorPage {self.previous_cursor or ""}'
+                f':{self.next_cursor or ""}>')
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class CursorPaginator:
+    """Keyset-пагинация по паре полей (по умолчанию pub_date, id).
+
+    Каждая страница — один запрос с условием по диапазону ключа,
+    без OFFSET и без COUNT(*), поэтому глубина страницы не влияет
+    на стоимость запроса.
+    """
+
+    def __init__(self, object_list, per_page, ordering=('pub_date', 'id')):
+        self.object_list = object_list
+        self.per_page = int(per_page)
+        self.ordering = ordering
+
+    def _key(self, obj):
+        # Строки страницы — модели или словари из values().
+        if isinstance(obj, dict):
+            value, pk = (obj[field] for field in self.ordering)
+        else:
+            value, pk = (getattr(obj, field) for field in self.ordering)
+        return value.isoformat(), pk
+
+    def _parse(self, values):
+        if len(values) != 2:
+            return None
+        value, pk = parse_datetime(values[0]), values[1]
+        if value is None or not pk.isdigit():
+            return None
+        return value, int(pk)
+
+    def parse_cursor(self, cursor):
+        """Пара (key, reverse); битый курсор — первая страница."""
+        key, reverse = None, False
+        if cursor:
+            decoded = decode_cursor(cursor)
+            if decoded is not None:
+                reverse, values = decoded
+                key = self._parse(values)
+            if key is None:
+                reverse = False
+        return key, reverse
+
+    def fetch(self, queryset, key, reverse, ordering=None):
+        """До per_page + 1 строк за ключом в порядке обхода."""
+        field, tiebreaker = ordering or self.ordering
+        if key is not None:
+            lookup = 'gt' if reverse else 'lt'
+            queryset = queryset.filter(
+                Q(**{f'{field}__{lookup}': key[0]})
+                | Q(**{field: key[0], f'{tiebreaker}__{lookup}': key[1]})
+            )
+        if reverse:
+            queryset = queryset.order_by(field, tiebreaker)
+        else:
+            queryset = queryset.order_by(f'-{field}', f'-{tiebreaker}')
+        return list(queryset[:self.per_page + 1])
+
+    def page(self, rows, key, reverse):
+        """Страница из строк fetch: обрезка, порядок и курсоры."""
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if reverse:
+            rows.reverse()
+        next_cursor = previous_cursor = None
+        if rows:
+            if has_more or reverse:
+                next_cursor = encode_cursor(self._key(rows[-1]))
+            if key is not None and (has_more or not reverse):
+                previous_cursor = encode_cursor(
+                    self._key(rows[0]), reverse=True)
+        return CursorPage(rows, self, next_cursor, previous_cursor)
+
+    def get_page(self, cursor=None):
+        key, reverse = self.parse_cursor(cursor)
+        return self.page(
+            self.fetch(self.object_list, key, reverse), key, reverse)
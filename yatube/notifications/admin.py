@@ -0,0 +1,27 @@
+from django.contrib import admin
+
+from .models import NotificationSettings, PostNotification
+
+
+@admin.register(NotificationSettings)
+class NotificationSettingsAdmin(admin.ModelAdmin):
+    list_display = (
+        'pk',
+        'user',
+        'frequency',
+        'last_sent'
+    )
+    list_filter = ('frequency',)
+    search_fields = ('user__username',)
+
+
+@admin.register(PostNotification)
+class PostNotificationAdmin(admin.ModelAdmin):
+    list_display = (
+        'pk',
+        'user',
+        'post',
+        'created'
+    )
+    list_select_related = ('user', 'post')
+    search_fields = ('user__username',)
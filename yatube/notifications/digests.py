@@ -0,0 +1,120 @@
+"""Сводки новых постов для подписчиков.
+
+Новый пост не рассылается сразу: фоновая задача записывает по строке
+PostNotification на каждого подписчика автора, а команда send_digests,
+запускаемая по расписанию, собирает накопившиеся строки в одно письмо
+на пользователя с учётом его частоты (NotificationSettings). Письма
+пачки из NOTIFICATION_BATCH_SIZE пользователей уходят через одно
+подключение к почтовому серверу (send_mass_mail).
+"""
+from core.utils import bulk_batch_size
+from django.conf import settings
+from django.core.mail import get_connection, send_mass_mail
+from django.template.loader import render_to_string
+from django.utils import timezone
+from posts.models import Follow
+
+from .models import NotificationSettings, PostNotification
+
+
+def record_new_post(post_id, author_id):
+    """Записывает пост в очередь сводок подписчиков автора."""
+    muted = NotificationSettings.objects.filter(
+        frequency=NotificationSettings.NEVER).values('user_id')
+    followers = Follow.objects.filter(author_id=author_id).exclude(
+        user_id__in=muted).values_list('user_id', flat=True)
+    batch_size = bulk_batch_size(
+        PostNotification, settings.NOTIFICATION_BATCH_SIZE)
+    batch = []
+    for user_id in followers.iterator():
+        batch.append(PostNotification(user_id=user_id, post_id=post_id))
+        if len(batch) == batch_size:
+            PostNotification.objects.bulk_create(
+                batch, ignore_conflicts=True)
+            batch = []
+    PostNotification.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def is_due(frequency, last_sent, now):
+    if frequency == NotificationSettings.NEVER:
+        return False
+    period = NotificationSettings.PERIODS[frequency]
+    return last_sent is None or last_sent + period <= now
+
+
+def due_users(user_ids, now):
+    """Пользователи из user_ids, которым пора отправить сводку."""
+    known = {
+        user_id: (frequency, last_sent)
+        for user_id, frequency, last_sent in
+        NotificationSettings.objects.filter(user_id__in=user_ids).values_list(
+            'user_id', 'frequency', 'last_sent')
+    }
+    default = (NotificationSettings.DAILY, None)
+    return [
+        user_id for user_id in user_ids
+        if is_due(*known.get(user_id, default), now)
+    ]
+
+
+def build_message(user, notifications):
+    shown = notifications[:settings.NOTIFICATION_DIGEST_POSTS]
+    context = {
+        'user': user,
+        'posts': [notification.post for notification in shown],
+        'more': len(notifications) - len(shown),
+        'site_url': settings.SITE_URL,
+    }
+    subject = render_to_string(
+        'notifications/digest_subject.txt', context).strip()
+    body = render_to_string('notifications/digest.txt', context)
+    return subject, body, settings.DEFAULT_FROM_EMAIL, [user.email]
+
+
+def send_batch(user_ids, now):
+    """Отправляет сводки пользователям пачки; возвращает число писем."""
+    notifications = PostNotification.objects.filter(
+        user_id__in=user_ids).select_related(
+        'user', 'post__author', 'post__group').order_by(
+        'user_id', '-post__pub_date', '-post_id')
+    by_user = {}
+    for notification in notifications:
+        by_user.setdefault(notification.user_id, []).append(notification)
+    last_id = max(
+        (item.pk for items in by_user.values() for item in items),
+        default=0)
+    messages = [
+        build_message(items[0].user, items)
+        for items in by_user.values() if items[0].user.email
+    ]
+    if messages:
+        # Одно подключение к SMTP на всю пачку.
+        send_mass_mail(messages, connection=get_connection())
+    # Строки, пришедшие во время отправки, дождутся следующей сводки.
+    PostNotification.objects.filter(
+        user_id__in=user_ids, pk__lte=last_id).delete()
+    NotificationSettings.objects.filter(
+        user_id__in=user_ids).update(last_sent=now)
+    NotificationSettings.objects.bulk_create(
+        [NotificationSettings(user_id=user_id, last_sent=now)
+         for user_id in user_ids],
+        ignore_conflicts=True)
+    return len(messages)
+
+
+def send_digests(batch_size=None):
+    """Отправляет все сводки, которым подошёл срок."""
+    batch_size = batch_size or settings.NOTIFICATION_BATCH_SIZE
+    now = timezone.now()
+    # Отказавшиеся от писем не получат и уже накопленное.
+    PostNotification.objects.filter(
+        user__notification_settings__frequency=NotificationSettings.NEVER
+    ).delete()
+    pending = list(PostNotification.objects.order_by('user_id').values_list(
+        'user_id', flat=True).distinct())
+    sent = 0
+    for start in range(0, len(pending), batch_size):
+        user_ids = due_users(pending[start:start + batch_size], now)
+        if user_ids:
+            sent += send_batch(user_ids, now)
+    return sent
@@ -0,0 +1,9 @@
+from django.forms import ModelForm
+
+from .models import NotificationSettings
+
+
+class NotificationSettingsForm(ModelForm):
+    class Meta:
+        model = NotificationSettings
+        fields = ('frequency',)
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from notifications.digests import send_digests
+
+
+class Command(BaseCommand):
+    help = ('Рассылает сводки новых постов тем, кому подошёл срок; '
+            'запускается по расписанию, например раз в час')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int,
+            help='пользователей на одно подключение к почтовому серверу')
+
+    def handle(self, *args, **options):
+        sent = send_digests(options['batch_size'])
+        self.stdout.write(f'Отправлено сводок: {sent}')
@@ -0,0 +1,44 @@
+# Generated by Django 2.2.16 on 2026-10-18 20:25
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('posts', '0013_post_search'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostNotification',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='posts.Post')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='post_notifications', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='NotificationSettings',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('frequency', models.CharField(choices=[('never', 'Не присылать'), ('hourly', 'Раз в час'), ('daily', 'Раз в день'), ('weekly', 'Раз в неделю')], default='daily', help_text='Как часто присылать сводку постов авторов из подписок', max_length=10, verbose_name='Письма о новых постах')),
+                ('last_sent', models.DateTimeField(blank=True, null=True, verbose_name='Последняя сводка')),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='notification_settings', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Настройки уведомлений',
+                'verbose_name_plural': 'Настройки уведомлений',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='postnotification',
+            constraint=models.UniqueConstraint(fields=('user', 'post'), name='unique post notifications'),
+        ),
+    ]
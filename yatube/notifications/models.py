@@ -0,0 +1,72 @@
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.db import models
+from posts.models import Post
+
+User = get_user_model()
+
+
+class NotificationSettings(models.Model):
+    NEVER = 'never'
+    HOURLY = 'hourly'
+    DAILY = 'daily'
+    WEEKLY = 'weekly'
+    FREQUENCIES = (
+        (NEVER, 'Не присылать'),
+        (HOURLY, 'Раз в час'),
+        (DAILY, 'Раз в день'),
+        (WEEKLY, 'Раз в неделю'),
+    )
+    PERIODS = {
+        HOURLY: timedelta(hours=1),
+        DAILY: timedelta(days=1),
+        WEEKLY: timedelta(weeks=1),
+    }
+
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        related_name='notification_settings'
+    )
+    frequency = models.CharField(
+        'Письма о новых постах',
+        max_length=10,
+        choices=FREQUENCIES,
+        default=DAILY,
+        help_text='Как часто присылать сводку постов авторов из подписок'
+    )
+    last_sent = models.DateTimeField(
+        'Последняя сводка',
+        null=True,
+        blank=True
+    )
+
+    def __str__(self):
+        return f'{self.user}: {self.frequency}'
+
+    class Meta:
+        verbose_name = 'Настройки уведомлений'
+        verbose_name_plural = 'Настройки уведомлений'
+
+
+class PostNotification(models.Model):
+    """Новый пост автора, о котором подписчик ещё не получил письмо."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='post_notifications'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'],
+                name='unique post notifications'),
+        ]
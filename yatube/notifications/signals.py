@@ -0,0 +1,14 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from posts.models import Post
+
+from .tasks import record_new_post
+
+
+@receiver(post_save, sender=Post)
+def post_created(sender, instance, created, **kwargs):
+    # Подписчиков может быть много: строки пишет воркер, а не запрос.
+    if created:
+        record_new_post.enqueue(
+            instance.pk, instance.author_id,
+            key=f'notifications:post:{instance.pk}')
@@ -0,0 +1,8 @@
+from tasks.queue import task
+
+from . import digests
+
+
+@task
+def record_new_post(post_id, author_id):
+    digests.record_new_post(post_id, author_id)
@@ -0,0 +1,117 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core import mail
+from django.core.mail.backends import locmem
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from posts.models import Follow, Post, User
+from tasks import worker
+
+from .digests import send_digests
+from .models import NotificationSettings, PostNotification
+
+
+class CountingBackend(locmem.EmailBackend):
+    connections = 0
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        CountingBackend.connections += 1
+
+
+@override_settings(SITE_URL='http://yatube.test')
+class DigestTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(
+            username='digest_author', first_name='Лев', last_name='Толстой')
+        cls.other = User.objects.create_user(username='digest_other')
+        cls.readers = [
+            User.objects.create_user(
+                username=f'digest_reader{i}',
+                email=f'reader{i}@example.com')
+            for i in range(3)
+        ]
+        for reader in cls.readers:
+            Follow.objects.create(user=reader, author=cls.author)
+        Follow.objects.create(user=cls.readers[0], author=cls.other)
+        NotificationSettings.objects.create(
+            user=cls.readers[2], frequency=NotificationSettings.NEVER)
+
+    def publish(self, author, text):
+        post = Post.objects.create(author=author, text=text)
+        worker.work('test', burst=True)
+        return post
+
+    def test_new_post_is_recorded_for_followers(self):
+        """Пост попадает в очередь сводок всех подписчиков, кроме
+        отказавшихся от писем."""
+        post = self.publish(self.author, 'Новый пост')
+        self.assertEqual(
+            set(PostNotification.objects.filter(post=post).values_list(
+                'user_id', flat=True)),
+            {self.readers[0].pk, self.readers[1].pk})
+
+    def test_digest_groups_posts_per_user(self):
+        first = self.publish(self.author, 'Первый пост')
+        self.publish(self.other, 'Пост другого автора')
+        self.assertEqual(send_digests(), 2)
+        self.assertEqual(len(mail.outbox), 2)
+        message = next(
+            message for message in mail.outbox
+            if message.to == [self.readers[0].email])
+        self.assertIn('Лев Толстой', message.body)
+        self.assertIn('Пост другого автора', message.body)
+        self.assertIn(
+            'http://yatube.test'
+            + reverse('posts:post_detail', kwargs={'post_id': first.pk}),
+            message.body)
+        self.assertFalse(PostNotification.objects.exists())
+        # Без новых постов писем нет.
+        self.assertEqual(send_digests(), 0)
+
+    def test_frequency_is_respected(self):
+        NotificationSettings.objects.create(
+            user=self.readers[1], frequency=NotificationSettings.HOURLY,
+            last_sent=timezone.now() - timedelta(minutes=30))
+        self.publish(self.author, 'Пост')
+        self.assertEqual(send_digests(), 1)
+        self.assertEqual(mail.outbox[0].to, [self.readers[0].email])
+        # Отложенная сводка уходит, когда подходит срок.
+        NotificationSettings.objects.filter(user=self.readers[1]).update(
+            last_sent=timezone.now() - timedelta(hours=1))
+        self.assertEqual(send_digests(), 1)
+        self.assertEqual(mail.outbox[1].to, [self.readers[1].email])
+
+    @override_settings(
+        EMAIL_BACKEND='notifications.tests.CountingBackend')
+    def test_one_connection_per_batch(self):
+        CountingBackend.connections = 0
+        self.publish(self.author, 'Пост')
+        out = StringIO()
+        call_command('send_digests', stdout=out)
+        self.assertIn('Отправлено сводок: 2', out.getvalue())
+        self.assertEqual(CountingBackend.connections, 1)
+        self.publish(self.author, 'Ещё пост')
+        NotificationSettings.objects.update(last_sent=None)
+        call_command('send_digests', batch_size=1, stdout=out)
+        self.assertEqual(CountingBackend.connections, 3)
+
+    def test_settings_page(self):
+        reader = self.readers[0]
+        self.client.force_login(reader)
+        url = reverse('notifications:settings')
+        response = self.client.get(url)
+        self.assertEqual(
+            response.context['form'].initial['frequency'],
+            NotificationSettings.DAILY)
+        response = self.client.post(
+            url, {'frequency': NotificationSettings.WEEKLY})
+        self.assertRedirects(response, url)
+        self.assertEqual(
+            reader.notification_settings.frequency,
+            NotificationSettings.WEEKLY)
@@ -0,0 +1,22 @@
+from django.contrib.auth.decorators import login_required
+from django.shortcuts import redirect, render
+
+from .forms import NotificationSettingsForm
+from .models import NotificationSettings
+
+
+@login_required
+def notification_settings(request):
+    instance = NotificationSettings.objects.filter(
+        user=request.user).first()
+    form = NotificationSettingsForm(
+        request.POST or None,
+        instance=instance or NotificationSettings(user=request.user))
+    if form.is_valid():
+        form.save()
+        return redirect('notifications:settings')
+    context = {
+        'form': form,
+        'title': 'Уведомления',
+    }
+    return render(request, 'notifications/settings.html', context)
@@ -1,6 +1,7 @@
 from django.contrib import admin
 
 from .models import Comment, Follow, Group, Post
+from .search import search_posts
 
 
 @admin.register(Group)
@@ -30,6 +31,12 @@ class PostAdmin(admin.ModelAdmin):
     list_filter = ('pub_date',)
     empty_value_display = '-пусто-'
 
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term:
+            return queryset, False
+        found = search_posts(search_term).values('pk')
+        return queryset.filter(pk__in=found), False
+
 
 @admin.register(Comment)
 class CommentAdmin(admin.ModelAdmin):
@@ -0,0 +1,249 @@
+"""Нагрузочные замеры страниц приложения posts.
+
+Данные генерируются Faker с фиксированным зерном и пишутся bulk_create,
+поэтому при одинаковых параметрах база получается одной и той же.
+Страницы запрашиваются тестовым клиентом, ленты — и по номеру страницы,
+и по курсору; для каждой страницы фиксируются перцентили времени ответа,
+число запросов к базе и пик памяти (tracemalloc), а результаты
+сравниваются с сохранённой базовой линией.
+"""
+import random
+import statistics
+import time
+import tracemalloc
+from datetime import timedelta
+
+from core.utils import bulk_batch_size
+from django.core.cache import cache
+from django.db import connection, reset_queries
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from faker import Faker
+
+from . import counters, feed_cache, follow_graph, timeline, trending
+from .importer import bulk_create_dated
+from .models import Comment, Follow, Group, Post, User
+
+BENCH_USERNAME = 'bench_reader'
+GROUPS = 10
+POSTS_PER_USER = 20
+COMMENTS_PER_POST = 0.5
+FOLLOWS_PER_USER = 10
+BENCH_FOLLOWS = 50
+BATCH_SIZE = 1000
+
+LIST_VIEWS = ('index', 'group_posts', 'profile', 'follow_index', 'trending')
+VIEWS = LIST_VIEWS + ('post_detail',)
+# Ленты, которые листаются курсором; follow_index — только им.
+CURSOR_VIEWS = ('index', 'group_posts', 'profile', 'follow_index')
+
+
+class Seeder:
+    """Наращивает базу до заданного числа постов."""
+
+    def __init__(self, seed=0):
+        self.faker = Faker('ru_RU')
+        self.faker.seed_instance(seed)
+        self.random = random.Random(seed)
+
+    def users(self, count):
+        existing = User.objects.count()
+        if existing < count:
+            User.objects.bulk_create(
+                [User(username=f'bench_{i}',
+                      first_name=self.faker.first_name(),
+                      last_name=self.faker.last_name())
+                 for i in range(existing, count)],
+                batch_size=bulk_batch_size(User, BATCH_SIZE))
+        return list(User.objects.order_by('pk').values_list('pk', flat=True))
+
+    def groups(self):
+        existing = Group.objects.count()
+        Group.objects.bulk_create(
+            [Group(title=self.faker.catch_phrase(), slug=f'bench-{i}',
+                   description=self.faker.paragraph())
+             for i in range(existing, GROUPS)])
+        return list(Group.objects.values_list('pk', flat=True))
+
+    def seed(self, posts):
+        """Добавляет посты, комментарии и подписки до posts постов."""
+        missing = posts - Post.objects.count()
+        if missing <= 0:
+            return
+        if not User.objects.filter(username=BENCH_USERNAME).exists():
+            User.objects.create_user(BENCH_USERNAME)
+        user_ids = self.users(max(posts // POSTS_PER_USER, BENCH_FOLLOWS + 1))
+        group_ids = self.groups() + [None]
+        now = timezone.now()
+        for start in range(0, missing, BATCH_SIZE):
+            batch = min(BATCH_SIZE, missing - start)
+            bulk_create_dated(Post, [
+                Post(author_id=self.random.choice(user_ids),
+                     group_id=self.random.choice(group_ids),
+                     text=self.faker.paragraph(nb_sentences=5),
+                     pub_date=now - timedelta(
+                         minutes=self.random.randrange(posts * 10)))
+                for _ in range(batch)
+            ], 'pub_date', BATCH_SIZE)
+        post_ids = list(Post.objects.values_list('pk', flat=True))
+        comments = int(missing * COMMENTS_PER_POST)
+        for start in range(0, comments, BATCH_SIZE):
+            Comment.objects.bulk_create([
+                Comment(post_id=self.random.choice(post_ids),
+                        author_id=self.random.choice(user_ids),
+                        text=self.faker.sentence())
+                for _ in range(min(BATCH_SIZE, comments - start))
+            ])
+        reader = User.objects.get(username=BENCH_USERNAME)
+        follows = [
+            Follow(user_id=reader.pk, author_id=author_id)
+            for author_id in self.random.sample(user_ids, BENCH_FOLLOWS)
+            if author_id != reader.pk
+        ]
+        for user_id in user_ids:
+            follows.extend(
+                Follow(user_id=user_id, author_id=author_id)
+                for author_id in self.random.sample(
+                    user_ids, FOLLOWS_PER_USER)
+                if author_id != user_id)
+        Follow.objects.bulk_create(
+            follows, batch_size=bulk_batch_size(Follow, BATCH_SIZE),
+            ignore_conflicts=True)
+        counters.recount()
+        timeline.rebuild()
+        follow_graph.invalidate_all()
+        trending.compact()
+        feed_cache.invalidate_site()
+
+
+def cursor_url(client, url, page):
+    """Адрес страницы page, до которой дошли по курсорам от первой."""
+    cursor = ''
+    for _ in range(page - 1):
+        page_obj = client.get(url, {'cursor': cursor}).context['page_obj']
+        if not page_obj.has_next():
+            break
+        cursor = page_obj.next_cursor
+    return f'{url}?cursor={cursor}'
+
+
+def view_urls(client, view, pages):
+    """Пары (метка, адрес) для страницы на разных глубинах.
+
+    Глубину page ленты меряют и номером страницы, и курсором; адрес
+    курсорной страницы получается листанием ленты клиентом.
+    """
+    if view == 'post_detail':
+        # Пост с наибольшим числом комментариев — худший случай.
+        post_id = Post.objects.order_by('-comments_count', 'pk').values_list(
+            'pk', flat=True).first()
+        url = reverse('posts:post_detail', kwargs={'post_id': post_id})
+        return [('', url)]
+    if view == 'group_posts':
+        slug = Group.objects.order_by('pk').values_list(
+            'slug', flat=True).first()
+        url = reverse('posts:group_list', kwargs={'slug': slug})
+    elif view == 'profile':
+        username = User.objects.order_by(
+            '-stats__posts_count', 'pk').values_list(
+            'username', flat=True).first()
+        url = reverse('posts:profile', kwargs={'username': username})
+    else:
+        url = reverse(f'posts:{view}')
+    urls = []
+    if view != 'follow_index':
+        urls += [(f'page{page}', f'{url}?page={page}') for page in pages]
+    if view in CURSOR_VIEWS:
+        urls += [(f'cursor{page}', cursor_url(client, url, page))
+                 for page in pages]
+    return urls
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    index = min(len(values) - 1, round(fraction * (len(values) - 1)))
+    return values[index]
+
+
+def measure(client, url, repeat, warm=False):
+    """Метрики одной страницы; без warm кэш сбрасывается перед запросом."""
+    # Первый запрос загружает шаблоны и прогревает подключение.
+    client.get(url)
+    timings = []
+    for _ in range(repeat):
+        if not warm:
+            cache.clear()
+        reset_queries()
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            response = client.get(url)
+            timings.append((time.perf_counter() - started) * 1000)
+        # Журнал запросов очищается в начале каждого запроса к клиенту.
+        query_count = len(queries)
+        if response.status_code != 200:
+            raise RuntimeError(f'{url}: ответ {response.status_code}')
+    if not warm:
+        cache.clear()
+    tracemalloc.start()
+    try:
+        client.get(url)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {
+        'p50_ms': round(statistics.median(timings), 2),
+        'p95_ms': round(percentile(timings, 0.95), 2),
+        'p99_ms': round(percentile(timings, 0.99), 2),
+        'queries': query_count,
+        'peak_kb': round(peak / 1024),
+    }
+
+
+def run(sizes, pages, repeat, views=VIEWS, warm=False, seed=0,
+        progress=None):
+    """Замеры всех страниц на всех размерах; ключ — вид@размер/глубина."""
+    seeder = Seeder(seed)
+    client = Client()
+    results = {}
+    for size in sorted(sizes):
+        seeder.seed(size)
+        client.force_login(User.objects.get(username=BENCH_USERNAME))
+        for view in views:
+            for label, url in view_urls(client, view, pages):
+                name = f'{view}@{size}' + (f'/{label}' if label else '')
+                results[name] = measure(client, url, repeat, warm)
+                if progress:
+                    progress(name, results[name])
+    return results
+
+
+def compare(results, baseline, threshold, min_delta_ms):
+    """Список регрессий относительно базовой линии.
+
+    Время и память сравниваются с допуском threshold (доля), время ещё
+    и с абсолютным порогом min_delta_ms против шума; число запросов к
+    базе детерминировано и не должно расти вовсе.
+    """
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+        for metric in ('p50_ms', 'p95_ms'):
+            limit = max(previous[metric] * (1 + threshold),
+                        previous[metric] + min_delta_ms)
+            if current[metric] > limit:
+                regressions.append(
+                    f'{name}: {metric} {previous[metric]} → '
+                    f'{current[metric]}')
+        if current['queries'] > previous['queries']:
+            regressions.append(
+                f'{name}: запросов {previous["queries"]} → '
+                f'{current["queries"]}')
+        if current['peak_kb'] > previous['peak_kb'] * (1 + threshold):
+            regressions.append(
+                f'{name}: память {previous["peak_kb"]} КБ → '
+                f'{current["peak_kb"]} КБ')
+    return regressions
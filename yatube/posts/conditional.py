@@ -0,0 +1,95 @@
+"""Условные GET-запросы к лентам и страницам постов.
+
+ETag собирается из поколений кэша (см. feed_cache), пользователя и адреса
+страницы, Last-Modified — из времени последнего сдвига этих поколений.
+Для страниц с формами в ETag входит и CSRF-cookie вошедшего
+пользователя: после входа она меняется, и страница из кэша браузера с
+прежним токеном получила бы отказ при отправке формы.
+Совпавший If-None-Match или If-Modified-Since получает 304 до вызова
+представления: без запросов за постами и без рендеринга шаблона.
+Страница, изменившаяся после копирования реплик, читается с основной
+базы (см. core.db), чтобы ETag не указывал на устаревшие данные.
+"""
+import hashlib
+from functools import wraps
+
+from core.db import primary_if_behind
+from django.middleware.csrf import get_token
+from django.views.decorators.http import condition
+
+from . import feed_cache
+from .models import Group, Post, User
+
+
+def feed_condition(names_func, with_csrf=False):
+    """Декоратор; names_func(**kwargs) возвращает имена поколений страницы.
+
+    None вместо имён означает, что объекта нет: тогда заголовки не
+    ставятся и представление само ответит 404. Остальные аргументы
+    адреса (например, формат ленты) на имена не влияют — они и так
+    попадают в ETag через путь запроса. with_csrf ставится страницам,
+    которые показывают вошедшему пользователю форму с CSRF-токеном.
+    """
+    def names(request, **kwargs):
+        if not hasattr(request, '_feed_names'):
+            request._feed_names = names_func(**kwargs)
+        return request._feed_names
+
+    def etag(request, *args, **kwargs):
+        feed_names = names(request, **kwargs)
+        if feed_names is None:
+            return None
+        raw = (f'{feed_cache.version(feed_names)}:{request.user.pk}:'
+               f'{request.get_full_path()}')
+        if with_csrf and request.user.is_authenticated:
+            # get_token заводит cookie, если её ещё нет; сам токен
+            # каждый раз маскируется заново, поэтому берётся cookie.
+            get_token(request)
+            raw += f':{request.META["CSRF_COOKIE"]}'
+        return hashlib.md5(raw.encode()).hexdigest()
+
+    def last_modified(request, *args, **kwargs):
+        feed_names = names(request, **kwargs)
+        if feed_names is None:
+            return None
+        return feed_cache.last_modified(feed_names)
+
+    def decorator(view):
+        conditional = condition(
+            etag_func=etag, last_modified_func=last_modified)(view)
+
+        @wraps(view)
+        def inner(request, *args, **kwargs):
+            modified = last_modified(request, *args, **kwargs)
+            if modified is None:
+                return conditional(request, *args, **kwargs)
+            with primary_if_behind(modified):
+                return conditional(request, *args, **kwargs)
+        return inner
+    return decorator
+
+
+def index_names(**kwargs):
+    return feed_cache.index_names()
+
+
+def trending_names(**kwargs):
+    return feed_cache.trending_names()
+
+
+def group_names(slug, **kwargs):
+    group_id = Group.objects.filter(slug=slug).values_list(
+        'pk', flat=True).first()
+    return group_id and feed_cache.group_names(group_id)
+
+
+def profile_names(username, **kwargs):
+    author_id = User.objects.filter(username=username).values_list(
+        'pk', flat=True).first()
+    return author_id and feed_cache.profile_names(author_id)
+
+
+def post_detail_names(post_id, **kwargs):
+    author_id = Post.objects.filter(pk=post_id).values_list(
+        'author_id', flat=True).first()
+    return author_id and feed_cache.post_detail_names(post_id, author_id)
@@ -0,0 +1,60 @@
+from core.utils import bulk_batch_size, filter_in
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from .models import Comment, Follow, Post, User, UserStats
+
+
+def get_stats(user):
+    """Счётчики пользователя; без записи в базе — нулевые."""
+    stats = UserStats.objects.filter(user=user).first()
+    return stats or UserStats(user=user)
+
+
+def change_user_counter(user_id, field, delta):
+    stats = UserStats.objects.filter(user_id=user_id)
+    if delta < 0:
+        stats = stats.filter(**{f'{field}__gte': -delta})
+    elif not stats.exists():
+        UserStats.objects.get_or_create(user_id=user_id)
+    stats.update(**{field: F(field) + delta})
+
+
+def change_comments_counter(post_id, delta):
+    posts = Post.objects.filter(pk=post_id)
+    if delta < 0:
+        posts = posts.filter(comments_count__gte=-delta)
+    posts.update(comments_count=F('comments_count') + delta)
+
+
+def _count(queryset, field):
+    counted = (
+        queryset.filter(**{field: OuterRef('pk')})
+        .order_by()
+        .values(field)
+        .annotate(total=Count('pk'))
+        .values('total')
+    )
+    return Coalesce(Subquery(counted), Value(0))
+
+
+def recount(user_ids=None, post_ids=None):
+    """Пересчитывает счётчики по исходным таблицам.
+
+    user_ids и post_ids ограничивают пересчёт этими пользователями и
+    постами; None — пересчитать всех.
+    """
+    for users in filter_in(User.objects.filter(stats__isnull=True), user_ids):
+        UserStats.objects.bulk_create(
+            [UserStats(user_id=user_id) for user_id in users.values_list(
+                'pk', flat=True).iterator()],
+            batch_size=bulk_batch_size(UserStats, 1000),
+            ignore_conflicts=True)
+    for posts in filter_in(Post.objects.all(), post_ids):
+        posts.update(comments_count=_count(Comment.objects, 'post'))
+    for stats in filter_in(UserStats.objects.all(), user_ids):
+        stats.update(
+            posts_count=_count(Post.objects, 'author'),
+            followers_count=_count(Follow.objects, 'author'),
+            following_count=_count(Follow.objects, 'user'),
+        )
@@ -0,0 +1,86 @@
+"""Потоковая выгрузка постов, комментариев и подписок.
+
+Таблицы обходятся пачками по первичному ключу (WHERE id > последний
+ORDER BY id LIMIT n) через values(), поэтому память не растёт с размером
+таблиц, а каждая пачка — короткий запрос по индексу. Записи пишутся в
+формате import_content и сжимаются gzip на лету. Комментарий ссылается
+на пост его id из выгрузки (post_ref), а не первичным ключом новой базы:
+import_content сам сопоставит его с постом, созданным из записи.
+"""
+import json
+import zlib
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .models import Comment, Follow, Post
+
+KINDS = ('post', 'comment', 'follow')
+
+# Тип записи -> (queryset, поле записи -> выражение для values()).
+SOURCES = {
+    'post': (Post.objects, {
+        'id': 'id',
+        'author': 'author__username',
+        'group': 'group__slug',
+        'text': 'text',
+        'pub_date': 'pub_date',
+        'image': 'image',
+    }),
+    'comment': (Comment.objects, {
+        'id': 'id',
+        'post_ref': 'post_id',
+        'author': 'author__username',
+        'text': 'text',
+        'created': 'created',
+    }),
+    'follow': (Follow.objects, {
+        'id': 'id',
+        'user': 'user__username',
+        'author': 'author__username',
+    }),
+}
+
+
+def keyset_chunks(queryset, columns, chunk_size):
+    """Строки values() пачками по возрастанию id."""
+    last_id = 0
+    while True:
+        rows = list(queryset.filter(pk__gt=last_id).order_by('pk').values(
+            *columns)[:chunk_size])
+        if not rows:
+            return
+        yield rows
+        last_id = rows[-1]['id']
+
+
+def records(kinds=KINDS, chunk_size=1000):
+    for kind in kinds:
+        queryset, fields = SOURCES[kind]
+        for rows in keyset_chunks(queryset, fields.values(), chunk_size):
+            for row in rows:
+                record = {'type': kind}
+                record.update(
+                    (field, row[column]) for field, column in fields.items())
+                yield record
+
+
+def jsonl(records):
+    for record in records:
+        yield json.dumps(
+            record, cls=DjangoJSONEncoder, ensure_ascii=False
+        ).encode() + b'\n'
+
+
+def gzip_stream(chunks, level=6):
+    """Сжимает поток байтов в gzip по мере поступления."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def export(kinds=KINDS, chunk_size=1000):
+    """Сжатый JSONL со всеми записями выбранных типов."""
+    return gzip_stream(jsonl(records(kinds, chunk_size)))
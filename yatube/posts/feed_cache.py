@@ -0,0 +1,128 @@
+"""Поколения кэша лент.
+
+Страница ленты кэшируется целиком под ключом из поколений сайта и самой
+ленты, каждая карточка поста — под поколениями сайта и поста. Сигналы
+сдвигают поколения только тех лент, которые действительно изменились.
+"""
+from core.cache import bump_generations, get_generations, get_last_modified
+
+SITE = 'feeds'
+INDEX = 'feed:index'
+TRENDING = 'feed:trending'
+RECOMMENDATIONS = 'recommendations'
+
+
+def group_feed(group_id):
+    return f'feed:group:{group_id}'
+
+
+def profile_feed(author_id):
+    return f'feed:profile:{author_id}'
+
+
+def follow_feed(user_id):
+    return f'feed:follow:{user_id}'
+
+
+def post_card(post_id):
+    return f'post:{post_id}'
+
+
+def post_comments(post_id):
+    return f'comments:{post_id}'
+
+
+def index_names():
+    return SITE, INDEX
+
+
+def trending_names():
+    return SITE, TRENDING
+
+
+def group_names(group_id):
+    return SITE, group_feed(group_id)
+
+
+def profile_names(author_id):
+    # В своём профиле пользователь видит рекомендации.
+    return SITE, profile_feed(author_id), RECOMMENDATIONS
+
+
+def post_detail_names(post_id, author_id):
+    # На странице поста есть число постов автора, поэтому она зависит
+    # и от ленты его профиля.
+    return (SITE, post_card(post_id), post_comments(post_id),
+            profile_feed(author_id))
+
+
+def version(names):
+    return get_generations(*names)
+
+
+def last_modified(names):
+    return get_last_modified(*names)
+
+
+def site_version():
+    return get_generations(SITE)
+
+
+def index_version():
+    return version(index_names())
+
+
+def trending_version():
+    return version(trending_names())
+
+
+def group_version(group):
+    return version(group_names(group.pk))
+
+
+def profile_version(author):
+    return version(profile_names(author.pk))
+
+
+def follow_names(user, celebrity_ids=()):
+    # Посты популярных авторов не раздаются по лентам, поэтому лента
+    # подписок зависит и от их профилей.
+    return (SITE, follow_feed(user.pk),
+            *[profile_feed(author_id) for author_id in celebrity_ids])
+
+
+def invalidate_post(post, group_ids=(), follower_ids=()):
+    bump_generations(
+        INDEX,
+        post_card(post.pk),
+        profile_feed(post.author_id),
+        *[group_feed(group_id) for group_id in group_ids if group_id],
+        *[follow_feed(user_id) for user_id in follower_ids]
+    )
+
+
+def invalidate_comments(post_id):
+    bump_generations(post_comments(post_id))
+
+
+def invalidate_follow(user_id, author_id):
+    # Кнопка подписки и число подписчиков показываются в профиле автора,
+    # число подписок и рекомендации — в профиле подписчика.
+    bump_generations(
+        follow_feed(user_id), profile_feed(author_id), profile_feed(user_id))
+
+
+def invalidate_follow_feeds(user_ids):
+    bump_generations(*[follow_feed(user_id) for user_id in user_ids])
+
+
+def invalidate_recommendations():
+    bump_generations(RECOMMENDATIONS)
+
+
+def invalidate_trending():
+    bump_generations(TRENDING)
+
+
+def invalidate_site():
+    bump_generations(SITE)
@@ -0,0 +1,94 @@
+"""Граф подписок в общем кэше.
+
+Для каждого пользователя кэшируется множество авторов, на которых он
+подписан, для каждого автора — число подписчиков и их множество (если
+подписчиков не больше FOLLOW_GRAPH_MAX_FOLLOWERS). Проверка «подписан
+ли» и выборка «на кого из этих авторов подписан» после первого чтения
+не ходят в базу.
+
+Сигналы Follow удаляют ключи обеих сторон сразу и ещё раз после
+фиксации транзакции: так в кэше не задержится множество, прочитанное
+параллельным запросом до коммита. Массовые операции в обход сигналов
+(импорт, генерация данных) сбрасывают весь граф через invalidate_all.
+Кэш общий для всех, поэтому он заполняется только из основной базы:
+отставшая реплика оставила бы в нём устаревшее множество.
+"""
+from core.cache import bump_generations, get_generations
+from core.db import replica_reads
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import Follow
+
+GENERATION = 'follow_graph'
+
+
+def _key(kind, object_id):
+    generation = get_generations(GENERATION)
+    return f'{GENERATION}:{generation}:{kind}:{object_id}'
+
+
+def followee_ids(user_id):
+    """Множество id авторов, на которых подписан пользователь."""
+    key = _key('followees', user_id)
+    authors = cache.get(key)
+    if authors is None:
+        with replica_reads(False):
+            authors = frozenset(Follow.objects.filter(
+                user_id=user_id).values_list('author_id', flat=True))
+        cache.set(key, authors, settings.FOLLOW_GRAPH_TIMEOUT)
+    return authors
+
+
+def is_following(user, author):
+    if not user.is_authenticated:
+        return False
+    return author.pk in followee_ids(user.pk)
+
+
+def following_among(user, author_ids):
+    """Те из author_ids, на кого подписан user, без запросов к базе."""
+    if not author_ids or not user.is_authenticated:
+        return set()
+    return followee_ids(user.pk).intersection(author_ids)
+
+
+def _followers(author_id):
+    """(число подписчиков, их id или None, если их слишком много)."""
+    key = _key('followers', author_id)
+    entry = cache.get(key)
+    if entry is None:
+        limit = settings.FOLLOW_GRAPH_MAX_FOLLOWERS
+        followers = Follow.objects.filter(author_id=author_id)
+        with replica_reads(False):
+            ids = list(followers.values_list('user_id', flat=True)[
+                :limit + 1])
+            if len(ids) <= limit:
+                entry = (len(ids), frozenset(ids))
+            else:
+                entry = (followers.count(), None)
+        cache.set(key, entry, settings.FOLLOW_GRAPH_TIMEOUT)
+    return entry
+
+
+def follower_ids(author_id):
+    """Множество id подписчиков автора или None для слишком популярных.
+
+    Для None вызывающий код сам читает подписчиков из базы частями.
+    """
+    return _followers(author_id)[1]
+
+
+def follower_count(author_id):
+    return _followers(author_id)[0]
+
+
+def invalidate(user_id, author_id):
+    keys = [_key('followees', user_id), _key('followers', author_id)]
+    cache.delete_many(keys)
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def invalidate_all():
+    bump_generations(GENERATION)
@@ -1,4 +1,4 @@
-from django.forms import ModelForm
+from django.forms import CharField, Form, ModelForm
 
 from .models import Comment, Post
 
@@ -29,3 +29,11 @@ class CommentForm(ModelForm):
         help_texts = {
             'text': 'Введите комментарий'
         }
+
+
+class SearchForm(Form):
+    q = CharField(
+        label='Поиск',
+        max_length=200,
+        help_text='Слова из текста поста'
+    )
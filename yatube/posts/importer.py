@@ -0,0 +1,312 @@
+"""Массовый импорт постов, комментариев и подписок.
+
+Строки читаются потоком (JSONL или CSV), авторы и группы ищутся по
+словарям в памяти, а записываются пачками через bulk_create. bulk_create
+не отправляет сигналов, поэтому счётчики, ленты подписок и поколения
+кэша приводятся в порядок один раз, в finish().
+
+Комментарий указывает пост либо первичным ключом этой базы (post), либо
+id поста из того же файла (post_ref, так пишет выгрузка export_content).
+Соответствие id из файла новым ключам пишется в таблицу ImportRef вместе
+с постами и читается по пачке комментариев, поэтому переживает --resume
+и не держит в памяти весь файл; по завершении импорта оно удаляется.
+"""
+import csv
+import json
+import uuid
+from collections import Counter
+
+from core.utils import bulk_batch_size
+from django.contrib.auth.hashers import make_password
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import counters, feed_cache, follow_graph, timeline, trending
+from .models import Comment, Follow, Group, ImportRef, Post, User
+
+KINDS = ('post', 'comment', 'follow')
+FORMATS = ('jsonl', 'csv')
+MAX_ERRORS = 20
+
+
+class RowError(ValueError):
+    pass
+
+
+def read_records(stream, fmt):
+    """Записи файла по одной; номер записи — позиция для возобновления."""
+    if fmt == 'csv':
+        yield from csv.DictReader(stream)
+    else:
+        yield from stream
+
+
+def parse_record(record, fmt):
+    if fmt == 'csv':
+        return record
+    if not record.strip():
+        return None
+    try:
+        row = json.loads(record)
+    except ValueError as error:
+        raise RowError(f'некорректный JSON: {error}')
+    if not isinstance(row, dict):
+        raise RowError('ожидается JSON-объект')
+    return row
+
+
+def bulk_create_dated(model, objects, date_field, batch_size=1000):
+    """bulk_create, сохраняющий даты объектов в поле с auto_now_add.
+
+    bulk_create подставляет в такое поле текущее время, поэтому даты
+    возвращаются отдельным bulk_update после вставки. Поля модели не
+    меняются: параллельные сохранения в том же процессе по-прежнему
+    получают автоматическое время.
+    """
+    dates = [getattr(obj, date_field) for obj in objects]
+    model.objects.bulk_create(
+        objects, batch_size=bulk_batch_size(model, batch_size))
+    if objects and objects[0].pk is None:
+        # SQLite не возвращает id из bulk_create. Вставка идёт внутри
+        # транзакции, которая держит блокировку базы, поэтому новые
+        # строки — последние len(objects) по возрастанию ключа.
+        ids = list(model.objects.order_by('-pk').values_list(
+            'pk', flat=True)[:len(objects)])
+        for obj, pk in zip(objects, reversed(ids)):
+            obj.pk = pk
+    for obj, date in zip(objects, dates):
+        setattr(obj, date_field, date)
+    model.objects.bulk_update(objects, [date_field], batch_size=batch_size)
+
+
+class Importer:
+    """Пишет записи пачками; write() вызывается внутри транзакции.
+
+    Тип записи берётся из её поля type, а если его нет — из kind;
+    source отличает соответствия id одного импорта от другого.
+    """
+
+    def __init__(self, kind=None, fmt='jsonl', batch_size=1000,
+                 create_users=False, create_groups=False, source=None):
+        self.kind = kind
+        self.fmt = fmt
+        self.batch_size = batch_size
+        self.create_users = create_users
+        self.create_groups = create_groups
+        self.users = dict(User.objects.values_list('username', 'pk'))
+        self.groups = dict(Group.objects.values_list('slug', 'pk'))
+        self.imported = Counter()
+        self.skipped = 0
+        self.errors = []
+        self.post_authors = set()
+        self.follow_users = set()
+        self.follow_authors = set()
+        self.commented_posts = set()
+        self.source = source or uuid.uuid4().hex
+        # Соответствия для текущей пачки комментариев.
+        self.post_refs = {}
+
+    def fail(self, position, error):
+        self.skipped += 1
+        if len(self.errors) < MAX_ERRORS:
+            self.errors.append(f'запись {position}: {error}')
+
+    def parse(self, chunk):
+        rows = []
+        for position, record in chunk:
+            try:
+                row = parse_record(record, self.fmt)
+                if row is None:
+                    continue
+                kind = row.get('type') or self.kind
+                if kind not in KINDS:
+                    raise RowError(f'неизвестный тип записи {kind!r}')
+            except RowError as error:
+                self.fail(position, error)
+                continue
+            rows.append((position, kind, row))
+        return rows
+
+    def create_missing(self, rows):
+        if self.create_users:
+            names = {
+                row.get(field) for _, kind, row in rows
+                for field in ('author', 'user') if row.get(field)
+            } - self.users.keys()
+            if names:
+                # Без пароля: войти можно будет только после сброса.
+                password = make_password(None)
+                User.objects.bulk_create(
+                    [User(username=name, password=password)
+                     for name in names],
+                    batch_size=bulk_batch_size(User, self.batch_size),
+                    ignore_conflicts=True)
+                self.users.update(User.objects.filter(
+                    username__in=names).values_list('username', 'pk'))
+        if self.create_groups:
+            slugs = {
+                row['group'] for _, kind, row in rows
+                if kind == 'post' and row.get('group')
+            } - self.groups.keys()
+            if slugs:
+                Group.objects.bulk_create(
+                    [Group(slug=slug, title=slug, description='')
+                     for slug in slugs],
+                    batch_size=bulk_batch_size(Group, self.batch_size),
+                    ignore_conflicts=True)
+                self.groups.update(Group.objects.filter(
+                    slug__in=slugs).values_list('slug', 'pk'))
+
+    def user_id(self, row, field):
+        username = row.get(field)
+        if not username:
+            raise RowError(f'не указано поле {field}')
+        if username not in self.users:
+            raise RowError(f'нет пользователя {username!r}')
+        return self.users[username]
+
+    def date(self, row, field):
+        value = row.get(field)
+        if not value:
+            return timezone.now()
+        parsed = parse_datetime(value)
+        if parsed is None:
+            raise RowError(f'некорректная дата {value!r}')
+        if timezone.is_naive(parsed):
+            parsed = timezone.make_aware(parsed)
+        return parsed
+
+    def text(self, row):
+        text = row.get('text')
+        if not text:
+            raise RowError('пустой текст')
+        return text
+
+    def build_post(self, row):
+        group_id = None
+        if row.get('group'):
+            if row['group'] not in self.groups:
+                raise RowError(f'нет группы {row["group"]!r}')
+            group_id = self.groups[row['group']]
+        post = Post(
+            author_id=self.user_id(row, 'author'),
+            group_id=group_id,
+            text=self.text(row),
+            pub_date=self.date(row, 'pub_date'))
+        post.source_id = row.get('id')
+        return post
+
+    def post_id(self, row):
+        if row.get('post_ref') not in (None, ''):
+            ref = str(row['post_ref'])
+            if ref not in self.post_refs:
+                raise RowError(f'пост {ref} из файла не импортирован')
+            return self.post_refs[ref]
+        try:
+            return int(row.get('post'))
+        except (TypeError, ValueError):
+            raise RowError(f'некорректный пост {row.get("post")!r}')
+
+    def build_comment(self, row):
+        post_id = self.post_id(row)
+        return Comment(
+            post_id=post_id,
+            author_id=self.user_id(row, 'author'),
+            text=self.text(row),
+            created=self.date(row, 'created'))
+
+    def build_follow(self, row):
+        user_id = self.user_id(row, 'user')
+        author_id = self.user_id(row, 'author')
+        if user_id == author_id:
+            raise RowError('подписка на самого себя')
+        return Follow(user_id=user_id, author_id=author_id)
+
+    def insert_posts(self, posts):
+        bulk_create_dated(Post, posts, 'pub_date', self.batch_size)
+        # При повторе id в файле остаётся первый пост.
+        ImportRef.objects.bulk_create(
+            [ImportRef(source=self.source, ref=str(post.source_id),
+                       post_id=post.pk)
+             for post in posts if post.source_id not in (None, '')],
+            batch_size=bulk_batch_size(ImportRef, self.batch_size),
+            ignore_conflicts=True)
+
+    def load_refs(self, rows):
+        refs = {
+            str(row['post_ref']) for _, kind, row in rows
+            if kind == 'comment' and row.get('post_ref') not in (None, '')
+        }
+        self.post_refs = dict(ImportRef.objects.filter(
+            source=self.source, ref__in=refs
+        ).values_list('ref', 'post_id')) if refs else {}
+
+    def forget_refs(self):
+        """Удаляет соответствия id, когда импорт больше не продолжится."""
+        ImportRef.objects.filter(source=self.source).delete()
+
+    def build(self, rows, kinds):
+        built = []
+        for position, kind, row in rows:
+            if kind not in kinds:
+                continue
+            try:
+                built.append(
+                    (position, getattr(self, f'build_{kind}')(row)))
+            except RowError as error:
+                self.fail(position, error)
+        return built
+
+    def write(self, chunk):
+        """Записывает пачку пар (позиция, запись)."""
+        rows = self.parse(chunk)
+        self.create_missing(rows)
+        posts = [post for _, post in self.build(rows, {'post'})]
+        follows = [follow for _, follow in self.build(rows, {'follow'})]
+        self.insert_posts(posts)
+        # Комментарии — после постов: post_ref может ссылаться на пост из
+        # этой же пачки.
+        self.load_refs(rows)
+        comments = self.build(rows, {'comment'})
+        existing = set(Post.objects.filter(
+            pk__in={comment.post_id for _, comment in comments}
+        ).values_list('pk', flat=True)) if comments else set()
+        for position, comment in comments:
+            if comment.post_id not in existing:
+                self.fail(position, f'нет поста {comment.post_id}')
+        comments = [
+            comment for _, comment in comments
+            if comment.post_id in existing
+        ]
+        bulk_create_dated(Comment, comments, 'created', self.batch_size)
+        Follow.objects.bulk_create(
+            follows,
+            batch_size=bulk_batch_size(Follow, self.batch_size),
+            ignore_conflicts=True)
+        self.imported.update(
+            post=len(posts), comment=len(comments), follow=len(follows))
+        self.post_authors.update(post.author_id for post in posts)
+        self.follow_users.update(follow.user_id for follow in follows)
+        self.follow_authors.update(follow.author_id for follow in follows)
+        self.commented_posts.update(comment.post_id for comment in comments)
+
+    def finish(self):
+        """Обновляет то, что при поштучном сохранении делают сигналы.
+
+        Пересчитываются только пользователи и посты, которых коснулся
+        импорт.
+        """
+        counters.recount(
+            user_ids=self.post_authors | self.follow_users
+            | self.follow_authors,
+            post_ids=self.commented_posts)
+        if self.post_authors or self.follow_users:
+            followers = Follow.objects.filter(
+                author_id__in=self.post_authors
+            ).values_list('user_id', flat=True)
+            timeline.rebuild(self.follow_users.union(followers))
+        if self.follow_users:
+            follow_graph.invalidate_all()
+        if self.commented_posts:
+            trending.compact(post_ids=self.commented_posts)
+        feed_cache.invalidate_site()
@@ -0,0 +1,93 @@
+import json
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import (setup_test_environment,
+                               teardown_test_environment)
+from posts import benchmark
+
+
+class Command(BaseCommand):
+    help = ('Замеряет страницы постов на растущих объёмах данных и '
+            'сравнивает результат с базовой линией')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', type=int, nargs='+', default=[1000, 10000],
+            help='число постов в базе на каждом шаге')
+        parser.add_argument(
+            '--pages', type=int, nargs='+', default=[1, 10, 50],
+            help='глубина страниц для лент')
+        parser.add_argument(
+            '--views', nargs='+', default=list(benchmark.VIEWS),
+            choices=benchmark.VIEWS)
+        parser.add_argument(
+            '--repeat', type=int, default=20,
+            help='запросов на каждую страницу')
+        parser.add_argument(
+            '--warm', action='store_true',
+            help='не сбрасывать кэш между запросами')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--baseline', help='JSON с базовой линией для сравнения')
+        parser.add_argument(
+            '--save', action='store_true',
+            help='записать результат в --baseline вместо сравнения')
+        parser.add_argument(
+            '--threshold', type=float, default=0.2,
+            help='допустимый рост времени и памяти, доля')
+        parser.add_argument(
+            '--min-delta-ms', type=float, default=2.0,
+            help='рост времени меньше этого порога считается шумом')
+
+    def progress(self, name, metrics):
+        self.stdout.write(
+            f'{name:<28} {metrics["p50_ms"]:>8.1f} {metrics["p95_ms"]:>8.1f} '
+            f'{metrics["p99_ms"]:>8.1f} {metrics["queries"]:>7} '
+            f'{metrics["peak_kb"]:>8}')
+
+    def handle(self, *args, **options):
+        baseline_path = options['baseline']
+        if options['save'] and not baseline_path:
+            raise CommandError('Для --save укажите --baseline')
+        baseline = None
+        if baseline_path and not options['save']:
+            if not os.path.exists(baseline_path):
+                raise CommandError(f'Нет базовой линии {baseline_path}')
+            with open(baseline_path) as file:
+                baseline = json.load(file)
+
+        # Замеры идут на отдельной тестовой базе, рабочая не трогается;
+        # DEBUG выключен, как в бою.
+        setup_test_environment(debug=False)
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, serialize=False)
+        try:
+            self.stdout.write(
+                f'{"страница":<28} {"p50, мс":>8} {"p95, мс":>8} '
+                f'{"p99, мс":>8} {"запросы":>7} {"пик, КБ":>8}')
+            results = benchmark.run(
+                options['sizes'], options['pages'], options['repeat'],
+                views=options['views'], warm=options['warm'],
+                seed=options['seed'], progress=self.progress)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        if options['save']:
+            with open(baseline_path, 'w') as file:
+                json.dump(results, file, indent=2, sort_keys=True)
+            self.stdout.write(self.style.SUCCESS(
+                f'Базовая линия записана в {baseline_path}'))
+            return
+        if baseline is None:
+            return
+        regressions = benchmark.compare(
+            results, baseline, options['threshold'],
+            options['min_delta_ms'])
+        if regressions:
+            raise CommandError(
+                'Регрессии относительно базовой линии:\n'
+                + '\n'.join(regressions))
+        self.stdout.write(self.style.SUCCESS('Регрессий нет'))
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from posts import trending
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает оценки ленты «Популярное» и удаляет устаревшие; '
+            'запускается по расписанию, например раз в несколько минут')
+
+    def handle(self, *args, **options):
+        kept = trending.compact()
+        self.stdout.write(self.style.SUCCESS(
+            f'Постов в ленте «Популярное»: {kept}'))
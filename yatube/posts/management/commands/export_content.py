@@ -0,0 +1,39 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand
+from posts import exporter
+
+
+class Command(BaseCommand):
+    help = 'Выгружает посты, комментарии и подписки в сжатый gzip JSONL'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', nargs='?', default='-',
+            help='куда писать архив; по умолчанию — stdout')
+        parser.add_argument(
+            '--kind', action='append', choices=exporter.KINDS,
+            help='тип записей; можно указать несколько раз')
+        parser.add_argument(
+            '--chunk-size', type=int, default=1000,
+            help='строк в одном запросе к базе')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        chunks = exporter.export(
+            options['kind'] or exporter.KINDS, options['chunk_size'])
+        if options['path'] == '-':
+            output = sys.stdout.buffer
+            for chunk in chunks:
+                output.write(chunk)
+            output.flush()
+            return
+        size = 0
+        with open(options['path'], 'wb') as output:
+            for chunk in chunks:
+                output.write(chunk)
+                size += len(chunk)
+        self.stdout.write(self.style.SUCCESS(
+            f'Выгружено {size / 1024:.0f} КБ '
+            f'за {time.monotonic() - started:.1f} с'))
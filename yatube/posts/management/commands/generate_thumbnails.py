@@ -0,0 +1,77 @@
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+from posts import thumbnails
+from posts.models import Post
+
+
+def generate_chunk(image_names):
+    return sum(thumbnails.generate_safely(name) for name in image_names)
+
+
+def generate_chunk_in_child(image_names):
+    try:
+        return generate_chunk(image_names)
+    finally:
+        # У дочернего процесса своё подключение к базе (хранилище sorl);
+        # в родителе закрывать его нельзя — по нему читаются имена.
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = 'Нарезает миниатюры для уже загруженных картинок постов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count(),
+            help='число процессов; 1 — без отдельных процессов')
+        parser.add_argument(
+            '--chunk-size', type=int, default=100,
+            help='сколько картинок отдавать процессу за раз')
+
+    def chunks(self, chunk_size):
+        """Имена картинок пачками; каждая пачка — отдельный запрос.
+
+        Между пачками не остаётся открытого курсора, поэтому подключение
+        можно закрыть перед запуском дочерних процессов.
+        """
+        posts = Post.objects.exclude(image='').order_by('pk')
+        last = 0
+        while True:
+            rows = list(posts.filter(pk__gt=last).values_list(
+                'pk', 'image')[:chunk_size])
+            if not rows:
+                return
+            last = rows[-1][0]
+            yield [name for _, name in rows]
+
+    def generate_in_pool(self, chunks, workers):
+        """Раздаёт пачки процессам, держа в очереди не больше 2 * workers."""
+        done = 0
+        pending = set()
+        with ProcessPoolExecutor(workers) as executor:
+            for chunk in chunks:
+                # Процессы запускаются внутри submit и не должны
+                # унаследовать подключение родителя.
+                connections.close_all()
+                pending.add(executor.submit(generate_chunk_in_child, chunk))
+                if len(pending) >= 2 * workers:
+                    finished, pending = wait(
+                        pending, return_when=FIRST_COMPLETED)
+                    done += sum(future.result() for future in finished)
+            done += sum(future.result() for future in pending)
+        return done
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        chunks = self.chunks(options['chunk_size'])
+        if options['workers'] > 1:
+            done = self.generate_in_pool(chunks, options['workers'])
+        else:
+            done = sum(generate_chunk(chunk) for chunk in chunks)
+        self.stdout.write(self.style.SUCCESS(
+            f'Миниатюры созданы для {done} картинок '
+            f'за {time.monotonic() - started:.1f} с'))
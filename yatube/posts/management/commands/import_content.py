@@ -0,0 +1,132 @@
+import hashlib
+import json
+import os
+import sys
+import time
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from posts.importer import FORMATS, KINDS, Importer, read_records
+
+
+class Command(BaseCommand):
+    help = 'Импортирует посты, комментарии и подписки из JSONL или CSV'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='файл с записями; - — stdin')
+        parser.add_argument(
+            '--format', choices=FORMATS,
+            help='формат файла; по умолчанию — по расширению')
+        parser.add_argument(
+            '--kind', choices=KINDS,
+            help='тип записей без поля type (для CSV обязателен)')
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='строк в одном INSERT')
+        parser.add_argument(
+            '--chunk-size', type=int, default=10000,
+            help='строк в одной транзакции')
+        parser.add_argument(
+            '--state-file',
+            help='где хранить позицию для --resume; по умолчанию '
+                 '<path>.progress')
+        parser.add_argument(
+            '--resume', action='store_true',
+            help='продолжить с позиции, сохранённой прошлым запуском')
+        parser.add_argument(
+            '--create-users', action='store_true',
+            help='создавать неизвестных авторов без пароля')
+        parser.add_argument(
+            '--create-groups', action='store_true',
+            help='создавать неизвестные группы')
+
+    def read_state(self, state_file, resume):
+        if not state_file or not os.path.exists(state_file):
+            if resume:
+                raise CommandError('Нет сохранённой позиции для --resume')
+            return {'position': 0}
+        if not resume:
+            raise CommandError(
+                f'Найден незавершённый импорт ({state_file}): '
+                f'запустите с --resume или удалите файл')
+        with open(state_file) as state:
+            return json.load(state)
+
+    def write_state(self, state_file, position):
+        if not state_file:
+            return
+        # Через временный файл: позиция не должна потеряться при сбое.
+        temporary = f'{state_file}.tmp'
+        with open(temporary, 'w') as state:
+            json.dump({'position': position}, state)
+        os.replace(temporary, state_file)
+
+    def source(self, state_file):
+        """Имя импорта для ImportRef: одно и то же при --resume."""
+        if not state_file:
+            return None
+        return hashlib.sha1(
+            os.path.abspath(state_file).encode()).hexdigest()
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or (
+            'csv' if path.endswith('.csv') else 'jsonl')
+        if fmt == 'csv' and not options['kind']:
+            raise CommandError('Для CSV укажите --kind')
+        state_file = options['state_file'] or (
+            f'{path}.progress' if path != '-' else None)
+        state = self.read_state(state_file, options['resume'])
+        position = state['position']
+
+        importer = Importer(
+            kind=options['kind'], fmt=fmt,
+            batch_size=options['batch_size'],
+            create_users=options['create_users'],
+            create_groups=options['create_groups'],
+            source=self.source(state_file))
+        if not options['resume']:
+            # Остатки брошенного импорта с тем же файлом состояния.
+            importer.forget_refs()
+        stream = (sys.stdin if path == '-'
+                  else open(path, encoding='utf-8', newline=''))
+        started = time.monotonic()
+        done = 0
+        try:
+            records = enumerate(read_records(stream, fmt))
+            records = islice(records, position, None)
+            while True:
+                chunk = list(islice(records, options['chunk_size']))
+                if not chunk:
+                    break
+                with transaction.atomic():
+                    importer.write(chunk)
+                position = chunk[-1][0] + 1
+                self.write_state(state_file, position)
+                done += len(chunk)
+                elapsed = time.monotonic() - started
+                self.stdout.write(
+                    f'{position} записей, '
+                    f'{done / max(elapsed, 0.001):.0f} записей/с')
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+            # Даже после сбоя уже записанные пачки должны попасть в
+            # счётчики и ленты.
+            importer.finish()
+            if not state_file:
+                # Без файла состояния продолжить импорт нельзя.
+                importer.forget_refs()
+        if state_file:
+            importer.forget_refs()
+            if os.path.exists(state_file):
+                os.remove(state_file)
+
+        for error in importer.errors:
+            self.stderr.write(error)
+        imported = ', '.join(
+            f'{kind}: {importer.imported[kind]}' for kind in KINDS)
+        self.stdout.write(self.style.SUCCESS(
+            f'Импортировано ({imported}), пропущено: {importer.skipped}, '
+            f'за {time.monotonic() - started:.1f} с'))
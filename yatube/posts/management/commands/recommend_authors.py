@@ -0,0 +1,31 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand
+from posts import recommendations
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает рекомендации «на кого подписаться» по графу '
+            'подписок; запускается по расписанию, например раз в сутки')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--processes', type=int, default=os.cpu_count(),
+            help='число процессов; 1 — без отдельных процессов')
+        parser.add_argument(
+            '--chunk-size', type=int, default=500,
+            help='сколько пользователей отдавать процессу за раз')
+        parser.add_argument(
+            '--limit', type=int,
+            help='сколько рекомендаций хранить на пользователя')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        written = recommendations.rebuild(
+            processes=options['processes'],
+            chunk_size=options['chunk_size'],
+            limit=options['limit'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Записано рекомендаций: {written} '
+            f'за {time.monotonic() - started:.1f} с'))
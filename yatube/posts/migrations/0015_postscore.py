@@ -0,0 +1,31 @@
+# Generated by Django 2.2.16 on 2026-10-18 20:33
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0014_recommendation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostScore',
+            fields=[
+                ('post', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='trending', serialize=False, to='posts.Post')),
+                ('comments', models.FloatField(default=0)),
+                ('views', models.FloatField(default=0)),
+                ('updated', models.DateTimeField()),
+                ('rank', models.FloatField()),
+            ],
+            options={
+                'ordering': ['-rank', '-post'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='postscore',
+            index=models.Index(fields=['-rank', '-post'], name='post_score_rank_idx'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 2.2.16 on 2026-10-18 20:59
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0015_postscore'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportRef',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(max_length=64)),
+                ('ref', models.CharField(max_length=200)),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='posts.Post')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='importref',
+            constraint=models.UniqueConstraint(fields=('source', 'ref'), name='unique import refs'),
+        ),
+    ]
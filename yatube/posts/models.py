@@ -13,6 +13,21 @@ class Group(models.Model):
         return self.title
 
 
+class PostQuerySet(models.QuerySet):
+    def for_feed(self):
+        """Посты для лент: автор и группа одним запросом, без лишних полей."""
+        return self.select_related('author', 'group').defer(
+            'author__password',
+            'author__last_login',
+            'author__is_superuser',
+            'author__email',
+            'author__is_staff',
+            'author__is_active',
+            'author__date_joined',
+            'group__description',
+        )
+
+
 class Post(models.Model):
     text = models.TextField(
         'Текст поста',
@@ -39,11 +54,30 @@ class Post(models.Model):
         blank=True
     )
 
+    comments_count = models.PositiveIntegerField(
+        'Число комментариев',
+        default=0,
+        editable=False
+    )
+
+    objects = PostQuerySet.as_manager()
+
     def __str__(self):
         return self.text[:15]
 
     class Meta:
-        ordering = ['-pub_date']
+        ordering = ['-pub_date', '-id']
+        indexes = [
+            models.Index(
+                fields=['-pub_date', '-id'],
+                name='post_pub_date_idx'),
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='post_author_pub_date_idx'),
+            models.Index(
+                fields=['group', '-pub_date', '-id'],
+                name='post_group_pub_date_idx'),
+        ]
 
 
 class Comment(models.Model):
@@ -64,7 +98,12 @@ class Comment(models.Model):
     )
 
     class Meta:
-        ordering = ['-created']
+        ordering = ['-created', '-id']
+        indexes = [
+            models.Index(
+                fields=['post', '-created', '-id'],
+                name='comment_post_created_idx'),
+        ]
 
 
 class Follow(models.Model):
@@ -86,3 +125,142 @@ class Follow(models.Model):
                 fields=['author', 'user'],
                 name='unique followings')
         ]
+        indexes = [
+            models.Index(
+                fields=['user', 'author'],
+                name='follow_user_author_idx'),
+        ]
+
+
+class UserStats(models.Model):
+    """Счётчики пользователя, поддерживаемые сигналами."""
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats'
+    )
+    posts_count = models.PositiveIntegerField(default=0)
+    followers_count = models.PositiveIntegerField(default=0)
+    following_count = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f'Счётчики {self.user}'
+
+
+class TimelineEntry(models.Model):
+    """Запись материализованной ленты подписок пользователя."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries'
+    )
+    pub_date = models.DateTimeField()
+
+    class Meta:
+        ordering = ['-pub_date', '-post']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'],
+                name='unique timeline entries')
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-post'],
+                name='timeline_user_pub_date_idx')
+        ]
+
+
+class Recommendation(models.Model):
+    """Автор, которого стоит предложить пользователю.
+
+    Заполняется командой recommend_authors (см. posts.recommendations).
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='recommendations'
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+    score = models.FloatField()
+    # Сколько авторов из подписок пользователя подписаны на этого.
+    mutual = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        # При равной оценке (добор популярными) — в порядке записи.
+        ordering = ['-score', 'pk']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'author'],
+                name='unique recommendations')
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-score'],
+                name='recommendation_user_score_idx')
+        ]
+
+
+class PostScore(models.Model):
+    """Оценка поста для ленты «Популярное».
+
+    comments и views — затухающие суммы весов комментариев и просмотров
+    на момент updated; rank = log2(comments + views) плюс время updated в
+    периодах полураспада, поэтому строки, обновлённые в разное время,
+    сравнимы без пересчёта. Поддерживается posts.trending.
+    """
+    post = models.OneToOneField(
+        Post,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='trending'
+    )
+    comments = models.FloatField(default=0)
+    views = models.FloatField(default=0)
+    updated = models.DateTimeField()
+    rank = models.FloatField()
+
+    def __str__(self):
+        return f'Оценка {self.post_id}'
+
+    class Meta:
+        ordering = ['-rank', '-post']
+        indexes = [
+            models.Index(
+                fields=['-rank', '-post'],
+                name='post_score_rank_idx')
+        ]
+
+
+class ImportRef(models.Model):
+    """Пост, созданный импортом source из записи с id ref.
+
+    Живёт, пока импорт не завершён: по нему комментарии из того же файла
+    (в том числе после --resume) находят свои посты. См. posts.importer.
+    """
+    source = models.CharField(max_length=64)
+    ref = models.CharField(max_length=200)
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+
+    def __str__(self):
+        return f'{self.source}:{self.ref} → {self.post_id}'
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['source', 'ref'],
+                name='unique import refs')
+        ]
@@ -0,0 +1,172 @@
+"""Рекомендации «на кого подписаться».
+
+Граф подписок целиком загружается в память как множества смежности
+(кто на кого подписан и кто подписан на кого), и для каждого
+пользователя кандидаты оцениваются по двум признакам:
+
+* друзья друзей — доля авторов из подписок пользователя, которые сами
+  подписаны на кандидата;
+* совместные подписки — средняя косинусная близость кандидата к авторам
+  из подписок по множествам их подписчиков. Для популярного автора
+  берутся не больше RECOMMENDATIONS_MAX_NEIGHBOURS подписчиков.
+
+Пользователи обрабатываются пачками в дочерних процессах (граф им
+достаётся от родителя через fork без копирования), а родитель записывает
+лучшие RECOMMENDATIONS_COUNT кандидатов каждой пачки. Если кандидатов не
+хватает, список добирается самыми популярными авторами.
+"""
+import heapq
+import math
+import multiprocessing
+from collections import defaultdict
+
+from core.utils import bulk_batch_size
+from django.conf import settings
+from django.db import connections, transaction
+
+from . import feed_cache, follow_graph
+from .models import Follow, Recommendation, User, UserStats
+
+# Граф для дочерних процессов: заполняется до fork.
+_graph = None
+
+
+class Graph:
+    def __init__(self, following, followers, popular, limit, neighbours):
+        self.following = following
+        self.followers = followers
+        self.popular = popular
+        self.limit = limit
+        self.neighbours = neighbours
+
+    @classmethod
+    def load(cls, limit, neighbours):
+        following, followers = defaultdict(set), defaultdict(list)
+        for user_id, author_id in Follow.objects.order_by(
+                'author_id', 'user_id').values_list(
+                'user_id', 'author_id').iterator():
+            following[user_id].add(author_id)
+            followers[author_id].append(user_id)
+        popular = list(UserStats.objects.filter(
+            followers_count__gt=0).order_by(
+            '-followers_count', 'user_id').values_list(
+            'user_id', flat=True)[:limit * 2])
+        return cls(dict(following), dict(followers), popular, limit,
+                   neighbours)
+
+    def recommend(self, user_id):
+        """Список (автор, оценка, общих подписок) для пользователя."""
+        followed = self.following.get(user_id, set())
+        mutual = defaultdict(int)
+        similarity = defaultdict(float)
+        for friend in followed:
+            for candidate in self.following.get(friend, ()):
+                mutual[candidate] += 1
+        for author in followed:
+            co_followers = self.followers[author]
+            for other in co_followers[:self.neighbours]:
+                if other == user_id:
+                    continue
+                for candidate in self.following[other]:
+                    similarity[candidate] += 1 / math.sqrt(
+                        len(co_followers)
+                        * len(self.followers[candidate]))
+        excluded = followed | {user_id}
+        size = len(followed) or 1
+        scores = {
+            candidate: (mutual[candidate] + similarity[candidate]) / size
+            for candidate in mutual.keys() | similarity.keys()
+            if candidate not in excluded
+        }
+        best = heapq.nlargest(
+            self.limit, scores.items(), key=lambda item: (item[1], -item[0]))
+        result = [
+            (author_id, score, mutual[author_id])
+            for author_id, score in best
+        ]
+        chosen = excluded | scores.keys()
+        for author_id in self.popular:
+            if len(result) >= self.limit:
+                break
+            if author_id not in chosen:
+                result.append((author_id, 0.0, 0))
+        return result
+
+
+def recommend_chunk(user_ids):
+    return [
+        (user_id, author_id, score, mutual)
+        for user_id in user_ids
+        for author_id, score, mutual in _graph.recommend(user_id)
+    ]
+
+
+def user_chunks(chunk_size):
+    chunk = []
+    for user_id in User.objects.order_by('pk').values_list(
+            'pk', flat=True).iterator():
+        chunk.append(user_id)
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def save(user_ids, rows):
+    with transaction.atomic():
+        Recommendation.objects.filter(user_id__in=user_ids).delete()
+        Recommendation.objects.bulk_create(
+            [Recommendation(user_id=user_id, author_id=author_id,
+                            score=score, mutual=mutual)
+             for user_id, author_id, score, mutual in rows],
+            batch_size=bulk_batch_size(Recommendation, 1000))
+
+
+def rebuild(processes=1, chunk_size=500, limit=None, neighbours=None):
+    """Пересчитывает рекомендации всех; возвращает число строк."""
+    global _graph
+    _graph = Graph.load(
+        limit or settings.RECOMMENDATIONS_COUNT,
+        neighbours or settings.RECOMMENDATIONS_MAX_NEIGHBOURS)
+    chunks = list(user_chunks(chunk_size))
+    written = 0
+    try:
+        if processes > 1:
+            # Дочерние процессы не должны делить подключение родителя.
+            connections.close_all()
+            context = multiprocessing.get_context('fork')
+            with context.Pool(processes) as pool:
+                results = pool.imap(recommend_chunk, chunks)
+                for user_ids, rows in zip(chunks, results):
+                    save(user_ids, rows)
+                    written += len(rows)
+        else:
+            for user_ids in chunks:
+                rows = recommend_chunk(user_ids)
+                save(user_ids, rows)
+                written += len(rows)
+    finally:
+        _graph = None
+    feed_cache.invalidate_recommendations()
+    return written
+
+
+def for_user(user):
+    """Рекомендации для показа — одним запросом, без уже подписанных."""
+    if not user.is_authenticated:
+        return []
+    # Строк у пользователя не больше RECOMMENDATIONS_COUNT, поэтому
+    # читаются все, а подписки проверяются по графу в кэше.
+    recommendations = list(Recommendation.objects.filter(
+        user=user).select_related('author').only(
+        'score', 'mutual', 'author__username', 'author__first_name',
+        'author__last_name'
+    ))
+    followed = follow_graph.following_among(
+        user, [recommendation.author_id for recommendation in
+               recommendations])
+    return [
+        recommendation for recommendation in recommendations
+        if recommendation.author_id not in followed
+    ][:settings.RECOMMENDATIONS_SHOWN]
@@ -0,0 +1,109 @@
+from django.db import connections
+from django.db.models.signals import (post_delete, post_migrate, post_save,
+                                      pre_save)
+from django.dispatch import receiver
+
+from . import (counters, feed_cache, follow_graph, search, thumbnails,
+               timeline, trending)
+from .models import Comment, Follow, Group, Post, User
+
+
+@receiver(pre_save, sender=Post)
+def remember_previous_state(sender, instance, **kwargs):
+    instance._old_group_id = instance._old_image = None
+    if instance.pk:
+        previous = Post.objects.filter(pk=instance.pk).values_list(
+            'group_id', 'image').first()
+        if previous:
+            instance._old_group_id, instance._old_image = previous
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, **kwargs):
+    if created:
+        counters.change_user_counter(instance.author_id, 'posts_count', 1)
+        followers = timeline.fan_out_post(instance)
+    else:
+        followers = timeline.follower_ids(instance.author_id)
+    if instance.image and instance.image.name != getattr(
+            instance, '_old_image', None):
+        thumbnails.schedule(instance.image.name)
+    feed_cache.invalidate_post(
+        instance,
+        group_ids={instance.group_id, getattr(
+            instance, '_old_group_id', None)},
+        follower_ids=followers)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    counters.change_user_counter(instance.author_id, 'posts_count', -1)
+    feed_cache.invalidate_post(
+        instance,
+        group_ids=[instance.group_id],
+        follower_ids=timeline.follower_ids(instance.author_id))
+    feed_cache.invalidate_trending()
+
+
+@receiver(post_save, sender=Comment)
+def comment_created(sender, instance, created, **kwargs):
+    if created and instance.post_id:
+        counters.change_comments_counter(instance.post_id, 1)
+        feed_cache.invalidate_comments(instance.post_id)
+        trending.record_comment(instance.post_id, instance.created)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    if instance.post_id:
+        counters.change_comments_counter(instance.post_id, -1)
+        feed_cache.invalidate_comments(instance.post_id)
+
+
+def followers_changed(author_id, delta):
+    # Пересборка лент затрагивает всех подписчиков, поэтому идёт в фоне.
+    if timeline.crossed_fanout_limit(author_id, delta):
+        from .tasks import refresh_fan_out
+        refresh_fan_out.enqueue(author_id)
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, **kwargs):
+    if created:
+        counters.change_user_counter(instance.author_id, 'followers_count', 1)
+        counters.change_user_counter(instance.user_id, 'following_count', 1)
+        followers_changed(instance.author_id, 1)
+        follow_graph.invalidate(instance.user_id, instance.author_id)
+        timeline.backfill(instance.user_id, instance.author_id)
+        feed_cache.invalidate_follow(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    counters.change_user_counter(instance.author_id, 'followers_count', -1)
+    counters.change_user_counter(instance.user_id, 'following_count', -1)
+    followers_changed(instance.author_id, -1)
+    follow_graph.invalidate(instance.user_id, instance.author_id)
+    timeline.prune(instance.user_id, instance.author_id)
+    feed_cache.invalidate_follow(instance.user_id, instance.author_id)
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, update_fields=None, **kwargs):
+    # Вход в систему обновляет только last_login — ленты это не меняет.
+    if update_fields and set(update_fields) <= {'last_login'}:
+        return
+    feed_cache.invalidate_site()
+
+
+@receiver(post_delete, sender=User)
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def site_changed(sender, **kwargs):
+    feed_cache.invalidate_site()
+
+
+@receiver(post_migrate)
+def restore_search_index(sender, using, **kwargs):
+    if sender.name == 'posts':
+        search.install(connections[using])
@@ -0,0 +1,172 @@
+"""Ленты для агрегаторов: RSS 2.0, Atom 1.0 и JSON Feed 1.1.
+
+Документ собирается по кускам из итератора по постам и сразу уходит
+клиенту через StreamingHttpResponse. Готовый текст кладётся в кэш под
+поколениями ленты (см. feed_cache), поэтому повторный опрос без изменений
+обходится без запросов к постам, а с тем же ETag — ответом 304.
+"""
+import hashlib
+import json
+from xml.sax.saxutils import escape, quoteattr
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.utils.feedgenerator import rfc2822_date, rfc3339_date
+from django.utils.text import Truncator
+
+from . import feed_cache
+
+CONTENT_TYPES = {
+    'rss': 'application/rss+xml; charset=utf-8',
+    'atom': 'application/atom+xml; charset=utf-8',
+    'json': 'application/feed+json; charset=utf-8',
+}
+TITLE_LENGTH = 80
+
+
+class FeedFormatConverter:
+    regex = 'rss|atom|json'
+
+    def to_python(self, value):
+        return value
+
+    def to_url(self, value):
+        return value
+
+
+def _item(request, post):
+    link = request.build_absolute_uri(
+        reverse('posts:post_detail', kwargs={'post_id': post.pk}))
+    return {
+        'id': link,
+        'link': link,
+        'title': Truncator(post.text.split('\n', 1)[0]).chars(TITLE_LENGTH),
+        'text': post.text,
+        'date': post.pub_date,
+        'author': post.author.get_full_name() or post.author.username,
+        'category': post.group.title if post.group_id else None,
+        'image': (request.build_absolute_uri(post.image.url)
+                  if post.image else None),
+    }
+
+
+def rss(feed, items):
+    yield ('<?xml version="1.0" encoding="utf-8"?>\n'
+           '<rss version="2.0" '
+           'xmlns:atom="http://www.w3.org/2005/Atom" '
+           'xmlns:dc="http://purl.org/dc/elements/1.1/"><channel>'
+           f'<title>{escape(feed["title"])}</title>'
+           f'<link>{escape(feed["link"])}</link>'
+           f'<description>{escape(feed["description"])}</description>'
+           '<atom:link rel="self" type="application/rss+xml" '
+           f'href={quoteattr(feed["feed_url"])}/>'
+           '<language>ru</language>'
+           f'<lastBuildDate>{rfc2822_date(feed["updated"])}</lastBuildDate>')
+    for item in items:
+        category = (f'<category>{escape(item["category"])}</category>'
+                    if item['category'] else '')
+        yield (f'<item><title>{escape(item["title"])}</title>'
+               f'<link>{escape(item["link"])}</link>'
+               f'<guid isPermaLink="true">{escape(item["id"])}</guid>'
+               f'<pubDate>{rfc2822_date(item["date"])}</pubDate>'
+               f'<dc:creator>{escape(item["author"])}</dc:creator>'
+               f'{category}'
+               f'<description>{escape(item["text"])}</description></item>')
+    yield '</channel></rss>\n'
+
+
+def atom(feed, items):
+    yield ('<?xml version="1.0" encoding="utf-8"?>\n'
+           '<feed xmlns="http://www.w3.org/2005/Atom" xml:lang="ru">'
+           f'<title>{escape(feed["title"])}</title>'
+           f'<subtitle>{escape(feed["description"])}</subtitle>'
+           f'<link href={quoteattr(feed["link"])} rel="alternate"/>'
+           f'<link href={quoteattr(feed["feed_url"])} rel="self"/>'
+           f'<id>{escape(feed["feed_url"])}</id>'
+           f'<updated>{rfc3339_date(feed["updated"])}</updated>')
+    for item in items:
+        category = (f'<category term={quoteattr(item["category"])}/>'
+                    if item['category'] else '')
+        yield (f'<entry><title>{escape(item["title"])}</title>'
+               f'<link href={quoteattr(item["link"])} rel="alternate"/>'
+               f'<id>{escape(item["id"])}</id>'
+               f'<published>{rfc3339_date(item["date"])}</published>'
+               f'<updated>{rfc3339_date(item["date"])}</updated>'
+               f'<author><name>{escape(item["author"])}</name></author>'
+               f'{category}'
+               f'<content type="text">{escape(item["text"])}</content>'
+               '</entry>')
+    yield '</feed>\n'
+
+
+def json_feed(feed, items):
+    header = json.dumps({
+        'version': 'https://jsonfeed.org/version/1.1',
+        'title': feed['title'],
+        'home_page_url': feed['link'],
+        'feed_url': feed['feed_url'],
+        'description': feed['description'],
+        'language': 'ru',
+    }, ensure_ascii=False)
+    yield header[:-1] + ', "items": ['
+    separator = ''
+    for item in items:
+        entry = {
+            'id': item['id'],
+            'url': item['link'],
+            'title': item['title'],
+            'content_text': item['text'],
+            'date_published': item['date'],
+            'authors': [{'name': item['author']}],
+        }
+        if item['category']:
+            entry['tags'] = [item['category']]
+        if item['image']:
+            entry['image'] = item['image']
+        yield separator + json.dumps(
+            entry, cls=DjangoJSONEncoder, ensure_ascii=False)
+        separator = ', '
+    yield ']}\n'
+
+
+WRITERS = {'rss': rss, 'atom': atom, 'json': json_feed}
+
+
+def _cache_key(request, names):
+    # В тексте ленты абсолютные ссылки, поэтому в ключ входит и хост.
+    raw = (f'{feed_cache.version(names)}:{request.scheme}:'
+           f'{request.get_host()}:{request.path}')
+    return f'syndication:{hashlib.md5(raw.encode()).hexdigest()}'
+
+
+def _caching(chunks, key):
+    # Кэшируется только документ, отданный целиком.
+    parts = []
+    for chunk in chunks:
+        parts.append(chunk)
+        yield chunk
+    cache.set(key, ''.join(parts), settings.FRAGMENT_CACHE_TIMEOUT)
+
+
+def feed_response(request, fmt, names, posts, title, link, description):
+    """Ответ с лентой; names — поколения, под которыми лежит её текст."""
+    content_type = CONTENT_TYPES[fmt]
+    key = _cache_key(request, names)
+    cached = cache.get(key)
+    if cached is not None:
+        return HttpResponse(cached, content_type=content_type)
+    feed = {
+        'title': title,
+        'link': request.build_absolute_uri(link),
+        'feed_url': request.build_absolute_uri(),
+        'description': description,
+        'updated': feed_cache.last_modified(names),
+    }
+    posts = posts.for_feed()[:settings.SYNDICATION_ITEMS]
+    items = (_item(request, post) for post in posts.iterator())
+    return StreamingHttpResponse(
+        _caching(WRITERS[fmt](feed, items), key),
+        content_type=content_type)
@@ -0,0 +1,15 @@
+from tasks.queue import task
+
+from . import feed_cache, thumbnails, timeline
+
+
+@task
+def generate_thumbnails(image_name):
+    # Ошибка уходит в очередь, чтобы задача повторилась.
+    thumbnails.generate(image_name)
+
+
+@task
+def refresh_fan_out(author_id):
+    followers = timeline.refresh_fan_out(author_id)
+    feed_cache.invalidate_follow_feeds(followers)
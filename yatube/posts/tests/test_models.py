@@ -1,6 +1,19 @@
+import json
+import os
+import tempfile
+from io import StringIO
+from unittest import mock, skipUnless
+
 from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.db.models import F, Q
 from django.test import TestCase
-from posts.models import Group, Post
+from posts import exporter, search
+from posts.counters import get_stats
+from posts.importer import Importer
+from posts.models import (Comment, Follow, Group, ImportRef, Post,
+                          TimelineEntry, UserStats)
 
 User = get_user_model()
 
@@ -29,3 +42,271 @@ class PostModelTest(TestCase):
         group = PostModelTest.group
         expected_object_name = group.title
         self.assertEqual(expected_object_name, str(group))
+
+
+class CountersTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='counted_author')
+        cls.reader = User.objects.create_user(username='counted_reader')
+
+    def test_counters_follow_writes(self):
+        """Счётчики меняются вместе с постами, комментариями и подписками."""
+        post = Post.objects.create(text='Пост', author=self.author)
+        comment = Comment.objects.create(
+            post=post, author=self.reader, text='Комментарий')
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(get_stats(self.author).posts_count, 1)
+        self.assertEqual(get_stats(self.author).followers_count, 1)
+        self.assertEqual(get_stats(self.reader).following_count, 1)
+
+        comment.delete()
+        follow.delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 0)
+        self.assertEqual(get_stats(self.author).followers_count, 0)
+        self.assertEqual(get_stats(self.reader).following_count, 0)
+        post.delete()
+        self.assertEqual(get_stats(self.author).posts_count, 0)
+
+    def test_recount_stats_fixes_drift(self):
+        """recount_stats восстанавливает рассинхронизированные счётчики."""
+        post = Post.objects.create(text='Пост', author=self.author)
+        Comment.objects.create(post=post, author=self.reader, text='Текст')
+        Follow.objects.create(user=self.reader, author=self.author)
+        UserStats.objects.update(
+            posts_count=7, followers_count=7, following_count=7)
+        Post.objects.update(comments_count=7)
+        call_command('recount_stats', stdout=StringIO())
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        author_stats = get_stats(self.author)
+        self.assertEqual(author_stats.posts_count, 1)
+        self.assertEqual(author_stats.followers_count, 1)
+        self.assertEqual(author_stats.following_count, 0)
+        self.assertEqual(get_stats(self.reader).following_count, 1)
+
+
+@skipUnless(connection.vendor == 'sqlite', 'план запроса в формате SQLite')
+class QueryPlanTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='planned_author')
+        cls.group = Group.objects.create(
+            title='Группа', slug='planned', description='Описание')
+        cls.post = Post.objects.create(
+            text='Пост', author=cls.author, group=cls.group)
+
+    def assertIndexedPlan(self, queryset):
+        plan = queryset.explain()
+        self.assertNotIn('TEMP B-TREE', plan)
+        for line in plan.splitlines():
+            if 'SCAN' in line:
+                self.assertIn('USING', line, plan)
+
+    def test_feed_queries_use_indexes(self):
+        """Ленты и комментарии читаются по индексу без сортировки."""
+        querysets = {
+            'index': Post.objects.for_feed(),
+            'group': self.group.posts.for_feed(),
+            'profile': self.author.posts.for_feed(),
+            'comments': self.post.comments.all(),
+            'trending': Post.objects.for_feed().filter(
+                trending__isnull=False).order_by(
+                '-trending__rank', F('trending__post').desc()),
+            'follow': Follow.objects.filter(
+                user=self.author, author=self.author),
+            'followers': Follow.objects.filter(author=self.author),
+            'following': Follow.objects.filter(user=self.author),
+        }
+        for name, queryset in querysets.items():
+            with self.subTest(name=name):
+                self.assertIndexedPlan(queryset[:11])
+
+    def test_follow_feed_pages_use_timeline_index(self):
+        """Страница ленты подписок — диапазон индекса ленты."""
+        entries = TimelineEntry.objects.filter(user=self.author).values_list(
+            'pub_date', 'post_id')
+        key = (self.post.pub_date, self.post.pk)
+        querysets = {
+            'first': entries.order_by('-pub_date', '-post_id'),
+            'next': entries.filter(
+                Q(pub_date__lt=key[0])
+                | Q(pub_date=key[0], post_id__lt=key[1])
+            ).order_by('-pub_date', '-post_id'),
+            'previous': entries.filter(
+                Q(pub_date__gt=key[0])
+                | Q(pub_date=key[0], post_id__gt=key[1])
+            ).order_by('pub_date', 'post_id'),
+        }
+        for name, queryset in querysets.items():
+            with self.subTest(name=name):
+                self.assertIndexedPlan(queryset[:11])
+
+
+class ImportContentTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='import_author')
+        cls.reader = User.objects.create_user(username='import_reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='import_slug', description='Описание')
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def write_file(self, name, lines):
+        path = os.path.join(self.directory, name)
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write('\n'.join(lines) + '\n')
+        return path
+
+    def import_content(self, *args, **options):
+        out = StringIO()
+        call_command(
+            'import_content', *args, stdout=out, stderr=StringIO(),
+            **options)
+        return out.getvalue()
+
+    def test_import_jsonl(self):
+        """Посты, комментарии и подписки импортируются со своими датами."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        path = self.write_file('content.jsonl', [
+            json.dumps({'type': 'post', 'author': 'import_author',
+                        'group': 'import_slug', 'text': 'Старый пост',
+                        'pub_date': '2015-03-01T10:00:00+00:00'}),
+            json.dumps({'type': 'post', 'author': 'nobody', 'text': 'x'}),
+            '{битый json',
+            '',
+            json.dumps({'type': 'follow', 'user': 'import_author',
+                        'author': 'import_reader'}),
+        ])
+        output = self.import_content(path, chunk_size=2)
+        self.assertIn('записей/с', output)
+        self.assertIn('пропущено: 2', output)
+        post = Post.objects.get(text='Старый пост')
+        self.assertEqual(post.pub_date.year, 2015)
+        self.assertEqual(post.group, self.group)
+        self.assertTrue(Follow.objects.filter(
+            user=self.author, author=self.reader).exists())
+        self.assertEqual(get_stats(self.author).posts_count, 1)
+        self.assertEqual(get_stats(self.reader).followers_count, 1)
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.reader, post=post).exists())
+        self.assertFalse(os.path.exists(f'{path}.progress'))
+
+        comments = self.write_file('comments.csv', [
+            'post,author,text,created',
+            f'{post.pk},import_reader,Комментарий,2015-03-02T10:00:00',
+            f'{10 ** 6},import_reader,Мимо,',
+        ])
+        self.import_content(comments, kind='comment')
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(post.comments.get().created.year, 2015)
+
+    def test_import_export_round_trip(self):
+        """Комментарии из выгрузки попадают к импортированным постам."""
+        original = Post.objects.create(text='Исходный', author=self.author)
+        Comment.objects.create(
+            post=original, author=self.reader, text='К исходному')
+        records = list(exporter.records(('post', 'comment')))
+        records.append({'type': 'comment', 'post_ref': 10 ** 6,
+                        'author': 'import_reader', 'text': 'Мимо'})
+        path = self.write_file('export.jsonl', b''.join(
+            exporter.jsonl(records)).decode().splitlines())
+        output = self.import_content(path, chunk_size=1)
+        self.assertIn('пропущено: 1', output)
+        copy = Post.objects.exclude(pk=original.pk).get(text='Исходный')
+        self.assertEqual(copy.comments.get().text, 'К исходному')
+        self.assertEqual(original.comments.count(), 1)
+
+    def test_finish_touches_only_imported_users(self):
+        """Импорт пересчитывает счётчики только своих пользователей."""
+        bystander = User.objects.create_user(username='import_bystander')
+        UserStats.objects.update_or_create(
+            user=bystander, defaults={'posts_count': 42})
+        path = self.write_file('posts.jsonl', [json.dumps(
+            {'author': 'import_author', 'text': 'Пост'})])
+        self.import_content(path, kind='post')
+        self.assertEqual(get_stats(self.author).posts_count, 1)
+        self.assertEqual(get_stats(bystander).posts_count, 42)
+
+    def test_post_refs_survive_resume(self):
+        """post_ref находит пост из пачки, записанной до сбоя."""
+        path = self.write_file('export.jsonl', [
+            json.dumps({'type': 'post', 'id': 7, 'author': 'import_author',
+                        'text': 'До сбоя'}),
+            json.dumps({'type': 'comment', 'post_ref': 7,
+                        'author': 'import_reader', 'text': 'После сбоя'}),
+        ])
+        write = Importer.write
+
+        def failing_write(importer, chunk):
+            if chunk[0][0] == 1:
+                raise RuntimeError('сбой')
+            write(importer, chunk)
+
+        with mock.patch.object(Importer, 'write', failing_write):
+            with self.assertRaises(RuntimeError):
+                self.import_content(path, chunk_size=1)
+        with open(f'{path}.progress') as state:
+            self.assertEqual(json.load(state), {'position': 1})
+        self.assertEqual(ImportRef.objects.count(), 1)
+        self.import_content(path, chunk_size=1, resume=True)
+        post = Post.objects.get(text='До сбоя')
+        self.assertEqual(post.comments.get().text, 'После сбоя')
+        self.assertFalse(ImportRef.objects.exists())
+
+    @skipUnless(search.is_supported(), 'FTS5 есть только на SQLite')
+    def test_imported_posts_are_searchable(self):
+        path = self.write_file('posts.jsonl', [json.dumps(
+            {'author': 'import_author', 'text': 'Импортированный текст'})])
+        self.import_content(path, kind='post')
+        self.assertEqual(search.search_posts('импортированный').count(), 1)
+
+    def test_create_missing_users_and_groups(self):
+        path = self.write_file('posts.jsonl', [json.dumps(
+            {'author': 'new_author', 'group': 'new_group', 'text': 'Пост'})])
+        self.import_content(
+            path, kind='post', create_users=True, create_groups=True)
+        post = Post.objects.get(text='Пост')
+        self.assertEqual(post.author.username, 'new_author')
+        self.assertFalse(post.author.has_usable_password())
+        self.assertEqual(post.group.slug, 'new_group')
+
+    def test_resume_after_failure(self):
+        """После сбоя импорт продолжается с последней целой пачки."""
+        path = self.write_file('posts.jsonl', [
+            json.dumps({'author': 'import_author', 'text': f'Пост {i}'})
+            for i in range(5)
+        ])
+        write = Importer.write
+        calls = []
+
+        def failing_write(importer, chunk):
+            calls.append(chunk)
+            if len(calls) == 2:
+                raise RuntimeError('сбой')
+            write(importer, chunk)
+
+        with mock.patch.object(Importer, 'write', failing_write):
+            with self.assertRaises(RuntimeError):
+                self.import_content(path, kind='post', chunk_size=2)
+        self.assertEqual(Post.objects.count(), 2)
+        self.assertEqual(get_stats(self.author).posts_count, 2)
+        with self.assertRaises(CommandError):
+            self.import_content(path, kind='post', chunk_size=2)
+
+        self.import_content(path, kind='post', chunk_size=2, resume=True)
+        self.assertEqual(
+            sorted(Post.objects.values_list('text', flat=True)),
+            [f'Пост {i}' for i in range(5)])
+        self.assertEqual(get_stats(self.author).posts_count, 5)
@@ -1,12 +1,40 @@
+import gzip
+import json
+import os
 import shutil
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+from xml.etree import ElementTree
 
 from django import forms
+from core.images import available_formats, variant_name
+from core.utils import CursorPaginator
 from django.conf import settings
 from django.core.cache import cache
+from django.core.files.storage import default_storage
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.test import Client, TestCase
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
 from django.urls import reverse
-from posts.models import Follow, Group, Post, User
+from django.utils import timezone
+from posts import (benchmark, follow_graph, recommendations, search,
+                   thumbnails, trending)
+from posts.models import (Comment, Follow, Group, Post, PostScore,
+                          Recommendation, TimelineEntry, User)
+from posts.timeline import TimelinePaginator
+from tasks import worker
+from tasks.models import Task
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
 
 
 class PostTests(TestCase):
@@ -229,19 +257,51 @@ class PostTests(TestCase):
 
     def test_cache(self):
         " Кэш "
+        cache.clear()
         pre_response = self.authorized_client.get(reverse('posts:index'))
-        post = Post.objects.create(text='test', author=self.user)
-        response_after = self.authorized_client.get(reverse('posts:index'))
-        Post.objects.filter(id=post.id).delete()
-        response_after_delete = self.authorized_client.get(
-            reverse('posts:index'))
-        self.assertEqual(response_after.content, response_after_delete.content)
+        Post.objects.filter(id=self.post.id).update(text='Без сигналов')
+        response_cached = self.authorized_client.get(reverse('posts:index'))
+        self.assertEqual(pre_response.content, response_cached.content)
         cache.clear()
         response_after_clear = self.authorized_client.get(
             reverse('posts:index'))
-        self.assertEqual(
-            response_after_clear.context['paginator'].count,
-            pre_response.context['paginator'].count)
+        self.assertContains(response_after_clear, 'Без сигналов')
+
+    def test_cache_invalidated_on_changes(self):
+        """Кэш лент сбрасывается при изменении постов."""
+        cache.clear()
+        feed_urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group1.slug}),
+            reverse('posts:profile', kwargs={'username': self.user1}),
+        )
+        for url in feed_urls:
+            self.guest_client.get(url)
+        post = Post.objects.create(
+            text='Свежий пост', author=self.user1, group=self.group1)
+        for url in feed_urls:
+            with self.subTest(url=url):
+                self.assertContains(self.guest_client.get(url), 'Свежий пост')
+        post.text = 'Исправленный пост'
+        post.save()
+        for url in feed_urls:
+            with self.subTest(url=url):
+                self.assertContains(
+                    self.guest_client.get(url), 'Исправленный пост')
+        post.delete()
+        for url in feed_urls:
+            with self.subTest(url=url):
+                self.assertNotContains(
+                    self.guest_client.get(url), 'Исправленный пост')
+
+    def test_follow_cache_invalidated_on_new_post(self):
+        """Кэш ленты подписок сбрасывается при новом посте автора."""
+        cache.clear()
+        Follow.objects.create(user=self.user, author=self.user1)
+        self.authorized_client.get(reverse('posts:follow_index'))
+        Post.objects.create(text='Пост для подписчиков', author=self.user1)
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        self.assertContains(response, 'Пост для подписчиков')
 
 
 class PaginatorViewsTest(TestCase):
@@ -295,3 +355,1014 @@ class PaginatorViewsTest(TestCase):
             response = self.client.get(tested_url)
             self.assertEqual(len
                              (response.context.get('page_obj').object_list), 3)
+
+
+class CursorPaginatorViewsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='cursor_author')
+        cls.group = Group.objects.create(
+            title='Группа для курсоров',
+            slug='cursor_slug',
+            description='Тестовое описание')
+        Post.objects.bulk_create([
+            Post(text=f'Пост {i}', author=cls.author, group=cls.group)
+            for i in range(13)
+        ])
+        cls.follower = User.objects.create_user(username='cursor_reader')
+        Follow.objects.create(user=cls.follower, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.follower)
+
+    def test_cursor_pages_cover_feed(self):
+        """Курсоры обходят ленту без пропусков и повторов."""
+        list_urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': 'cursor_slug'}),
+            reverse('posts:profile', kwargs={'username': 'cursor_author'}),
+            reverse('posts:follow_index'),
+        )
+        expected = list(
+            Post.objects.order_by('-pub_date', '-id').values_list(
+                'id', flat=True))
+        for url in list_urls:
+            with self.subTest(url=url):
+                first = self.authorized_client.get(url + '?cursor=')
+                page_obj = first.context['page_obj']
+                self.assertEqual(len(page_obj), 10)
+                self.assertFalse(page_obj.has_previous())
+                second = self.authorized_client.get(
+                    url + f'?cursor={page_obj.next_cursor}')
+                last_page = second.context['page_obj']
+                self.assertEqual(len(last_page), 3)
+                self.assertFalse(last_page.has_next())
+                ids = [post.id for post in page_obj]
+                ids += [post.id for post in last_page]
+                self.assertEqual(ids, expected)
+                back = self.authorized_client.get(
+                    url + f'?cursor={last_page.previous_cursor}')
+                self.assertEqual(
+                    [post.id for post in back.context['page_obj']],
+                    expected[:10])
+
+    def test_broken_cursor_returns_first_page(self):
+        """Битый курсор открывает первую страницу."""
+        response = self.client.get(reverse('posts:index') + '?cursor=abc!')
+        self.assertEqual(len(response.context['page_obj']), 10)
+
+    @override_settings(PAGINATION_MODE='cursor')
+    def test_cursor_mode_from_settings(self):
+        """В режиме cursor лента пагинируется без номеров страниц."""
+        response = self.client.get(reverse('posts:index'))
+        page_obj = response.context['page_obj']
+        self.assertTrue(page_obj.is_cursor)
+        self.assertContains(response, f'?cursor={page_obj.next_cursor}')
+
+    @override_settings(PAGINATION_MODE='cursor')
+    def test_write_during_page_read_is_not_cached_stale(self):
+        """Пост, записанный во время чтения страницы, виден следующему."""
+        get_page = CursorPaginator.get_page
+        created = []
+
+        def get_page_then_write(paginator, cursor=None):
+            page = get_page(paginator, cursor)
+            if not created:
+                created.append(Post.objects.create(
+                    text='Во время чтения', author=self.author))
+            return page
+
+        url = reverse('posts:index')
+        with mock.patch.object(
+                CursorPaginator, 'get_page', get_page_then_write):
+            self.assertNotContains(self.client.get(url), 'Во время чтения')
+        self.assertContains(self.client.get(url), 'Во время чтения')
+
+
+class TimelineTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='timeline_author')
+        cls.reader = User.objects.create_user(username='timeline_reader')
+        cls.old_post = Post.objects.create(
+            text='Старый пост', author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.reader)
+
+    def feed(self):
+        response = self.client.get(reverse('posts:follow_index'))
+        return list(response.context['page_obj'])
+
+    def test_follow_backfills_and_unfollow_prunes(self):
+        """Подписка наполняет ленту, отписка очищает её."""
+        self.client.get(reverse(
+            'posts:profile_follow',
+            kwargs={'username': self.author.username}))
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.reader, post=self.old_post).exists())
+        self.assertEqual(self.feed(), [self.old_post])
+        self.client.get(reverse(
+            'posts:profile_unfollow',
+            kwargs={'username': self.author.username}))
+        self.assertFalse(
+            TimelineEntry.objects.filter(user=self.reader).exists())
+        self.assertEqual(self.feed(), [])
+
+    def test_new_post_fans_out_to_followers(self):
+        """Новый пост попадает в ленты подписчиков."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        new_post = Post.objects.create(text='Новый пост', author=self.author)
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.reader, post=new_post).exists())
+        self.assertEqual(self.feed(), [new_post, self.old_post])
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=0)
+    def test_celebrity_posts_read_directly(self):
+        """Посты популярных авторов читаются без раздачи по лентам."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        new_post = Post.objects.create(text='Новый пост', author=self.author)
+        self.assertFalse(
+            TimelineEntry.objects.filter(user=self.reader).exists())
+        self.assertEqual(self.feed(), [new_post, self.old_post])
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=1)
+    def test_author_becoming_celebrity_is_not_duplicated(self):
+        """Переход порога вверх не дублирует посты в ленте."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        other = User.objects.create_user(username='timeline_other')
+        Follow.objects.create(user=other, author=self.author)
+        self.assertEqual(self.feed(), [self.old_post])
+        worker.work('test', burst=True)
+        self.assertFalse(TimelineEntry.objects.filter(
+            post__author=self.author).exists())
+        self.assertEqual(self.feed(), [self.old_post])
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=1)
+    def test_author_leaving_celebrities_is_fanned_out(self):
+        """После перехода порога вниз посты автора раздаются заново."""
+        other = User.objects.create_user(username='timeline_other')
+        Follow.objects.create(user=self.reader, author=self.author)
+        Follow.objects.create(user=other, author=self.author)
+        worker.work('test', burst=True)
+        new_post = Post.objects.create(text='Новый пост', author=self.author)
+        Follow.objects.filter(user=other).delete()
+        worker.work('test', burst=True)
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.reader, post=new_post).exists())
+        self.assertEqual(self.feed(), [new_post, self.old_post])
+
+    def test_pages_merge_timeline_and_celebrity_posts(self):
+        """Курсор обходит слитые ленту и посты популярных авторов."""
+        celebrity = User.objects.create_user(username='timeline_celebrity')
+        Follow.objects.create(user=self.reader, author=self.author)
+        for i in range(3):
+            Post.objects.create(text=f'Пост {i}', author=self.author)
+            Post.objects.create(text=f'Звезда {i}', author=celebrity)
+        expected = list(Post.objects.filter(
+            author__in=[self.author, celebrity]).values_list('pk', flat=True))
+        paginator = TimelinePaginator(
+            self.reader, Post.objects.all(), 4, celebrities=[celebrity.pk])
+        first = paginator.get_page()
+        last = paginator.get_page(first.next_cursor)
+        self.assertEqual(
+            [post.pk for post in first] + [post.pk for post in last],
+            expected)
+        self.assertFalse(last.has_next())
+        back = paginator.get_page(last.previous_cursor)
+        self.assertEqual([post.pk for post in back], expected[:4])
+
+
+class FollowGraphTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='graph_reader')
+        cls.authors = [
+            User.objects.create_user(username=f'graph_author{i}')
+            for i in range(10)
+        ]
+        for author in cls.authors[:3]:
+            Follow.objects.create(user=cls.reader, author=author)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.reader)
+
+    def test_batch_membership_from_cache(self):
+        """Проверка подписок на авторов страницы без запросов к базе."""
+        author_ids = [author.pk for author in self.authors]
+        expected = {author.pk for author in self.authors[:3]}
+        self.assertEqual(
+            follow_graph.following_among(self.reader, author_ids), expected)
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                follow_graph.following_among(self.reader, author_ids),
+                expected)
+            self.assertTrue(
+                follow_graph.is_following(self.reader, self.authors[0]))
+
+    def test_follow_and_unfollow_keep_cache_coherent(self):
+        author = self.authors[5]
+        profile_url = reverse(
+            'posts:profile', kwargs={'username': author.username})
+        self.assertFalse(self.client.get(profile_url).context['following'])
+        self.assertEqual(follow_graph.follower_count(author.pk), 0)
+        self.client.get(reverse(
+            'posts:profile_follow', kwargs={'username': author.username}))
+        self.assertTrue(self.client.get(profile_url).context['following'])
+        self.assertEqual(
+            follow_graph.follower_ids(author.pk), {self.reader.pk})
+        self.client.get(reverse(
+            'posts:profile_unfollow', kwargs={'username': author.username}))
+        self.assertFalse(self.client.get(profile_url).context['following'])
+        self.assertEqual(follow_graph.follower_count(author.pk), 0)
+
+    @override_settings(FOLLOW_GRAPH_MAX_FOLLOWERS=1)
+    def test_popular_author_keeps_only_count(self):
+        author = self.authors[0]
+        Follow.objects.create(user=self.authors[1], author=author)
+        self.assertIsNone(follow_graph.follower_ids(author.pk))
+        self.assertEqual(follow_graph.follower_count(author.pk), 2)
+
+    def test_bulk_changes_reset_graph(self):
+        """Массовая запись в обход сигналов сбрасывает весь граф."""
+        author = self.authors[9]
+        self.assertFalse(follow_graph.is_following(self.reader, author))
+        Follow.objects.bulk_create([Follow(user=self.reader, author=author)])
+        follow_graph.invalidate_all()
+        self.assertTrue(follow_graph.is_following(self.reader, author))
+
+
+class RecommendationsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        names = ('reader', 'a', 'b', 'c', 'd', 'e', 'x', 'loner')
+        cls.users = {
+            name: User.objects.create_user(username=f'rec_{name}')
+            for name in names
+        }
+        follows = {
+            'reader': ('a', 'b'),
+            'a': ('c',),
+            'b': ('c', 'd'),
+            'x': ('a', 'e'),
+        }
+        for user, authors in follows.items():
+            for author in authors:
+                Follow.objects.create(
+                    user=cls.users[user], author=cls.users[author])
+
+    def setUp(self):
+        cache.clear()
+
+    def recommended(self, name):
+        return list(Recommendation.objects.filter(
+            user=self.users[name]).values_list(
+            'author__username', 'mutual'))
+
+    def test_friends_of_friends_and_co_follows(self):
+        recommendations.rebuild(processes=1, limit=3)
+        self.assertEqual(
+            self.recommended('reader'),
+            [('rec_c', 2), ('rec_d', 1), ('rec_e', 0)])
+        # Без подписок — самые популярные авторы.
+        self.assertEqual(
+            [name for name, _ in self.recommended('loner')],
+            ['rec_a', 'rec_c', 'rec_b'])
+
+    def test_parallel_rebuild_matches(self):
+        recommendations.rebuild(processes=1, chunk_size=3)
+        expected = list(Recommendation.objects.values_list(
+            'user_id', 'author_id', 'score'))
+        out = StringIO()
+        call_command(
+            'recommend_authors', processes=2, chunk_size=3, stdout=out)
+        self.assertIn(f'Записано рекомендаций: {len(expected)}',
+                      out.getvalue())
+        self.assertEqual(
+            list(Recommendation.objects.values_list(
+                'user_id', 'author_id', 'score')), expected)
+
+    def test_pages_show_recommendations(self):
+        recommendations.rebuild(processes=1)
+        reader = self.users['reader']
+        self.client.force_login(reader)
+        profile_url = reverse(
+            'posts:profile', kwargs={'username': reader.username})
+        response = self.client.get(reverse('posts:follow_index'))
+        self.assertEqual(
+            [item.author.username
+             for item in response.context['recommendations']][:2],
+            ['rec_c', 'rec_d'])
+        self.assertTrue(self.client.get(profile_url).context[
+            'recommendations'])
+        # В чужом профиле рекомендаций нет.
+        response = self.client.get(reverse(
+            'posts:profile', kwargs={'username': 'rec_a'}))
+        self.assertEqual(response.context['recommendations'], [])
+        # После подписки автор пропадает из рекомендаций.
+        self.client.get(reverse(
+            'posts:profile_follow', kwargs={'username': 'rec_c'}))
+        response = self.client.get(profile_url)
+        self.assertNotIn(
+            'rec_c',
+            [item.author.username
+             for item in response.context['recommendations']])
+
+
+@override_settings(TRENDING_HALF_LIFE=3600, TRENDING_MIN_SCORE=0.1)
+class TrendingTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='trending_author')
+        cls.posts = [
+            Post.objects.create(author=cls.author, text=f'Популярный {i}')
+            for i in range(3)
+        ]
+
+    def setUp(self):
+        cache.clear()
+
+    def comment(self, post, count=1):
+        for i in range(count):
+            Comment.objects.create(
+                post=post, author=self.author, text=f'Комментарий {i}')
+
+    def ranked(self):
+        response = self.client.get(reverse('posts:trending'))
+        return [post.pk for post in response.context['page_obj']]
+
+    def test_comments_raise_rank(self):
+        first, second, third = self.posts
+        self.comment(second, 2)
+        self.comment(third)
+        self.assertEqual(self.ranked(), [second.pk, third.pk])
+        self.assertAlmostEqual(
+            PostScore.objects.get(post=second).comments, 2, places=3)
+
+    def test_old_comments_weigh_less(self):
+        first, second, _ = self.posts
+        long_ago = timezone.now() - timedelta(hours=3)
+        for _ in range(4):
+            trending.record_comment(first.pk, long_ago)
+        trending.record_comment(second.pk)
+        # 4 комментария три периода назад сейчас весят 0,5.
+        score = PostScore.objects.get(post=first)
+        self.assertAlmostEqual(
+            score.comments * trending.decay(score.updated, timezone.now()),
+            0.5, places=3)
+        self.assertEqual(
+            list(PostScore.objects.values_list('post', flat=True)),
+            [second.pk, first.pk])
+
+    def test_compaction_matches_incremental_scores(self):
+        first, second, third = self.posts
+        self.comment(first, 3)
+        self.comment(second)
+        incremental = dict(PostScore.objects.values_list('post', 'comments'))
+        trending.compact()
+        for post_id, score in PostScore.objects.values_list(
+                'post', 'comments'):
+            self.assertAlmostEqual(score, incremental[post_id], places=3)
+        # Удалённые комментарии и затухшие оценки убираются.
+        Comment.objects.filter(post=second).delete()
+        trending.compact(timezone.now() + timedelta(hours=3))
+        self.assertEqual(
+            list(PostScore.objects.values_list('post', flat=True)),
+            [first.pk])
+        out = StringIO()
+        call_command('compact_trending', stdout=out)
+        self.assertIn('Постов в ленте «Популярное»: 1', out.getvalue())
+
+    @override_settings(TRENDING_VIEWS_BATCH=2, TRENDING_VIEW_WEIGHT=0.5)
+    def test_views_are_written_in_batches(self):
+        post = self.posts[0]
+        url = reverse('posts:post_detail', kwargs={'post_id': post.pk})
+        response = self.client.get(url)
+        self.assertFalse(PostScore.objects.exists())
+        # Повторный просмотр с ответом 304 тоже засчитывается.
+        response = self.client.get(
+            url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(PostScore.objects.get(post=post).views, 1)
+        # Просмотры переживают пересчёт комментариев.
+        trending.compact()
+        self.assertAlmostEqual(
+            PostScore.objects.get(post=post).views, 1, places=3)
+
+    def test_views_recorded_during_compaction_survive(self):
+        """Просмотр, записанный посреди пересчёта, не теряется."""
+        post = self.posts[0]
+        self.comment(post)
+        compact_row = trending._compact_row
+        added = []
+
+        def compact_row_after_view(score, comments, now):
+            if not added:
+                added.append(True)
+                trending._add(post.pk, now, views=5)
+            return compact_row(score, comments, now)
+
+        with mock.patch.object(
+                trending, '_compact_row', compact_row_after_view):
+            trending.compact()
+        score = PostScore.objects.get(post=post)
+        self.assertAlmostEqual(score.views, 5, places=3)
+        self.assertAlmostEqual(score.comments, 1, places=3)
+
+    def test_page_is_cached_until_scores_change(self):
+        first, second, _ = self.posts
+        self.comment(first)
+        self.assertEqual(self.ranked(), [first.pk])
+        # Из базы — только число постов для пагинатора.
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('posts:trending'))
+        self.assertContains(response, 'Популярный 0')
+        self.comment(second, 2)
+        # Обновление страницы не чаще раза в TRENDING_REFRESH.
+        self.assertNotContains(
+            self.client.get(reverse('posts:trending')), 'Популярный 1')
+        trending.compact()
+        response = self.client.get(reverse('posts:trending'))
+        content = response.content.decode()
+        self.assertLess(
+            content.index('Популярный 1'), content.index('Популярный 0'))
+
+
+class FeedQueriesTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        authors = [
+            User.objects.create_user(
+                username=f'feed_author{i}', first_name=f'Имя{i}')
+            for i in range(3)
+        ]
+        cls.group = Group.objects.create(
+            title='Группа ленты', slug='feed_slug', description='Описание')
+        other_group = Group.objects.create(
+            title='Другая группа', slug='feed_other', description='Описание')
+        cls.author = authors[0]
+        cls.reader = User.objects.create_user(username='feed_reader')
+        for author in authors:
+            Follow.objects.create(user=cls.reader, author=author)
+        for i in range(12):
+            Post.objects.create(
+                text=f'Пост ленты {i}',
+                author=authors[i % 3],
+                group=(cls.group, other_group)[i % 2])
+
+    def setUp(self):
+        cache.clear()
+
+    def test_feed_query_count(self):
+        """Число запросов страницы ленты не зависит от числа постов."""
+        list_urls = {
+            reverse('posts:index'): 2,
+            reverse('posts:group_list', kwargs={'slug': 'feed_slug'}): 4,
+            reverse('posts:profile',
+                    kwargs={'username': self.author.username}): 5,
+        }
+        for url, queries in list_urls.items():
+            with self.subTest(url=url):
+                with self.assertNumQueries(queries):
+                    self.client.get(url)
+
+    def test_follow_feed_query_count(self):
+        """Лента подписок строится фиксированным числом запросов."""
+        self.client.force_login(self.reader)
+        # Пятый запрос — рекомендации.
+        with self.assertNumQueries(6):
+            self.client.get(reverse('posts:follow_index'))
+
+    def test_for_feed_selects_author_and_group(self):
+        """for_feed загружает автора и группу без дополнительных запросов."""
+        posts = list(Post.objects.for_feed())
+        with self.assertNumQueries(0):
+            for post in posts:
+                post.author.get_full_name()
+                post.author.username
+                if post.group:
+                    post.group.slug
+
+
+class SearchViewTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='search_author')
+        cls.apples = Post.objects.create(
+            text='Яблоки и груши в саду', author=cls.author)
+        cls.more_apples = Post.objects.create(
+            text='Яблоки яблоки яблоки', author=cls.author)
+        cls.pears = Post.objects.create(
+            text='Только груши', author=cls.author)
+
+    def search(self, query):
+        response = self.client.get(reverse('posts:search'), {'q': query})
+        return list(response.context['page_obj'])
+
+    def test_search_finds_matching_posts(self):
+        """Поиск находит посты по словам и ранжирует их."""
+        self.assertEqual(self.search('яблоки'),
+                         [self.more_apples, self.apples])
+        self.assertEqual(self.search('груши сад'), [self.apples])
+        self.assertEqual(self.search('яблок'),
+                         [self.more_apples, self.apples])
+
+    def test_search_index_follows_changes(self):
+        """Индекс обновляется при изменении и удалении постов."""
+        post = Post.objects.create(text='Сливы', author=self.author)
+        self.assertEqual(self.search('сливы'), [post])
+        post.text = 'Вишни'
+        post.save()
+        self.assertEqual(self.search('сливы'), [])
+        self.assertEqual(self.search('вишни'), [post])
+        post.delete()
+        self.assertEqual(self.search('вишни'), [])
+
+    def test_search_without_query(self):
+        """Без запроса страница поиска открывается без результатов."""
+        response = self.client.get(reverse('posts:search'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.context['page_obj'])
+
+    def test_reindex_posts_restores_index(self):
+        """reindex_posts восстанавливает индекс после рассинхронизации."""
+        search.uninstall()
+        search.install()
+        self.assertEqual(self.search('груши'), [])
+        call_command('reindex_posts', stdout=StringIO())
+        self.assertEqual(self.search('груши'), [self.pears, self.apples])
+
+    def test_admin_search_uses_index(self):
+        """Поиск в админке использует полнотекстовый индекс."""
+        admin = User.objects.create_superuser(
+            username='search_admin', email='admin@example.com',
+            password='password')
+        self.client.force_login(admin)
+        response = self.client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'груши'})
+        self.assertEqual(
+            set(response.context['cl'].result_list),
+            {self.apples, self.pears})
+
+
+class ThumbnailsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.media_root = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        cls.media_settings = override_settings(MEDIA_ROOT=cls.media_root)
+        cls.media_settings.enable()
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='thumb_author')
+        cls.post = Post.objects.create(
+            text='Пост с картинкой',
+            author=cls.author,
+            image=SimpleUploadedFile(
+                name='thumb.gif', content=SMALL_GIF,
+                content_type='image/gif'))
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        cls.media_settings.disable()
+        shutil.rmtree(cls.media_root, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        for directory in ('cache', 'variants'):
+            shutil.rmtree(
+                os.path.join(self.media_root, directory), ignore_errors=True)
+
+    def thumbnails(self):
+        thumbnails_dir = os.path.join(self.media_root, 'cache')
+        return [
+            os.path.join(root, name)
+            for root, _, names in os.walk(thumbnails_dir)
+            for name in names
+        ]
+
+    def test_saving_post_queues_thumbnails(self):
+        """Нарезка ставится в очередь и выполняется воркером."""
+        queued = Task.objects.get(key=f'thumbnails:{self.post.image.name}')
+        self.assertEqual(queued.name, 'posts.tasks.generate_thumbnails')
+        worker.work('test', burst=True)
+        queued.refresh_from_db()
+        self.assertEqual(queued.status, Task.DONE)
+        self.assertEqual(
+            len(self.thumbnails()), len(settings.THUMBNAIL_PRESETS))
+
+    def test_generate_thumbnails_command(self):
+        """generate_thumbnails нарезает миниатюры для всех картинок."""
+        self.assertEqual(self.thumbnails(), [])
+        out = StringIO()
+        call_command('generate_thumbnails', workers=1, stdout=out)
+        self.assertIn('для 1 картинок', out.getvalue())
+        self.assertEqual(
+            len(self.thumbnails()), len(settings.THUMBNAIL_PRESETS))
+
+    def test_generate_thumbnails_in_processes(self):
+        """Пачки раздаются процессам понемногу, без списка всех имён."""
+        for i in range(4):
+            Post.objects.create(
+                text=f'Ещё картинка {i}', author=self.author,
+                image=SimpleUploadedFile(
+                    name=f'more_{i}.gif', content=SMALL_GIF,
+                    content_type='image/gif'))
+        out = StringIO()
+        call_command(
+            'generate_thumbnails', workers=2, chunk_size=1, stdout=out)
+        self.assertIn('для 5 картинок', out.getvalue())
+
+    def test_feed_falls_back_to_thumbnail(self):
+        """Без вариантов лента показывает миниатюру sorl-thumbnail."""
+        response = self.client.get(reverse('posts:index'))
+        name = os.path.relpath(self.thumbnails()[0], self.media_root)
+        self.assertContains(response, settings.MEDIA_URL + name)
+        self.assertNotContains(response, '<picture>')
+
+    def test_variants_replace_cached_fallback(self):
+        """Нарезка сбрасывает карточки, закэшированные с миниатюрой."""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:profile',
+                    kwargs={'username': self.author.username}),
+        )
+        for url in urls:
+            self.assertNotContains(self.client.get(url), '<picture>')
+        thumbnails.generate(self.post.image.name)
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertContains(self.client.get(url), '<picture>')
+
+    def test_feed_uses_pregenerated_variants(self):
+        """После нарезки лента отдаёт варианты через srcset."""
+        thumbnails.generate(self.post.image.name)
+        for width in settings.IMAGE_VARIANT_WIDTHS:
+            for fmt in available_formats():
+                with self.subTest(width=width, fmt=fmt):
+                    name = variant_name(self.post.image.name, width, fmt)
+                    self.assertTrue(default_storage.exists(name))
+                    self.assertTrue(name.startswith('variants/posts/'))
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, '<picture>')
+        name = variant_name(self.post.image.name, 640, 'jpeg')
+        self.assertContains(response, f'{settings.MEDIA_URL}{name} 640w')
+
+    def test_variants_keep_source_extension(self):
+        """Картинки с одним именем и разными расширениями не смешиваются."""
+        stem = os.path.splitext(self.post.image.name)[0]
+        names = {
+            variant_name(f'{stem}.{extension}', 640, 'jpeg')
+            for extension in ('jpg', 'png')
+        }
+        self.assertEqual(len(names), 2)
+
+
+class ConditionalGetTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='etag_author')
+        cls.group = Group.objects.create(
+            title='Группа', slug='etag_slug', description='Описание')
+        cls.post = Post.objects.create(
+            text='Пост', author=cls.author, group=cls.group)
+
+    def setUp(self):
+        cache.clear()
+        self.urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile',
+                    kwargs={'username': self.author.username}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}),
+        )
+
+    def test_matching_etag_returns_304(self):
+        """Совпавший ETag получает 304 без рендеринга шаблона."""
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertTrue(response.has_header('ETag'))
+                self.assertTrue(response.has_header('Last-Modified'))
+                repeated = self.client.get(
+                    url, HTTP_IF_NONE_MATCH=response['ETag'])
+                self.assertEqual(repeated.status_code, 304)
+                self.assertIsNone(repeated.templates or None)
+
+    def test_if_modified_since_returns_304(self):
+        """Страница без изменений отвечает 304 на If-Modified-Since."""
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                repeated = self.client.get(
+                    url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+                self.assertEqual(repeated.status_code, 304)
+
+    def test_changes_invalidate_etag(self):
+        """Изменения данных меняют ETag страниц."""
+        etags = {url: self.client.get(url)['ETag'] for url in self.urls}
+        self.post.text = 'Новый текст'
+        self.post.save()
+        for url, etag in etags.items():
+            with self.subTest(url=url):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+
+    def test_comment_invalidates_post_detail(self):
+        """Новый комментарий меняет ETag страницы поста."""
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        etag = self.client.get(url)['ETag']
+        Comment.objects.create(
+            post=self.post, author=self.author, text='Комментарий')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_etag_depends_on_user(self):
+        """Разные пользователи получают разные ETag."""
+        url = reverse('posts:index')
+        etag = self.client.get(url)['ETag']
+        self.client.force_login(self.author)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_post_detail_etag_follows_csrf_cookie(self):
+        """После нового входа страница с формой не отдаётся как 304."""
+        User.objects.create_user(username='etag_reader', password='secret')
+        credentials = {'username': 'etag_reader', 'password': 'secret'}
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        self.client.post(reverse('users:login'), credentials)
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(
+            self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.client.get(reverse('users:logout'))
+        self.client.post(reverse('users:login'), credentials)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_missing_objects_still_404(self):
+        """Для несуществующих объектов по-прежнему отдаётся 404."""
+        for url in (
+            reverse('posts:group_list', kwargs={'slug': 'missing'}),
+            reverse('posts:profile', kwargs={'username': 'missing'}),
+            reverse('posts:post_detail', kwargs={'post_id': 10 ** 6}),
+        ):
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code, 404)
+
+
+class SyndicationTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(
+            username='feed_writer', first_name='Лев', last_name='Толстой')
+        cls.group = Group.objects.create(
+            title='Группа <лент>', slug='feeds_slug', description='Описание')
+        cls.post = Post.objects.create(
+            text='Текст & <разметка>', author=cls.author, group=cls.group)
+        cls.other = Post.objects.create(text='Без группы', author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+
+    def feed_urls(self, fmt):
+        return (
+            reverse('posts:index_feed', kwargs={'fmt': fmt}),
+            reverse('posts:group_feed',
+                    kwargs={'slug': self.group.slug, 'fmt': fmt}),
+            reverse('posts:profile_feed',
+                    kwargs={'username': self.author.username, 'fmt': fmt}),
+        )
+
+    def get_content(self, url, **headers):
+        response = self.client.get(url, **headers)
+        if response.streaming:
+            return response, b''.join(response.streaming_content).decode()
+        return response, response.content.decode()
+
+    def test_xml_feeds(self):
+        """RSS и Atom — корректный XML с экранированным текстом постов."""
+        for fmt, tag in (('rss', 'item'), ('atom', '{*}entry')):
+            for url in self.feed_urls(fmt):
+                with self.subTest(url=url):
+                    response, content = self.get_content(url)
+                    self.assertEqual(response.status_code, 200)
+                    self.assertIn(fmt, response['Content-Type'])
+                    root = ElementTree.fromstring(content.encode())
+                    entries = root.findall(f'.//{tag}')
+                    self.assertTrue(entries)
+                    self.assertIn('Текст &amp; &lt;разметка&gt;', content)
+
+    def test_json_feed(self):
+        """JSON Feed содержит посты ленты с авторами и группами."""
+        url = reverse('posts:group_feed',
+                      kwargs={'slug': self.group.slug, 'fmt': 'json'})
+        response, content = self.get_content(url)
+        data = json.loads(content)
+        self.assertEqual(data['version'], 'https://jsonfeed.org/version/1.1')
+        self.assertEqual(len(data['items']), 1)
+        item = data['items'][0]
+        self.assertEqual(item['content_text'], self.post.text)
+        self.assertEqual(item['authors'], [{'name': 'Лев Толстой'}])
+        self.assertEqual(item['tags'], [self.group.title])
+
+    def test_cached_feed_skips_post_queries(self):
+        """Повторный опрос отдаёт ленту из кэша без запросов к постам."""
+        url = reverse('posts:index_feed', kwargs={'fmt': 'rss'})
+        _, content = self.get_content(url)
+        with self.assertNumQueries(0):
+            response, cached = self.get_content(url)
+        self.assertEqual(cached, content)
+
+    def test_conditional_get(self):
+        """Совпавший ETag получает 304, новый пост меняет ленту."""
+        for url in self.feed_urls('atom'):
+            with self.subTest(url=url):
+                response, _ = self.get_content(url)
+                repeated = self.client.get(
+                    url, HTTP_IF_NONE_MATCH=response['ETag'])
+                self.assertEqual(repeated.status_code, 304)
+        url = reverse('posts:profile_feed',
+                      kwargs={'username': self.author.username, 'fmt': 'json'})
+        response, _ = self.get_content(url)
+        Post.objects.create(text='Свежий пост', author=self.author)
+        response, content = self.get_content(
+            url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Свежий пост', content)
+
+    def test_unknown_feeds(self):
+        """Неизвестные группа, автор и формат дают 404."""
+        for url in (
+            reverse('posts:group_feed', kwargs={'slug': 'nope', 'fmt': 'rss'}),
+            reverse('posts:profile_feed',
+                    kwargs={'username': 'nope', 'fmt': 'rss'}),
+            '/feed.xml',
+        ):
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_pages_link_feeds(self):
+        """Страницы лент ссылаются на свои RSS/Atom/JSON-версии."""
+        response = self.client.get(
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}))
+        for url in self.feed_urls('rss')[1:2] + self.feed_urls('json')[1:2]:
+            self.assertContains(response, f'href="{url}"')
+
+
+class ExportContentTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='export_author')
+        cls.staff = User.objects.create_user(
+            username='export_staff', is_staff=True)
+        cls.posts = [
+            Post.objects.create(text=f'Пост {i}', author=cls.author)
+            for i in range(3)
+        ]
+        Comment.objects.create(
+            post=cls.posts[0], author=cls.staff, text='Комментарий')
+        Follow.objects.create(user=cls.staff, author=cls.author)
+
+    def download(self, **params):
+        response = self.client.get(reverse('posts:export_content'), params)
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        data = gzip.decompress(b''.join(response.streaming_content))
+        return [json.loads(line) for line in data.decode().splitlines()]
+
+    def test_export_requires_staff(self):
+        """Выгрузка доступна только персоналу."""
+        self.client.force_login(self.author)
+        response = self.client.get(reverse('posts:export_content'))
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(response.streaming)
+
+    def test_export(self):
+        """Персонал скачивает все записи в формате import_content."""
+        self.client.force_login(self.staff)
+        records = self.download()
+        self.assertEqual(
+            [record['type'] for record in records],
+            ['post'] * 3 + ['comment', 'follow'])
+        self.assertEqual(records[0]['text'], 'Пост 0')
+        self.assertEqual(records[0]['author'], 'export_author')
+        self.assertEqual(records[3]['post_ref'], self.posts[0].pk)
+        self.assertEqual(records[4]['user'], 'export_staff')
+        follows = self.download(kind='follow')
+        self.assertEqual([record['type'] for record in follows], ['follow'])
+
+    def test_export_command_walks_in_chunks(self):
+        """Команда обходит таблицы пачками и ничего не теряет."""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, 'export.jsonl.gz')
+        call_command(
+            'export_content', path, kind=['post'], chunk_size=2,
+            stdout=StringIO())
+        with gzip.open(path, 'rt', encoding='utf-8') as export:
+            ids = [json.loads(line)['id'] for line in export]
+        self.assertEqual(ids, [post.pk for post in self.posts])
+
+
+class BenchmarkTest(TestCase):
+    def test_run_records_metrics(self):
+        """Замеры проходят по всем страницам и глубинам."""
+        results = benchmark.run(sizes=[60], pages=[1, 2], repeat=2)
+        # Номера страниц у всех лент, кроме подписок, курсор — у всех,
+        # кроме популярного, плюс страница поста.
+        self.assertEqual(
+            len(results), (len(benchmark.LIST_VIEWS) - 1) * 2 * 2 + 1)
+        self.assertIn('follow_index@60/cursor2', results)
+        self.assertNotIn('follow_index@60/page2', results)
+        for name, metrics in results.items():
+            with self.subTest(name=name):
+                self.assertGreater(metrics['queries'], 0)
+                self.assertGreater(metrics['peak_kb'], 0)
+                self.assertLessEqual(metrics['p50_ms'], metrics['p99_ms'])
+
+    def test_compare(self):
+        """Регрессией считается рост сверх порога и любой лишний запрос."""
+        baseline = {'index@10/page1': {
+            'p50_ms': 10.0, 'p95_ms': 20.0, 'p99_ms': 30.0,
+            'queries': 4, 'peak_kb': 100}}
+        noise = {'index@10/page1': {
+            'p50_ms': 11.5, 'p95_ms': 23.0, 'p99_ms': 90.0,
+            'queries': 4, 'peak_kb': 110}}
+        self.assertEqual(benchmark.compare(noise, baseline, 0.2, 2.0), [])
+        worse = {'index@10/page1': {
+            'p50_ms': 10.0, 'p95_ms': 40.0, 'p99_ms': 30.0,
+            'queries': 5, 'peak_kb': 200}}
+        self.assertEqual(
+            len(benchmark.compare(worse, baseline, 0.2, 2.0)), 3)
+
+
+@override_settings(COMMENTS_FIRST_PAGE=3, COMMENTS_PAGE_SIZE=2)
+class CommentsPaginationTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='comments_author')
+        cls.post = Post.objects.create(text='Пост', author=cls.author)
+        cls.commenters = [
+            User.objects.create_user(username=f'commenter_{i}')
+            for i in range(8)
+        ]
+        cls.comments = [
+            Comment.objects.create(
+                post=cls.post, author=commenter, text=f'Комментарий {i}')
+            for i, commenter in enumerate(cls.commenters)
+        ]
+
+    def setUp(self):
+        cache.clear()
+
+    def test_first_page_is_capped(self):
+        """На странице поста только первые комментарии, от новых."""
+        response = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}))
+        comments = response.context['comments']
+        self.assertEqual(
+            [comment.pk for comment in comments],
+            [comment.pk for comment in reversed(self.comments)][:3])
+        self.assertContains(response, 'js-more-comments')
+
+    def test_fragments_load_the_rest(self):
+        """Фрагменты по ссылкам «Показать ещё» отдают остальные комментарии."""
+        response = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}))
+        seen = [comment.pk for comment in response.context['comments']]
+        page = response.context['comments']
+        while page.has_next():
+            response = self.client.get(
+                reverse('posts:comments', kwargs={'post_id': self.post.pk}),
+                {'cursor': page.next_cursor})
+            self.assertTemplateUsed(response, 'posts/includes/comments.html')
+            self.assertNotContains(response, '<html')
+            page = response.context['comments']
+            self.assertLessEqual(len(page), 2)
+            seen.extend(comment.pk for comment in page)
+        self.assertEqual(
+            seen, [comment.pk for comment in reversed(self.comments)])
+
+    def test_comment_queries_do_not_grow(self):
+        """Авторы комментариев читаются одним запросом со страницей."""
+        url = reverse('posts:comments', kwargs={'post_id': self.post.pk})
+        with self.assertNumQueries(3):
+            self.client.get(url)
+
+    def test_fragment_for_missing_post(self):
+        response = self.client.get(
+            reverse('posts:comments', kwargs={'post_id': 10 ** 6}))
+        self.assertEqual(response.status_code, 404)
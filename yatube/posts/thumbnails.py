@@ -0,0 +1,54 @@
+"""Заблаговременная нарезка картинок для Post.image.
+
+Пока картинка не нарезана, шаблоны лент получают миниатюру через
+sorl-thumbnail, а тот режет оригинал прямо в запросе. Здесь миниатюры
+всех размеров из THUMBNAIL_PRESETS и адаптивные варианты для <picture>
+(см. core.images) создаются после сохранения поста фоновой задачей
+(posts.tasks), вне обработки запроса. После нарезки кэш карточек и лент
+с этой картинкой сбрасывается: до неё в них закэширована миниатюра.
+"""
+import logging
+
+from core.images import generate_variants
+from django.conf import settings
+from sorl.thumbnail import get_thumbnail
+
+from . import feed_cache, timeline
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+
+def generate(image_name):
+    """Создаёт миниатюры и адаптивные варианты одного изображения."""
+    for geometry, options in settings.THUMBNAIL_PRESETS:
+        get_thumbnail(image_name, geometry, **options)
+    generate_variants(image_name)
+    invalidate_posts(image_name)
+
+
+def invalidate_posts(image_name):
+    posts = Post.objects.filter(image=image_name).only(
+        'pk', 'author_id', 'group_id')
+    for post in posts:
+        feed_cache.invalidate_post(
+            post, group_ids=[post.group_id],
+            follower_ids=timeline.follower_ids(post.author_id))
+    feed_cache.invalidate_trending()
+
+
+def generate_safely(image_name):
+    try:
+        generate(image_name)
+        return True
+    except Exception:
+        logger.exception('Не удалось создать миниатюры для %s', image_name)
+        return False
+
+
+def schedule(image_name):
+    """Ставит нарезку в очередь вместе с транзакцией поста."""
+    if not image_name or not settings.THUMBNAIL_PREGENERATE:
+        return
+    from .tasks import generate_thumbnails
+    generate_thumbnails.enqueue(image_name, key=f'thumbnails:{image_name}')
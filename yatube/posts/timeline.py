@@ -0,0 +1,149 @@
+from core.utils import CursorPaginator, bulk_batch_size, filter_in
+from django.conf import settings
+
+from . import follow_graph
+from .models import Follow, Post, TimelineEntry, UserStats
+
+
+def is_celebrity(author_id):
+    return UserStats.objects.filter(
+        user_id=author_id,
+        followers_count__gt=settings.TIMELINE_FANOUT_LIMIT
+    ).exists()
+
+
+def celebrity_ids(user):
+    """Авторы из подписок пользователя, посты которых не раздаются."""
+    return list(
+        UserStats.objects.filter(
+            user__following__user=user,
+            followers_count__gt=settings.TIMELINE_FANOUT_LIMIT
+        ).values_list('user_id', flat=True)
+    )
+
+
+def follower_ids(author_id):
+    """Подписчики, в ленты которых раздаются посты автора.
+
+    Берутся из графа подписок в кэше, поэтому годятся для сброса кэша
+    лент, но не для записи в базу (см. fan_out_post).
+    """
+    if is_celebrity(author_id):
+        return []
+    followers = follow_graph.follower_ids(author_id)
+    if followers is None:
+        followers = Follow.objects.filter(
+            author_id=author_id).values_list('user_id', flat=True)
+    return list(followers)
+
+
+def fan_out_post(post):
+    """Раздаёт новый пост в ленты подписчиков и возвращает их id."""
+    # Строки ленты ссылаются на пользователей, поэтому подписчики
+    # читаются из базы, а не из кэша, который может отстать.
+    followers = [] if is_celebrity(post.author_id) else list(
+        Follow.objects.filter(author_id=post.author_id).values_list(
+            'user_id', flat=True))
+    TimelineEntry.objects.bulk_create(
+        [TimelineEntry(user_id=user_id, post=post, pub_date=post.pub_date)
+         for user_id in followers],
+        batch_size=bulk_batch_size(
+            TimelineEntry, settings.TIMELINE_BATCH_SIZE),
+        ignore_conflicts=True)
+    return followers
+
+
+def backfill(user_id, author_id):
+    """Добавляет в ленту последние посты автора после подписки."""
+    if is_celebrity(author_id):
+        return
+    posts = Post.objects.filter(author_id=author_id).values_list(
+        'id', 'pub_date')[:settings.TIMELINE_BACKFILL_SIZE]
+    TimelineEntry.objects.bulk_create(
+        [TimelineEntry(user_id=user_id, post_id=post_id, pub_date=pub_date)
+         for post_id, pub_date in posts],
+        ignore_conflicts=True)
+
+
+def crossed_fanout_limit(author_id, delta):
+    """Перешёл ли автор порог раздачи, получив delta подписчиков."""
+    followers = UserStats.objects.filter(user_id=author_id).values_list(
+        'followers_count', flat=True).first() or 0
+    limit = settings.TIMELINE_FANOUT_LIMIT
+    return (followers > limit) != (followers - delta > limit)
+
+
+def refresh_fan_out(author_id):
+    """Приводит ленты подписчиков в соответствие с порогом раздачи.
+
+    Ставший популярным автор больше не раздаётся: его строки из лент
+    удаляются, посты читаются из Post. Вернувшийся под порог автор
+    раздаётся заново — иначе посты, написанные, пока он был популярным,
+    пропали бы из лент. Возвращает id затронутых подписчиков.
+    """
+    followers = list(Follow.objects.filter(author_id=author_id).values_list(
+        'user_id', flat=True))
+    if is_celebrity(author_id):
+        TimelineEntry.objects.filter(post__author_id=author_id).delete()
+    else:
+        for user_id in followers:
+            backfill(user_id, author_id)
+    return followers
+
+
+def prune(user_id, author_id):
+    """Убирает из ленты посты автора после отписки."""
+    TimelineEntry.objects.filter(
+        user_id=user_id, post__author_id=author_id).delete()
+
+
+class TimelinePaginator(CursorPaginator):
+    """Keyset-пагинация ленты подписок.
+
+    Ключи страницы читаются из материализованной ленты диапазоном по
+    индексу (user, pub_date, post), ключи постов популярных авторов —
+    так же из Post; оба списка сливаются по (pub_date, id), и посты
+    страницы выбираются из posts одним запросом по первичному ключу.
+    """
+
+    def __init__(self, user, posts, per_page, celebrities=None):
+        super().__init__(posts, per_page, ordering=('pub_date', 'id'))
+        self.user = user
+        self.celebrities = celebrities
+
+    def get_page(self, cursor=None):
+        key, reverse = self.parse_cursor(cursor)
+        keys = self.fetch(
+            TimelineEntry.objects.filter(user=self.user).values_list(
+                'pub_date', 'post_id'),
+            key, reverse, ordering=('pub_date', 'post_id'))
+        if self.celebrities is None:
+            self.celebrities = celebrity_ids(self.user)
+        if self.celebrities:
+            keys += self.fetch(
+                Post.objects.filter(
+                    author_id__in=self.celebrities).values_list(
+                    'pub_date', 'id'),
+                key, reverse)
+        # Пока ленты не пересобраны после перехода порога (см.
+        # refresh_fan_out), пост может прийти из обоих источников.
+        keys = sorted(set(keys), reverse=not reverse)[:self.per_page + 1]
+        # Строки posts — модели или словари из values().
+        posts = {
+            self._key(post)[1]: post
+            for post in self.object_list.filter(
+                pk__in=[post_id for _, post_id in keys])
+        }
+        rows = [posts[post_id] for _, post_id in keys if post_id in posts]
+        return self.page(rows, key, reverse)
+
+
+def rebuild(user_ids=None):
+    """Пересобирает ленты заданных (или всех) пользователей с нуля."""
+    for entries in filter_in(
+            TimelineEntry.objects.all(), user_ids, 'user_id'):
+        entries.delete()
+    for follows in filter_in(Follow.objects.all(), user_ids, 'user_id'):
+        for user_id, author_id in follows.values_list(
+                'user_id', 'author_id').iterator():
+            backfill(user_id, author_id)
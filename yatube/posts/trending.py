@@ -0,0 +1,225 @@
+"""Лента «Популярное».
+
+Оценка поста — сумма весов его комментариев и просмотров, каждый из
+которых затухает вдвое за TRENDING_HALF_LIFE. В PostScore хранится сумма
+на момент последнего обновления и rank = log2(суммы) + возраст этого
+момента в периодах полураспада: затухание одинаково для всех постов,
+поэтому сравнивать rank можно без пересчёта всей таблицы, а сортировка
+идёт по индексу.
+
+Комментарий сразу добавляет вес своему посту (сигнал post_save).
+Просмотры, включая ответы 304, копятся в кэше и записываются пачками по
+TRENDING_VIEWS_BATCH, чтобы страница поста не писала в базу на каждый
+показ. Запись — условное UPDATE по прочитанным значениям, как захват
+задачи в tasks.worker: проигравший гонку перечитывает строку и пробует
+снова.
+
+Команда compact_trending периодически пересчитывает вклад комментариев
+по таблице Comment (так учитываются удалённые и импортированные без
+сигналов), приводит строки к текущему моменту и удаляет посты, чья
+оценка упала ниже TRENDING_MIN_SCORE. Строки меняются на месте тем же
+условным UPDATE, поэтому параллельные просмотры не теряются.
+"""
+import math
+from collections import defaultdict
+from datetime import datetime, timedelta
+from functools import wraps
+
+from core.db import replica_reads
+from core.utils import bulk_batch_size, filter_in
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from . import feed_cache
+from .models import Comment, PostScore
+
+# Начало отсчёта для rank.
+EPOCH = datetime(2020, 1, 1, tzinfo=timezone.utc)
+# Сколько раз перечитывать строку, если её изменили параллельно.
+ATTEMPTS = 5
+# Сколько строк compact обновляет в одной транзакции.
+COMPACT_BATCH_SIZE = 500
+
+
+def _half_lives(start, end):
+    return (end - start).total_seconds() / settings.TRENDING_HALF_LIFE
+
+
+def decay(start, end):
+    """Во сколько раз вес из момента start меньше в момент end."""
+    return 2 ** -_half_lives(start, end)
+
+
+def rank(score, updated):
+    if score <= 0:
+        # Пустые строки — в самом конце ленты.
+        return -math.inf
+    return math.log2(score) + _half_lives(EPOCH, updated)
+
+
+def _add(post_id, at, comments=0.0, views=0.0):
+    score, created = PostScore.objects.get_or_create(
+        post_id=post_id,
+        defaults={
+            'comments': comments,
+            'views': views,
+            'updated': at,
+            'rank': rank(comments + views, at),
+        })
+    for _ in range(ATTEMPTS):
+        if created:
+            break
+        # Более ранний вес затухает к более позднему моменту.
+        updated = max(score.updated, at)
+        old, new = decay(score.updated, updated), decay(at, updated)
+        values = {
+            'comments': score.comments * old + comments * new,
+            'views': score.views * old + views * new,
+        }
+        values['rank'] = rank(sum(values.values()), updated)
+        if PostScore.objects.filter(
+                post_id=post_id, updated=score.updated,
+                comments=score.comments, views=score.views).update(
+                updated=updated, **values):
+            break
+        # Перечитываем основную базу: реплика может отставать от неё.
+        with replica_reads(False):
+            score = PostScore.objects.filter(post_id=post_id).first()
+        if score is None:
+            return
+    changed()
+
+
+def changed():
+    """Сдвигает поколение ленты не чаще раза в TRENDING_REFRESH секунд.
+
+    Изменение, пришедшее сразу после сдвига, станет видно со следующим
+    сдвигом или после compact_trending.
+    """
+    if cache.add('trending:refreshed', True, settings.TRENDING_REFRESH):
+        feed_cache.invalidate_trending()
+
+
+def record_comment(post_id, at=None):
+    _add(post_id, at or timezone.now(),
+         comments=settings.TRENDING_COMMENT_WEIGHT)
+
+
+def record_view(post_id):
+    """Засчитывает просмотр; в базу уходит каждый TRENDING_VIEWS_BATCH-й."""
+    key = f'trending:views:{post_id}'
+    if cache.add(key, 1, settings.TRENDING_HALF_LIFE):
+        views = 1
+    else:
+        try:
+            views = cache.incr(key)
+        except ValueError:
+            # Ключ истёк между add и incr.
+            return
+    batch = settings.TRENDING_VIEWS_BATCH
+    if views % batch == 0:
+        _add(post_id, timezone.now(),
+             views=settings.TRENDING_VIEW_WEIGHT * batch)
+
+
+def count_views(view):
+    """Засчитывает просмотр страницы поста, в том числе ответ 304.
+
+    Ставится поверх feed_condition: тот отвечает 304 до вызова
+    представления, а повторные просмотры тоже должны учитываться.
+    """
+    @wraps(view)
+    def inner(request, *args, post_id, **kwargs):
+        response = view(request, *args, post_id=post_id, **kwargs)
+        if response.status_code in (200, 304):
+            record_view(post_id)
+        return response
+    return inner
+
+
+def window():
+    """Сколько живёт комментарий, пока его вес не ниже минимума."""
+    ratio = settings.TRENDING_COMMENT_WEIGHT / settings.TRENDING_MIN_SCORE
+    return timedelta(
+        seconds=settings.TRENDING_HALF_LIFE * max(math.log2(ratio), 0))
+
+
+def _comment_weights(comments, now):
+    weights = defaultdict(float)
+    weight = settings.TRENDING_COMMENT_WEIGHT
+    for post_id, created in comments.filter(
+            post__isnull=False, created__gte=now - window()).order_by(
+            ).values_list('post_id', 'created').iterator():
+        weights[post_id] += weight * decay(min(created, now), now)
+    return weights
+
+
+def _compact_row(score, comments, now):
+    """Приводит строку к моменту now; True, если строка осталась.
+
+    Запись — условная, по прочитанным значениям: если строку успел
+    изменить _add, она перечитывается, а вес комментариев считается
+    заново, чтобы не потерять записанное параллельно.
+    """
+    for _ in range(ATTEMPTS):
+        views = score.views * decay(min(score.updated, now), now)
+        total = comments + views
+        same = PostScore.objects.filter(
+            post_id=score.post_id, updated=score.updated,
+            comments=score.comments, views=score.views)
+        if total < settings.TRENDING_MIN_SCORE:
+            if same.delete()[0]:
+                return False
+        elif same.update(comments=comments, views=views, updated=now,
+                         rank=rank(total, now)):
+            return True
+        with replica_reads(False):
+            score = PostScore.objects.filter(post_id=score.post_id).first()
+            if score is None:
+                return False
+            comments = _comment_weights(
+                Comment.objects.filter(post_id=score.post_id), now
+            )[score.post_id]
+    # Строку без конца меняют: она останется до следующего пересчёта.
+    return True
+
+
+def compact(now=None, post_ids=None):
+    """Пересчитывает оценки; возвращает число оставшихся строк.
+
+    Строки меняются на месте пачками по COMPACT_BATCH_SIZE, каждая пачка —
+    в своей транзакции; просмотры и комментарии, записанные во время
+    пересчёта, не теряются (см. _compact_row). post_ids ограничивает
+    пересчёт этими постами; None — вся таблица.
+    """
+    now = now or timezone.now()
+    comments = defaultdict(float)
+    for part in filter_in(Comment.objects.all(), post_ids, 'post_id'):
+        comments.update(_comment_weights(part, now))
+    kept, seen = 0, set()
+    for part in filter_in(PostScore.objects.order_by('post'), post_ids):
+        last = 0
+        while True:
+            batch = list(part.filter(post__gt=last)[:COMPACT_BATCH_SIZE])
+            if not batch:
+                break
+            last = batch[-1].post_id
+            with transaction.atomic():
+                for score in batch:
+                    seen.add(score.post_id)
+                    kept += _compact_row(
+                        score, comments.get(score.post_id, 0.0), now)
+    scores = [
+        PostScore(post_id=post_id, comments=weight, views=0.0, updated=now,
+                  rank=rank(weight, now))
+        for post_id, weight in comments.items()
+        if post_id not in seen and weight >= settings.TRENDING_MIN_SCORE
+    ]
+    # Строку могли создать параллельно: тогда она уже учла комментарий.
+    PostScore.objects.bulk_create(
+        scores, batch_size=bulk_batch_size(PostScore, 1000),
+        ignore_conflicts=True)
+    feed_cache.invalidate_trending()
+    return kept + len(scores)
@@ -1,22 +1,44 @@
-from django.urls import path
+from django.urls import path, register_converter
 
 from . import views
+from .syndication import FeedFormatConverter
+
+register_converter(FeedFormatConverter, 'feed_format')
 
 app_name = 'posts'
 
 urlpatterns = [
     path('', views.index, name='index'),
     path('group/<slug:slug>/', views.group_posts, name='group_list'),
+    path('trending/', views.trending_posts, name='trending'),
     path('', views.index, name='index'),
     path('profile/<str:username>/', views.profile, name='profile'),
     path('posts/<int:post_id>/', views.post_detail, name='post_detail'),
     path('create/', views.post_create, name='post_create'),
     path('posts/<int:post_id>/edit/', views.post_edit, name='post_edit'),
+    path(
+        'posts/<int:post_id>/comments/',
+        views.comments_fragment,
+        name='comments'
+    ),
     path(
         'posts/<int:post_id>/comment/',
         views.add_comment,
         name='add_comment'),
     path('follow/', views.follow_index, name='follow_index'),
+    path('search/', views.search, name='search'),
+    path('export/', views.export_content, name='export_content'),
+    path('feed.<feed_format:fmt>', views.index_feed, name='index_feed'),
+    path(
+        'group/<slug:slug>/feed.<feed_format:fmt>',
+        views.group_feed,
+        name='group_feed'
+    ),
+    path(
+        'profile/<str:username>/feed.<feed_format:fmt>',
+        views.profile_feed,
+        name='profile_feed'
+    ),
     path(
         'profile/<str:username>/follow/',
         views.profile_follow,
@@ -1,71 +1,206 @@
-from core.utils import paginator
+from urllib.parse import urlencode
+
+from core.db import primary_if_behind, use_primary
+from core.utils import CursorPaginator, paginator
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
+from django.core.paginator import Paginator
+from django.db import transaction
+from django.db.models import F
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404, redirect, render
 from django.urls import reverse, reverse_lazy
+from django.utils import timezone
+
+from . import (conditional, exporter, feed_cache, follow_graph,
+               recommendations, trending)
+from .conditional import feed_condition
+from .counters import get_stats
+from .forms import CommentForm, PostForm, SearchForm
+from .models import Comment, Follow, Group, Post, User
+from .search import search_posts
+from .syndication import feed_response
+from .timeline import TimelinePaginator, celebrity_ids
+
 
-from .forms import CommentForm, PostForm
-from .models import Follow, Group, Post, User
+def comment_page(post_id, per_page, cursor=None):
+    """Страница комментариев поста, от новых к старым, с авторами."""
+    comments = Comment.objects.filter(post_id=post_id).select_related(
+        'author').only('pk', 'text', 'created', 'author__username')
+    return CursorPaginator(
+        comments, per_page, ordering=('created', 'id')).get_page(cursor)
 
 
+@feed_condition(conditional.index_names)
 def index(request):
-    posts = Post.objects.all()
+    # Поколение — до чтения страницы: курсорная страница читается сразу,
+    # и запись между ними не должна попасть в кэш под новым поколением.
+    feed_version = feed_cache.index_version()
+    posts = Post.objects.for_feed()
     page_obj = paginator(request, posts)
     title = 'Это главная страница проекта Yatube'
     context = {
         'title': title,
         'page_obj': page_obj,
+        'feed_version': feed_version,
+        'site_version': feed_cache.site_version(),
         'is_index': True
     }
     return render(request, 'posts/index.html', context)
 
 
+@feed_condition(conditional.trending_names)
+def trending_posts(request):
+    # Номера страниц при любом PAGINATION_MODE: курсор строится по дате.
+    # Сортировка совпадает с индексом post_score_rank_idx; F() берёт
+    # столбец post_id, а не порядок модели Post.
+    posts = Post.objects.for_feed().filter(trending__isnull=False).order_by(
+        '-trending__rank', F('trending__post').desc())
+    page_obj = Paginator(posts, settings.POSTS_COUNT).get_page(
+        request.GET.get('page'))
+    context = {
+        'title': 'Популярные записи',
+        'page_obj': page_obj,
+        'feed_version': feed_cache.trending_version(),
+        'site_version': feed_cache.site_version(),
+        'is_trending': True
+    }
+    return render(request, 'posts/trending.html', context)
+
+
+@feed_condition(conditional.group_names)
 def group_posts(request, slug):
     group_list_title = 'Здесь будет информация о группах проекта Yatube'
     group = get_object_or_404(Group, slug=slug)
-    posts = group.posts.all()
+    feed_version = feed_cache.group_version(group)
+    posts = group.posts.for_feed()
     page_obj = paginator(request, posts)
     context = {
         'group_list_title': group_list_title,
         'group': group,
         'page_obj': page_obj,
+        'feed_version': feed_version,
+        'site_version': feed_cache.site_version(),
     }
     return render(request, 'posts/group_list.html', context)
 
 
+@feed_condition(conditional.profile_names)
 def profile(request, username):
     author = get_object_or_404(User, username=username)
-    posts = Post.objects.filter(author=author).all()
-    posts_count = posts.count()
+    feed_version = feed_cache.profile_version(author)
+    posts = author.posts.for_feed()
+    stats = get_stats(author)
     page_obj = paginator(request, posts)
-    following = False
-    if request.user.is_authenticated:
-        following = Follow.objects.filter(
-            user=request.user, author=author
-        ).exists()
+    following = follow_graph.is_following(request.user, author)
     profile = author
     context = {
         'profile': profile,
-        'posts_count': posts_count,
+        'posts_count': stats.posts_count,
+        'stats': stats,
         'page_obj': page_obj,
+        'feed_version': feed_version,
+        'site_version': feed_cache.site_version(),
         'following': following,
-        'profile': profile
+        'profile': profile,
+        'recommendations': (
+            recommendations.for_user(request.user)
+            if request.user == author else []),
     }
     return render(request, 'posts/profile.html', context)
 
 
+def search(request):
+    form = SearchForm(request.GET or None)
+    page_obj = None
+    query = ''
+    if form.is_valid():
+        query = form.cleaned_data['q']
+        posts = search_posts(query, Post.objects.for_feed())
+        page_obj = Paginator(posts, settings.POSTS_COUNT).get_page(
+            request.GET.get('page'))
+    context = {
+        'form': form,
+        'query': query,
+        'page_obj': page_obj,
+        'extra_query': urlencode({'q': query}) + '&',
+    }
+    return render(request, 'posts/search.html', context)
+
+
+@staff_member_required
+def export_content(request):
+    kinds = [
+        kind for kind in request.GET.getlist('kind')
+        if kind in exporter.KINDS
+    ] or exporter.KINDS
+    response = StreamingHttpResponse(
+        exporter.export(kinds), content_type='application/gzip')
+    filename = f'yatube-{timezone.now():%Y%m%d-%H%M%S}.jsonl.gz'
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+@feed_condition(conditional.index_names)
+def index_feed(request, fmt):
+    return feed_response(
+        request, fmt, feed_cache.index_names(), Post.objects.all(),
+        title='Yatube: последние записи',
+        link=reverse('posts:index'),
+        description='Последние обновления на сайте')
+
+
+@feed_condition(conditional.group_names)
+def group_feed(request, slug, fmt):
+    group = get_object_or_404(Group, slug=slug)
+    return feed_response(
+        request, fmt, feed_cache.group_names(group.pk), group.posts.all(),
+        title=f'Yatube: {group.title}',
+        link=reverse('posts:group_list', kwargs={'slug': slug}),
+        description=group.description)
+
+
+@feed_condition(conditional.profile_names)
+def profile_feed(request, username, fmt):
+    author = get_object_or_404(User, username=username)
+    return feed_response(
+        request, fmt, feed_cache.profile_names(author.pk),
+        author.posts.all(),
+        title=f'Yatube: {author.get_full_name() or author.username}',
+        link=reverse('posts:profile', kwargs={'username': username}),
+        description=f'Записи пользователя {author.username}')
+
+
+@trending.count_views
+@feed_condition(conditional.post_detail_names, with_csrf=True)
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
-    post_comments = post.comments.all()
+    post = get_object_or_404(
+        Post.objects.select_related('author', 'group'), pk=post_id)
     form = CommentForm()
     context = {
         'post': post,
-        'comments': post_comments,
+        'author_posts_count': get_stats(post.author).posts_count,
+        'comments': comment_page(post.pk, settings.COMMENTS_FIRST_PAGE),
         'form': form
     }
     return render(request, 'posts/post_detail.html', context)
 
 
+@feed_condition(conditional.post_detail_names)
+def comments_fragment(request, post_id):
+    get_object_or_404(Post.objects.only('pk'), pk=post_id)
+    context = {
+        'post_id': post_id,
+        'comments': comment_page(
+            post_id, settings.COMMENTS_PAGE_SIZE,
+            request.GET.get('cursor')),
+    }
+    return render(request, 'posts/includes/comments.html', context)
+
+
 @login_required
+@transaction.atomic
 def post_create(request):
     title = 'Добавить запись'
     btn_caption = 'Добавить'
@@ -112,6 +247,7 @@ def post_edit(request, post_id):
 
 
 @login_required
+@transaction.atomic
 def add_comment(request, post_id):
     post = get_object_or_404(Post, id=post_id)
     form = CommentForm(request.POST or None)
@@ -128,19 +264,31 @@ def add_comment(request, post_id):
 
 @login_required
 def follow_index(request):
-    posts = Post.objects.filter(author__following__user=request.user)
-    page_obj = paginator(request, posts)
-    title = 'Подписки'
-    context = {
-        'page_obj': page_obj,
-        'title': title,
-        'is_follow': True
-    }
+    celebrities = celebrity_ids(request.user)
+    names = feed_cache.follow_names(request.user, celebrities)
+    feed_version = feed_cache.version(names)
+    with primary_if_behind(feed_cache.last_modified(names)):
+        # Лента подписок листается только курсором: так страница
+        # читается из материализованной ленты диапазоном по индексу.
+        page_obj = TimelinePaginator(
+            request.user, Post.objects.for_feed(), settings.POSTS_COUNT,
+            celebrities).get_page(request.GET.get('cursor'))
+        title = 'Подписки'
+        context = {
+            'page_obj': page_obj,
+            'feed_version': feed_version,
+            'site_version': feed_cache.site_version(),
+            'title': title,
+            'is_follow': True,
+            'recommendations': recommendations.for_user(request.user),
+        }
 
-    return render(request, 'posts/follow.html', context)
+        return render(request, 'posts/follow.html', context)
 
 
 @login_required
+@use_primary
+@transaction.atomic
 def profile_follow(request, username):
     profile = get_object_or_404(User, username=username)
     current_user = request.user
@@ -153,6 +301,8 @@ def profile_follow(request, username):
 
 
 @login_required
+@use_primary
+@transaction.atomic
 def profile_unfollow(request, username):
     profile = get_object_or_404(User, username=username)
     Follow.objects.filter(user=request.user, author=profile).delete()
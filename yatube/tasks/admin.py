@@ -0,0 +1,56 @@
+from datetime import timedelta
+
+from django.contrib import admin
+from django.db.models import Count, Min
+from django.utils import timezone
+
+from .models import Task
+
+
+def queue_stats():
+    """Глубина очереди и ошибки по задачам для страницы админки."""
+    rows = Task.objects.values('name', 'status').annotate(
+        count=Count('id')).order_by('name')
+    stats = {}
+    for row in rows:
+        stats.setdefault(row['name'], dict.fromkeys(
+            dict(Task.STATUSES), 0))[row['status']] = row['count']
+    now = timezone.now()
+    return {
+        'by_name': sorted(stats.items()),
+        # Самая давняя задача, которая уже могла бы выполняться.
+        'oldest': Task.objects.filter(
+            status=Task.QUEUED, run_at__lte=now).aggregate(
+            oldest=Min('run_at'))['oldest'],
+        'failed_today': Task.objects.filter(
+            status=Task.FAILED, finished__gte=now - timedelta(days=1)
+        ).count(),
+    }
+
+
+@admin.register(Task)
+class TaskAdmin(admin.ModelAdmin):
+    list_display = (
+        'pk',
+        'name',
+        'status',
+        'attempts',
+        'run_at',
+        'locked_by',
+        'finished',
+    )
+    list_filter = ('status', 'name')
+    search_fields = ('name', 'key')
+    readonly_fields = ('created', 'finished', 'last_error')
+    actions = ['retry']
+
+    def changelist_view(self, request, extra_context=None):
+        extra_context = dict(extra_context or {}, queue_stats=queue_stats())
+        return super().changelist_view(request, extra_context)
+
+    def retry(self, request, queryset):
+        updated = queryset.exclude(status=Task.RUNNING).update(
+            status=Task.QUEUED, attempts=0, run_at=timezone.now(),
+            finished=None)
+        self.message_user(request, f'Перезапущено задач: {updated}')
+    retry.short_description = 'Перезапустить'
@@ -0,0 +1,76 @@
+import multiprocessing
+import os
+import signal
+import socket
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+from tasks import worker
+
+
+def run_worker(worker_id, burst, poll_interval, batch, results=None):
+    stopping = []
+    # Текущая задача доделывается, новые не берутся.
+    signal.signal(signal.SIGTERM, lambda *args: stopping.append(True))
+    signal.signal(signal.SIGINT, lambda *args: stopping.append(True))
+    done = 0
+    try:
+        done = worker.work(
+            worker_id, burst=burst, poll_interval=poll_interval,
+            batch=batch, should_stop=lambda: stopping)
+    finally:
+        # Родитель ждёт ответа от каждого процесса, даже упавшего.
+        if results is not None:
+            results.put(done)
+    return done
+
+
+class Command(BaseCommand):
+    help = 'Выполняет фоновые задачи из очереди в базе данных'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--processes', type=int, default=1,
+            help='число процессов-воркеров')
+        parser.add_argument(
+            '--burst', action='store_true',
+            help='выйти, когда готовых задач не останется')
+        parser.add_argument(
+            '--poll-interval', type=float, default=1.0,
+            help='пауза между опросами пустой очереди, с')
+        parser.add_argument(
+            '--batch', type=int, default=1,
+            help='сколько задач забирать за раз')
+
+    def handle(self, *args, **options):
+        prefix = f'{socket.gethostname()}:{os.getpid()}'
+        params = (
+            options['burst'], options['poll_interval'], options['batch'])
+        if options['processes'] <= 1:
+            done = run_worker(prefix, *params)
+            self.stdout.write(f'Выполнено задач: {done}')
+            return
+        # Дочерние процессы не должны делить подключение родителя.
+        connections.close_all()
+        context = multiprocessing.get_context('fork')
+        results = context.Queue()
+        workers = [
+            context.Process(
+                target=run_worker,
+                args=(f'{prefix}-{number}', *params, results))
+            for number in range(options['processes'])
+        ]
+        for process in workers:
+            process.start()
+
+        def stop(*args):
+            for process in workers:
+                process.terminate()
+
+        signal.signal(signal.SIGTERM, stop)
+        # Ctrl+C получают все процессы группы сами.
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        done = sum(results.get() for _ in workers)
+        for process in workers:
+            process.join()
+        self.stdout.write(f'Выполнено задач: {done}')
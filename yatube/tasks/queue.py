@@ -0,0 +1,58 @@
+"""Очередь фоновых задач в базе данных.
+
+Задача — обычная функция, помеченная декоратором @task в модуле tasks.py
+какого-нибудь приложения. Вызов func.enqueue(*args, **kwargs) записывает
+строку Task в текущей транзакции: задача станет видна воркерам только
+после её фиксации и исчезнет вместе с откатом, так что воркер не увидит
+пост, которого нет. Аргументы должны сериализоваться в JSON.
+
+Ключ идемпотентности (key=...) не даёт поставить одну и ту же работу
+дважды, пока задача с этим ключом хранится в таблице.
+"""
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import Task
+
+registry = {}
+
+
+def task(func=None, *, name=None, max_attempts=None):
+    """Регистрирует функцию как задачу и добавляет ей метод enqueue."""
+    def decorator(func):
+        task_name = name or f'{func.__module__}.{func.__qualname__}'
+        registry[task_name] = func
+
+        def enqueue(*args, key=None, countdown=0, **kwargs):
+            return enqueue_task(
+                task_name, args, kwargs, key=key, countdown=countdown,
+                max_attempts=max_attempts)
+
+        func.task_name = task_name
+        func.enqueue = enqueue
+        return func
+    return decorator(func) if func else decorator
+
+
+def enqueue_task(name, args=(), kwargs=None, key=None, countdown=0,
+                 max_attempts=None):
+    """Ставит задачу; с уже занятым ключом возвращает прежнюю."""
+    if name not in registry:
+        raise KeyError(f'Задача {name} не зарегистрирована')
+    task = Task(
+        name=name,
+        payload=json.dumps({'args': list(args), 'kwargs': kwargs or {}}),
+        key=key,
+        max_attempts=max_attempts or settings.TASKS_MAX_ATTEMPTS,
+        run_at=timezone.now() + timedelta(seconds=countdown),
+    )
+    if key is None:
+        task.save()
+        return task
+    # INSERT OR IGNORE: одновременные постановки с одним ключом не
+    # падают на уникальном индексе и не ждут друг друга.
+    Task.objects.bulk_create([task], ignore_conflicts=True)
+    return Task.objects.get(key=key)
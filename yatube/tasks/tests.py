@@ -0,0 +1,135 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import transaction
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from posts.models import User
+
+from . import worker
+from .models import Task
+from .queue import task
+
+calls = []
+
+
+@task(name='tests.record')
+def record(value):
+    calls.append(value)
+
+
+@task(name='tests.explode', max_attempts=2)
+def explode():
+    raise ValueError('сломалось')
+
+
+@override_settings(TASKS_RETRY_DELAY=10, TASKS_RETRY_DELAY_MAX=60)
+class TaskQueueTest(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_enqueue_follows_transaction(self):
+        """Задача из отменённой транзакции не попадает в очередь."""
+        try:
+            with transaction.atomic():
+                record.enqueue('отменено')
+                raise RuntimeError
+        except RuntimeError:
+            pass
+        record.enqueue('сохранено')
+        self.assertEqual(worker.work('test', burst=True), 1)
+        self.assertEqual(calls, ['сохранено'])
+        self.assertEqual(Task.objects.get().status, Task.DONE)
+
+    def test_idempotency_key(self):
+        first = record.enqueue(1, key='record:1')
+        second = record.enqueue(2, key='record:1')
+        self.assertEqual(first.pk, second.pk)
+        worker.work('test', burst=True)
+        self.assertEqual(calls, [1])
+
+    def test_retries_with_backoff_then_fails(self):
+        started = timezone.now()
+        explode.enqueue()
+        with self.assertLogs('tasks.worker', 'WARNING'):
+            self.assertEqual(worker.work('test', burst=True), 0)
+        failed = Task.objects.get()
+        self.assertEqual(
+            (failed.status, failed.attempts), (Task.QUEUED, 1))
+        self.assertIn('сломалось', failed.last_error)
+        # Пауза 10 с ± 20 %.
+        self.assertGreater(failed.run_at, started + timedelta(seconds=7))
+        # Повтор не раньше срока.
+        self.assertEqual(worker.claim('test'), [])
+        Task.objects.update(run_at=timezone.now())
+        with self.assertLogs('tasks.worker', 'ERROR'):
+            worker.work('test', burst=True)
+        failed.refresh_from_db()
+        self.assertEqual(
+            (failed.status, failed.attempts), (Task.FAILED, 2))
+
+    def test_workers_do_not_share_tasks(self):
+        """Занятую задачу другой воркер берёт только после конца аренды."""
+        record.enqueue('один раз')
+        [claimed] = worker.claim('first')
+        self.assertEqual(claimed.locked_by, 'first')
+        self.assertEqual(worker.claim('second'), [])
+        Task.objects.update(locked_until=timezone.now() - timedelta(1))
+        [reclaimed] = worker.claim('second')
+        self.assertEqual(
+            (reclaimed.locked_by, reclaimed.attempts), ('second', 2))
+        # Опоздавший первый воркер не перезаписывает чужую задачу.
+        worker.execute(claimed)
+        self.assertEqual(Task.objects.get().status, Task.RUNNING)
+
+    def test_expired_lease_counts_attempts(self):
+        """Задача, ронявшая воркер, ждёт отсрочку и в конце — failed."""
+        record.enqueue('роняет воркер')
+        expired = timezone.now() - timedelta(seconds=1)
+        Task.objects.update(
+            status=Task.RUNNING, attempts=1, max_attempts=3,
+            locked_until=expired)
+        self.assertEqual(worker.claim('w'), [])
+        task = Task.objects.get()
+        self.assertEqual(task.status, Task.QUEUED)
+        self.assertGreater(task.run_at, expired + timedelta(seconds=7))
+        Task.objects.update(
+            status=Task.RUNNING, attempts=99, locked_until=expired)
+        with self.assertLogs('tasks.worker', 'ERROR'):
+            self.assertEqual(worker.claim('w'), [])
+        task.refresh_from_db()
+        self.assertEqual(task.status, Task.FAILED)
+        self.assertEqual(task.last_error, worker.LEASE_EXPIRED)
+        self.assertEqual(calls, [])
+
+    @override_settings(TASKS_KEEP_DONE=0)
+    def test_done_tasks_are_purged(self):
+        record.enqueue('старое', key='old')
+        worker.work('test', burst=True)
+        self.assertFalse(Task.objects.exists())
+        record.enqueue('новое', key='old')
+        self.assertEqual(Task.objects.get().status, Task.QUEUED)
+
+    def test_run_tasks_command(self):
+        for value in range(3):
+            record.enqueue(value)
+        out = StringIO()
+        call_command('run_tasks', burst=True, stdout=out)
+        self.assertIn('Выполнено задач: 3', out.getvalue())
+        self.assertEqual(calls, [0, 1, 2])
+
+    def test_admin_shows_queue_depth(self):
+        admin = User.objects.create_superuser(
+            'tasks_admin', 'admin@example.com', 'password')
+        self.client.force_login(admin)
+        record.enqueue('ждёт')
+        explode.enqueue()
+        Task.objects.filter(name='tests.explode').update(
+            status=Task.FAILED, finished=timezone.now())
+        response = self.client.get(reverse('admin:tasks_task_changelist'))
+        self.assertContains(response, 'Ошибок за сутки: 1')
+        self.assertEqual(
+            dict(response.context['queue_stats']['by_name'])[
+                'tests.record']['queued'], 1)
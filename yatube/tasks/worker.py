@@ -0,0 +1,136 @@
+"""Выполнение задач из очереди.
+
+Несколько процессов-воркеров делят одну таблицу. Задачу забирает тот, чьё
+условное UPDATE (status=queued или истёкшая аренда) изменило строку; для
+остальных она уже занята. Аренда на TASKS_LEASE секунд защищает от
+упавших воркеров: после её истечения задача возвращается в очередь с
+той же отсрочкой, что и после ошибки. Попытка засчитывается при
+захвате, поэтому задача, которая роняет воркер, после max_attempts
+попыток тоже станет failed.
+
+Ошибка откладывает задачу на TASKS_RETRY_DELAY * 2 ** (попытка - 1)
+секунд, но не больше TASKS_RETRY_DELAY_MAX; после max_attempts попыток
+задача остаётся в состоянии failed до ручного перезапуска в админке.
+"""
+import json
+import logging
+import random
+import time
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Task
+from .queue import registry
+
+logger = logging.getLogger(__name__)
+
+
+LEASE_EXPIRED = 'Аренда истекла: воркер не завершил задачу.'
+
+
+def ready(now):
+    return Q(status=Task.QUEUED, run_at__lte=now)
+
+
+def release_expired(now):
+    """Возвращает в очередь задачи, чья аренда истекла.
+
+    Упавший воркер не доходит до обработки ошибки в execute, поэтому
+    отсрочка и предел попыток применяются здесь.
+    """
+    expired = Task.objects.filter(
+        status=Task.RUNNING, locked_until__lt=now).values_list(
+        'pk', 'attempts', 'max_attempts', 'locked_until')
+    for pk, attempts, max_attempts, locked_until in expired:
+        lease = Task.objects.filter(
+            pk=pk, status=Task.RUNNING, locked_until=locked_until)
+        if attempts >= max_attempts:
+            logger.error('Задача #%s не выполнена: %s', pk, LEASE_EXPIRED)
+            lease.update(status=Task.FAILED, last_error=LEASE_EXPIRED,
+                         locked_until=None, finished=now)
+        else:
+            lease.update(
+                status=Task.QUEUED, last_error=LEASE_EXPIRED,
+                locked_until=None,
+                run_at=locked_until + timedelta(
+                    seconds=retry_delay(attempts)))
+
+
+def claim(worker_id, limit=1):
+    """Забирает до limit готовых задач и возвращает их."""
+    now = timezone.now()
+    release_expired(now)
+    candidates = list(Task.objects.filter(ready(now)).order_by(
+        'run_at', 'id').values_list('pk', flat=True)[:limit])
+    claimed = [
+        pk for pk in candidates
+        if Task.objects.filter(ready(now), pk=pk).update(
+            status=Task.RUNNING,
+            locked_by=worker_id,
+            locked_until=now + timedelta(seconds=settings.TASKS_LEASE),
+            attempts=F('attempts') + 1)
+    ]
+    return list(Task.objects.filter(pk__in=claimed).order_by('run_at', 'id'))
+
+
+def retry_delay(attempts):
+    delay = settings.TASKS_RETRY_DELAY * 2 ** (attempts - 1)
+    delay = min(delay, settings.TASKS_RETRY_DELAY_MAX)
+    # Разброс, чтобы задачи, упавшие вместе, не повторялись разом.
+    return delay * random.uniform(0.8, 1.2)
+
+
+def execute(task):
+    """Выполняет захваченную задачу; True, если она прошла успешно."""
+    mine = Task.objects.filter(pk=task.pk, locked_by=task.locked_by)
+    try:
+        func = registry[task.name]
+        payload = json.loads(task.payload)
+        func(*payload['args'], **payload['kwargs'])
+    except Exception:
+        error = traceback.format_exc()
+        now = timezone.now()
+        if task.attempts >= task.max_attempts or task.name not in registry:
+            logger.error('Задача %s не выполнена:\n%s', task, error)
+            mine.update(status=Task.FAILED, last_error=error,
+                        locked_until=None, finished=now)
+        else:
+            logger.warning('Задача %s будет повторена:\n%s', task, error)
+            mine.update(
+                status=Task.QUEUED, last_error=error, locked_until=None,
+                run_at=now + timedelta(seconds=retry_delay(task.attempts)))
+        return False
+    mine.update(status=Task.DONE, locked_until=None,
+                finished=timezone.now())
+    return True
+
+
+def purge():
+    """Удаляет выполненные задачи старше TASKS_KEEP_DONE и их ключи."""
+    border = timezone.now() - timedelta(seconds=settings.TASKS_KEEP_DONE)
+    return Task.objects.filter(
+        status=Task.DONE, finished__lt=border).delete()[0]
+
+
+def work(worker_id, burst=False, poll_interval=1.0, batch=1,
+         should_stop=None):
+    """Цикл воркера; с burst выходит, когда готовых задач не осталось."""
+    done = 0
+    while not (should_stop and should_stop()):
+        tasks = claim(worker_id, batch)
+        for task in tasks:
+            done += execute(task)
+        if tasks:
+            continue
+        purge()
+        if burst:
+            break
+        # Не держать подключение, пока очередь пуста.
+        connections.close_all()
+        time.sleep(poll_interval)
+    return done
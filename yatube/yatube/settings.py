@@ -39,6 +39,9 @@ INSTALLED_APPS = [
     'users.apps.UsersConfig',
     'core.apps.CoreConfig',
     'about.apps.AboutConfig',
+    'api.apps.ApiConfig',
+    'tasks.apps.TasksConfig',
+    'notifications.apps.NotificationsConfig',
     'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
@@ -49,6 +52,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.ServerTimingMiddleware',
+    'core.middleware.ReplicaRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -58,6 +63,29 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Заголовок Server-Timing и строка лога с замерами каждого запроса
+# (SQL, шаблоны, миниатюры); включается YATUBE_SERVER_TIMING=1
+SERVER_TIMING = os.environ.get('YATUBE_SERVER_TIMING') == '1'
+
+# Строки с замерами Server-Timing пишутся в stderr: без обработчика
+# logging отбрасывает сообщения уровня INFO
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'core.middleware': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
+
 ROOT_URLCONF = 'yatube.urls'
 
 TEMPLATES = [
@@ -72,6 +100,7 @@ TEMPLATES = [
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
                 'core.context_processors.year.year',
+                'core.context_processors.cache.fragment_cache_timeout',
             ],
         },
     },
@@ -87,9 +116,46 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        # Подключение живёт между запросами, а не открывается на каждый
+        'CONN_MAX_AGE': int(os.environ.get('YATUBE_CONN_MAX_AGE', 600)),
     }
 }
 
+# PRAGMA для каждого нового подключения к SQLite (см. core.db); база в
+# DATABASES может переопределить их своим ключом PRAGMAS
+SQLITE_PRAGMAS = {
+    # Читатели не ждут писателей, писатель не ждёт читателей
+    'journal_mode': 'WAL',
+    # В режиме WAL fsync только на контрольных точках
+    'synchronous': 'NORMAL',
+    # Файл базы отображается в память, до 256 МБ
+    'mmap_size': 256 * 1024 * 1024,
+    # Кэш страниц на подключение, в КБ (отрицательное значение)
+    'cache_size': -64000,
+    # Сколько ждать блокировку, прежде чем ответить «database is locked», мс
+    'busy_timeout': 5000,
+    'temp_store': 'MEMORY',
+}
+
+# Реплика только для чтения. Локально её заменяет копия db.sqlite3,
+# которую обновляет manage.py sync_replica; путь задаёт YATUBE_DB_REPLICA
+DB_REPLICA = os.environ.get('YATUBE_DB_REPLICA')
+if DB_REPLICA:
+    DATABASES['replica'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': DB_REPLICA,
+        'CONN_MAX_AGE': DATABASES['default']['CONN_MAX_AGE'],
+        # Случайная запись в реплику должна падать, а не расходиться
+        'PRAGMAS': {**SQLITE_PRAGMAS, 'query_only': 1},
+        'TEST': {'MIRROR': 'default'},
+    }
+
+# Псевдонимы реплик, с которых читают GET-запросы (см. core.db)
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+DATABASE_ROUTERS = ['core.db.PrimaryReplicaRouter']
+# Сколько секунд после записи пользователь читает основную базу
+REPLICA_STICKY_SECONDS = 5
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -133,18 +199,116 @@ STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static')]
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
 POSTS_COUNT = 10
+# 'page' — номера страниц (OFFSET/COUNT), 'cursor' — keyset-пагинация
+PAGINATION_MODE = 'page'
+
+# Комментарии к посту: сколько показывать сразу и сколько подгружать
+# за раз по кнопке «Показать ещё»
+COMMENTS_FIRST_PAGE = 20
+COMMENTS_PAGE_SIZE = 50
+
+# Лента подписок: сколько постов автора добавлять при подписке
+# и начиная с какого числа подписчиков не раздавать посты по лентам
+TIMELINE_BACKFILL_SIZE = 200
+TIMELINE_FANOUT_LIMIT = 5000
+TIMELINE_BATCH_SIZE = 1000
+
+# Граф подписок в кэше (posts.follow_graph): сколько хранить множества
+# и до какого числа подписчиков кэшировать их список, а не только число
+FOLLOW_GRAPH_TIMEOUT = 60 * 60
+FOLLOW_GRAPH_MAX_FOLLOWERS = TIMELINE_FANOUT_LIMIT
+
+# Рекомендации авторов (manage.py recommend_authors): сколько хранить и
+# показывать на пользователя и сколько подписчиков автора учитывать при
+# поиске похожих авторов
+RECOMMENDATIONS_COUNT = 20
+RECOMMENDATIONS_SHOWN = 5
+RECOMMENDATIONS_MAX_NEIGHBOURS = 200
+
+# Лента «Популярное» (posts.trending): период полураспада оценки в
+# секундах, вес комментария и просмотра, сколько просмотров копить в кэше
+# до записи, ниже какой оценки пост выпадает из ленты при compact_trending
+# и как часто обновлять закэшированные страницы ленты
+TRENDING_HALF_LIFE = 6 * 60 * 60
+TRENDING_COMMENT_WEIGHT = 1.0
+TRENDING_VIEW_WEIGHT = 0.05
+TRENDING_VIEWS_BATCH = 10
+TRENDING_MIN_SCORE = 0.05
+TRENDING_REFRESH = 60
 
 LOGIN_URL = 'users:login'
 LOGIN_REDIRECT_URL = 'posts:index'
 # LOGOUT_REDIRECT_URL = 'posts:index'
 EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
+DEFAULT_FROM_EMAIL = 'noreply@yatube.ru'
+# Адрес сайта для ссылок в письмах
+SITE_URL = os.environ.get('YATUBE_SITE_URL', 'http://127.0.0.1:8000')
+
+# Сводки новых постов (manage.py send_digests по расписанию): сколько
+# пользователей обрабатывать за одно подключение к почтовому серверу и
+# сколько постов показывать в одном письме
+NOTIFICATION_BATCH_SIZE = 100
+NOTIFICATION_DIGEST_POSTS = 20
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
-CACHES = {
-    'default': {
+# Фоновые задачи (приложение tasks, воркер — manage.py run_tasks):
+# попыток на задачу и пауза перед повтором, с; пауза удваивается с каждой
+# попыткой, но не больше TASKS_RETRY_DELAY_MAX
+TASKS_MAX_ATTEMPTS = 5
+TASKS_RETRY_DELAY = 10
+TASKS_RETRY_DELAY_MAX = 60 * 60
+# Сколько секунд задача закреплена за воркером; потом её заберёт другой
+TASKS_LEASE = 5 * 60
+# Сколько хранить выполненные задачи (и занятые ими ключи), с
+TASKS_KEEP_DONE = 24 * 60 * 60
+
+# Размеры миниатюр, которые нарезаются сразу после сохранения поста;
+# должны совпадать с аргументами {% thumbnail %} в шаблонах
+THUMBNAIL_PRESETS = [
+    ('960x339', {'crop': 'center', 'upscale': True}),
+]
+THUMBNAIL_PREGENERATE = True
+
+# Адаптивные варианты картинок постов для <picture srcset>
+IMAGE_VARIANTS_DIR = 'variants'
+IMAGE_VARIANT_WIDTHS = [320, 640, 960]
+IMAGE_VARIANT_FORMATS = ['webp', 'jpeg']
+IMAGE_VARIANT_RATIO = (960, 339)
+IMAGE_VARIANT_SIZES = '(max-width: 960px) 100vw, 960px'
+
+# locmem — свой кэш у каждого процесса, sqlite — общий файл для всех
+# процессов на машине, file — FileBasedCache; выбирается YATUBE_CACHE
+CACHE_BACKENDS = {
+    'locmem': {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
+    },
+    'sqlite': {
+        'BACKEND': 'core.cache_backends.SQLiteCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache', 'cache.sqlite3'),
+        'OPTIONS': {
+            'MAX_ENTRIES': 100000,
+            'CULL_FREQUENCY': 10,
+        },
+    },
+    'file': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache', 'files'),
+    },
+}
+
+CACHES = {
+    'default': CACHE_BACKENDS[os.environ.get('YATUBE_CACHE', 'locmem')],
 }
+
+# Фрагменты лент живут до смены поколения, таймаут лишь подчищает мусор
+FRAGMENT_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Сколько последних постов отдавать в RSS/Atom/JSON-лентах
+SYNDICATION_ITEMS = 20
+
+# JSON API: размер страницы по умолчанию и наибольший допустимый ?limit=
+API_PAGE_SIZE = 20
+API_MAX_PAGE_SIZE = 100
@@ -23,6 +23,11 @@ urlpatterns = [
     path('auth/', include('django.contrib.auth.urls')),
     path('', include('posts.urls', namespace='posts')),
     path('about/', include('about.urls', namespace='about')),
+    path('api/v1/', include('api.urls', namespace='api')),
+    path(
+        'notifications/',
+        include('notifications.urls', namespace='notifications')
+    ),
     path('admin/', admin.site.urls),
 ]
 